@@ -146,6 +146,19 @@ my_sum.details()
 
 For the full API see `pyerrors.obs.Obs.gamma_method`.
 
+### Growing Monte Carlo chains
+
+While a simulation is still running, the error of an observable can be monitored with a `pyerrors.streaming.StreamingObs`. It accumulates the autocorrelation function up to a maximal window such that appending new configurations does not require a reanalysis of the full history.
+
+```python
+stream = pe.StreamingObs('ensemble_name', max_window=500)
+stream.append(first_samples)
+stream.gamma_method()
+> Obs[1.70(57)]
+stream.append(new_samples)
+stream.gamma_method()
+```
+
 ## Multiple ensembles/replica
 
 Error propagation for multiple ensembles (Markov chains with different simulation parameters) is handled automatically. Ensembles are uniquely identified by their `name`.
@@ -410,6 +423,11 @@ For the full API see `pyerrors.fits` for fits and `pyerrors.roots` for finding r
 
 For the full API see `pyerrors.linalg`.
 
+For large matrices the linear error propagation can become expensive. In this case the error propagation can be carried out with jackknife or bootstrap samples via `pyerrors.resampling`, where arbitrary `numpy` code is applied to all samples at once
+```python
+w, v = pe.resampling.resample(np.linalg.eigh, matrix)
+```
+
 # Export data
 
 [<img src="https://imgs.xkcd.com/comics/standards_2x.png" width="75%" height="75%">](https://xkcd.com/927/)
@@ -435,6 +453,26 @@ print(my_obs == check)
 ```
 The format also allows to directly write out the content of `Corr` objects or lists and arrays of `Obs` objects by passing the desired data to `pyerrors.input.json.dump_to_json`.
 
+For large datasets, e.g. matrices of correlators on many configurations, the binary format of `pyerrors.input.hdf5` is considerably faster and more compact. It supports the same structures and stores the fluctuations of every replica as one contiguous array in an HDF5 (or `.npz`) file. Selected objects can be loaded without reading the remainder of the file
+```python
+pe.input.hdf5.dump({"pion": pion_corr, "t0": t0}, "test_output_file.h5")
+t0 = pe.input.hdf5.load("test_output_file.h5", keys=["t0"])["t0"]
+```
+
+## Caching analysis results
+Expensive analysis steps can be cached on disk with `pyerrors.cache.Cache`. The results of a decorated function are stored under a key which is computed from the content of the input `Obs`, `Corr` and all other arguments, such that rerunning an analysis with unchanged input (e.g. after restarting a notebook) loads the stored results instead of recomputing them
+```python
+cache = pe.cache.Cache("analysis_cache", max_size=10 * 1024 ** 3)
+
+@cache
+def effective_masses(corr, t0):
+    return corr.GEVP(t0)[0].m_eff()
+
+m_eff = effective_masses(matrix_corr, t0=2)
+cache.stats()
+> {'hits': 0, 'misses': 1, 'evictions': 0, 'entries': 1, 'size': 81754}
+```
+
 ## json.gz format specification
 The first entries of the file provide optional auxiliary information:
 - `program` is a string that indicates which program was used to write the file.
@@ -478,15 +516,19 @@ A JSON schema that may be used to verify the correctness of a file with respect
 Julia I/O routines for the json.gz format, compatible with [ADerrors.jl](https://gitlab.ift.uam-csic.es/alberto/aderrors.jl), can be found [here](https://github.com/fjosw/ADjson.jl).
 '''
 from .obs import *
+from .obsarray import *
+from .streaming import *
 from .correlators import *
 from .fits import *
 from .misc import *
 from . import dirac
 from . import input
 from . import linalg
+from . import resampling
 from . import mpm
 from . import roots
 from . import integrate
 from . import special
+from . import cache
 
 from .version import __version__
@@ -0,0 +1,336 @@
+import os
+import glob
+import pickle
+import hashlib
+import inspect
+import tempfile
+import functools
+import numpy as np
+from .obs import Obs, CObs
+from .covobs import Covobs
+from .correlators import Corr
+
+
+class Cache:
+    """Content-addressed on-disk cache for the results of analysis steps.
+
+    An instance of Cache can be used as decorator. The result of a decorated
+    function is stored in the cache directory under a key which is derived from
+    the content of the arguments, i.e. the values, fluctuations, configurations
+    and covobs of all `Obs`, `CObs` and `Corr` objects, the content of arrays and
+    the values of all other arguments, as well as from the code of the function.
+    Calling the function again with arguments of identical content (e.g. after
+    restarting a notebook and reloading the data) returns the stored result
+    without recomputing it.
+
+    ```python
+    cache = pe.cache.Cache('analysis_cache', max_size=2 * 1024 ** 3)
+
+    @cache
+    def ground_state(corr, t0):
+        corr = corr.GEVP(t0)[0]
+        corr.gamma_method()
+        return corr
+
+    ground_state(matrix_corr, t0=2)  # computed and stored
+    ground_state(matrix_corr, t0=2)  # loaded from the cache directory
+    cache.stats()
+    > {'hits': 1, 'misses': 1, 'evictions': 0, 'entries': 1, 'size': 254783}
+    ```
+
+    The results are stored in the binary pickle format. If the total size of the
+    stored results exceeds max_size, the least recently used results are removed.
+    Besides the arguments, the key contains the default arguments of the function
+    and the data (but not the functions, classes and modules) it reads from
+    closures and module globals, e.g. a global `t0 = 3`. The tags of the arguments
+    do not enter the key. Changes of functions which are called by the decorated
+    function and of data which cannot be pickled are not detected, `clear`
+    removes all stored results.
+    """
+
+    def __init__(self, directory, max_size=None):
+        """ Initialize Cache object.
+
+        Parameters
+        ----------
+        directory : str
+            Directory in which the results are stored. It is created if it does not exist.
+            Different Cache objects (also in different processes) can share a directory.
+        max_size : int, optional
+            Maximal total size of the stored results in bytes. If it is exceeded, the least
+            recently used results are evicted. By default the size is not bounded.
+        """
+        if max_size is not None and (not isinstance(max_size, int) or max_size <= 0):
+            raise ValueError('max_size has to be a positive integer.')
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = self.key(func, *args, **kwargs)
+            try:
+                result = self.load(key)
+            except KeyError:
+                result = func(*args, **kwargs)
+                self.store(key, result)
+            return result
+
+        wrapper.cache = self
+        return wrapper
+
+    def key(self, func, *args, **kwargs):
+        """Returns the key under which the result of func(*args, **kwargs) is stored."""
+        try:
+            bound = inspect.signature(func).bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+        except (TypeError, ValueError):
+            arguments = {'args': args, 'kwargs': kwargs}
+        h = hashlib.blake2b(digest_size=20)
+        _update_hash(h, func)
+        _update_hash(h, dict(arguments))
+        return h.hexdigest()
+
+    def load(self, key):
+        """Returns the result stored under key.
+
+        Raises a KeyError if no result is stored under key.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fin:
+                result = pickle.load(fin)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            raise KeyError(key)
+        self.hits += 1
+        # The modification time marks the last usage for the eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return result
+
+    def store(self, key, result):
+        """Stores result under key and evicts the least recently used results if max_size is exceeded."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fout:
+                pickle.dump(result, fout, protocol=pickle.HIGHEST_PROTOCOL)
+            # The result only becomes visible once it has been written completely
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        if self.max_size is not None:
+            self._evict(self.max_size)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def stats(self):
+        """Returns the statistics of the cache.
+
+        Returns
+        -------
+        stats : dict
+            Number of hits, misses and evictions of this Cache object as well as
+            the number of entries and their total size in bytes in the cache directory.
+        """
+        entries = self._entries()
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'size': sum(size for _, size, _ in entries)}
+
+    def clear(self):
+        """Removes all stored results and resets the statistics."""
+        for path, _, _ in self._entries():
+            _remove(path)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return 'Cache[' + self.directory + ']'
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def _entries(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.pickle')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def _evict(self, max_size):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= max_size:
+                break
+            _remove(path)
+            total -= size
+            self.evictions += 1
+
+
+def content_hash(obj):
+    """Returns a hash of the content of obj.
+
+    Obs, CObs and Corr objects are hashed by their values, fluctuations,
+    configurations and covobs in full precision, numpy arrays by their dtype,
+    shape and data. Containers are hashed recursively, all other objects by
+    their pickled representation. In contrast to `Obs.__hash__` the hash is
+    suited to identify the content of an object.
+
+    Parameters
+    ----------
+    obj : object
+        Object to be hashed.
+
+    Returns
+    -------
+    hash : str
+        Hexadecimal digest.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    _update_hash(h, obj)
+    return h.hexdigest()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _update_array(h, array):
+    array = np.ascontiguousarray(array)
+    h.update(('%s%s' % (array.dtype.str, array.shape)).encode())
+    h.update(array.data)
+
+
+def _update_hash(h, obj):
+    """Updates the hash object h with the content of obj."""
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        h.update(('%s:%r;' % (type(obj).__name__, obj)).encode())
+    elif isinstance(obj, Obs):
+        h.update(b'Obs')
+        _update_array(h, np.array([obj.value], dtype=np.float64))
+        h.update(repr((obj.names, obj.reweighted)).encode())
+        for name in obj.mc_names:
+            for r_name in obj.e_content[name]:
+                idl = obj.idl[r_name]
+                if isinstance(idl, range):
+                    h.update(repr(idl).encode())
+                else:
+                    _update_array(h, np.asarray(idl, dtype=np.int64))
+                _update_array(h, np.asarray(obj.deltas[r_name], dtype=np.float64))
+                _update_array(h, np.array([obj.r_values[r_name]], dtype=np.float64))
+        for name in obj.cov_names:
+            _update_hash(h, obj.covobs[name])
+    elif isinstance(obj, Covobs):
+        h.update(('Covobs' + obj.name).encode())
+        _update_array(h, np.asarray(obj.cov, dtype=np.float64))
+        _update_array(h, np.asarray(obj.grad, dtype=np.float64))
+    elif isinstance(obj, CObs):
+        h.update(b'CObs')
+        _update_hash(h, obj.real)
+        _update_hash(h, obj.imag)
+    elif isinstance(obj, Corr):
+        h.update(b'Corr')
+        _update_hash(h, obj.content)
+        _update_hash(h, None if obj.prange is None else [int(p) for p in obj.prange])
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            h.update(('object%s' % (obj.shape,)).encode())
+            for item in obj.ravel():
+                _update_hash(h, item)
+        else:
+            _update_array(h, obj)
+    elif isinstance(obj, np.generic):
+        _update_array(h, np.asarray(obj))
+    elif isinstance(obj, (list, tuple)):
+        h.update(('%s%d[' % (type(obj).__name__, len(obj))).encode())
+        for item in obj:
+            _update_hash(h, item)
+        h.update(b']')
+    elif isinstance(obj, dict):
+        # Dicts with the same items are hashed identically independent of the order
+        items = sorted((content_hash(key), content_hash(value)) for key, value in obj.items())
+        h.update(('dict%d%r' % (len(items), items)).encode())
+    elif isinstance(obj, (set, frozenset)):
+        h.update(('%s%r' % (type(obj).__name__, sorted(content_hash(item) for item in obj))).encode())
+    elif isinstance(obj, functools.partial):
+        h.update(b'partial')
+        _update_hash(h, (obj.func, obj.args, obj.keywords))
+    elif hasattr(obj, '__code__'):
+        h.update(('function%s.%s' % (getattr(obj, '__module__', None), getattr(obj, '__qualname__', None))).encode())
+        _update_code(h, obj.__code__)
+        _update_hash(h, obj.__defaults__)
+        _update_hash(h, obj.__kwdefaults__)
+        # Data read from closures and module globals is part of the key, functions are not followed
+        for cell in obj.__closure__ or ():
+            try:
+                _update_data(h, cell.cell_contents)
+            except ValueError:
+                h.update(b'empty cell')
+        for name in sorted(_global_names(obj.__code__)):
+            if name in getattr(obj, '__globals__', {}):
+                h.update(('global %s:' % name).encode())
+                _update_data(h, obj.__globals__[name])
+    elif isinstance(obj, np.ufunc):
+        h.update(('ufunc' + obj.__name__).encode())
+    elif callable(obj) and hasattr(obj, '__qualname__'):
+        # Builtin functions and classes
+        h.update(('callable%s.%s' % (getattr(obj, '__module__', None), obj.__qualname__)).encode())
+    else:
+        try:
+            h.update(pickle.dumps(obj, protocol=4))
+        except Exception:
+            raise TypeError('Cannot hash object of type %s.' % type(obj).__name__)
+
+
+def _update_code(h, code):
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            _update_code(h, const)
+        else:
+            _update_hash(h, const)
+
+
+def _global_names(code):
+    """Returns the names used by code and the code objects nested in it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _global_names(const)
+    return names
+
+
+def _update_data(h, obj):
+    """Updates h with obj unless it is a module, class or callable."""
+    if inspect.ismodule(obj) or inspect.isclass(obj) or callable(obj):
+        h.update(b'callable')
+        return
+    try:
+        data = hashlib.blake2b(digest_size=20)
+        _update_hash(data, obj)
+    except TypeError:
+        # Objects which cannot be hashed are not part of the key
+        h.update(b'unhashable')
+        return
+    h.update(data.digest())
@@ -4,9 +4,11 @@ import numpy as np
 import autograd.numpy as anp
 import matplotlib.pyplot as plt
 import scipy.linalg
-from .obs import Obs, reweight, correlate, CObs
+import scipy.optimize
+from .obs import Obs, reweight, correlate, CObs, gamma_method_batch, derived_observable
+from .obsarray import ObsArray, _unary_derivatives
 from .misc import dump_object, _assert_equal_properties
-from .fits import least_squares
+from .fits import least_squares, least_squares_batch
 from .roots import find_root
 from . import linalg
 
@@ -31,6 +33,7 @@ class Corr:
     ```python
     corr11 = pe.Corr([obs1, obs2])
     corr11 = pe.Corr(np.array([obs1, obs2]))
+    corr11 = pe.Corr(pe.ObsArray([obs1, obs2]))
     ```
     A matrix-valued correlator can either be initialized via a two-dimensional array of `Corr` objects
     ```python
@@ -38,9 +41,20 @@ class Corr:
     ```
     or alternatively via a three-dimensional array of `Obs` or `CObs` of shape (T, N, N) where T is
     the temporal extent of the correlator and N is the dimension of the matrix.
+
+    Storage
+    -------
+    A correlator initialized from an `ObsArray` of shape (T,) or (T, N, N) keeps its data in array form:
+    the mean values are stored in a float array of shape (T, 1) or (T, N, N) together with a boolean mask
+    of the defined timeslices, the fluctuations of each replica in one contiguous block. Timeslice
+    operations like `roll`, `symmetric`, `deriv`, `m_eff` or the arithmetic operations then act on
+    the whole array at once and return correlators in array form. Correlators initialized from lists
+    of `Obs` are converted to this representation on the fly whenever all `Obs` are defined on the same
+    replica and configurations. The list of timeslices `Corr.content` is created from the array when
+    it is first accessed, changes to it are reflected in all subsequent operations.
     """
 
-    __slots__ = ["content", "N", "T", "tag", "prange"]
+    __slots__ = ["_content", "_array", "_mask", "_items", "N", "T", "tag", "prange"]
 
     def __init__(self, data_input, padding=[0, 0], prange=None):
         """ Initialize a Corr object.
@@ -58,6 +72,26 @@ class Corr:
             region identified for this correlator.
         """
 
+        self._array = None
+        self._mask = None
+        self._items = None
+
+        if isinstance(data_input, ObsArray):
+            if data_input.ndim == 1:
+                data_input = data_input.reshape(-1, 1)
+            elif data_input.ndim != 3 or data_input.shape[1] != data_input.shape[2]:
+                raise ValueError("ObsArray input needs to be of shape (T,) or (T, N, N).")
+            T = data_input.shape[0] + padding[0] + padding[1]
+            idx = np.clip(np.arange(T) - padding[0], 0, data_input.shape[0] - 1)
+            self._content = None
+            self._array = data_input if T == data_input.shape[0] else data_input[idx]
+            self._mask = (np.arange(T) >= padding[0]) & (np.arange(T) < padding[0] + data_input.shape[0])
+            self.N = 1 if data_input.ndim == 2 else data_input.shape[1]
+            self.T = T
+            self.tag = None
+            self.prange = prange
+            return
+
         if isinstance(data_input, np.ndarray):
             if data_input.ndim == 1:
                 data_input = list(data_input)
@@ -119,6 +153,89 @@ class Corr:
         self.T = len(self.content)
         self.prange = prange
 
+    @classmethod
+    def _from_array(cls, array, mask, prange=None):
+        """Construct a Corr from an ObsArray of shape (T, 1) or (T, N, N) and the mask of its defined timeslices."""
+        new = cls.__new__(cls)
+        new._content = None
+        new._array = array
+        new._mask = mask
+        new._items = None
+        new.N = 1 if array.ndim == 2 else array.shape[1]
+        new.T = array.shape[0]
+        new.tag = None
+        new.prange = prange
+        return new
+
+    @property
+    def content(self):
+        """List of the timeslices of the correlator, arrays of Obs or None for undefined timeslices."""
+        if self._content is None:
+            defined = np.flatnonzero(self._mask)
+            obs = self._array[defined].to_obs() if len(defined) else []
+            self._content = [None] * self.T
+            for t, item in zip(defined, obs):
+                self._content[t] = item
+            # The array stays valid as long as the content is not modified in place
+            self._items = _content_items(self._content)
+        return self._content
+
+    @content.setter
+    def content(self, content):
+        self._content = content
+        self._array = None
+        self._mask = None
+        self._items = None
+
+    def _cached_array(self):
+        """Return the cached ObsArray and mask of the defined timeslices or None if there is none.
+
+        The cache is dropped if the content has been modified in place since it was read.
+        """
+        if self._array is not None and self._content is not None and not _same_items(self._content, self._items):
+            self._array = None
+            self._mask = None
+            self._items = None
+        return None if self._array is None else (self._array, self._mask)
+
+    def _as_array(self):
+        """Return the content as ObsArray of shape (T, 1) or (T, N, N) and the mask of the defined timeslices.
+
+        Undefined timeslices are filled with a copy of the first defined one. Returns None if the content
+        cannot be represented by an ObsArray (CObs or Obs defined on different replica or configurations).
+        """
+        cached = self._cached_array()
+        if cached is not None:
+            return cached
+        mask = np.array([not _check_for_none(self, item) for item in self._content], dtype=bool)
+        if not mask.any():
+            return None
+        try:
+            array = ObsArray(np.array([self._content[t] for t in np.flatnonzero(mask)]))
+        except (TypeError, ValueError):
+            return None
+        if not mask.all():
+            array = array[np.where(mask, np.cumsum(mask) - 1, 0)]
+        return array, mask
+
+    def _array_timeslices(self, *indices):
+        """Gather the timeslices at the given index arrays from the array representation.
+
+        Returns a list of ObsArrays, one per index array, and the mask of the timeslices at which all
+        of them are defined, or None if the content cannot be represented by an ObsArray.
+        """
+        res = self._as_array()
+        if res is None:
+            return None
+        array, mask = res
+        arrays = [array[idx] for idx in indices]
+        new_mask = np.all([mask[idx] for idx in indices], axis=0)
+        return arrays, new_mask
+
+    def _array_shifted(self, *shifts):
+        """Like _array_timeslices for the timeslices t + shift (periodically wrapped)."""
+        return self._array_timeslices(*[(np.arange(self.T) + shift) % self.T for shift in shifts])
+
     def __getitem__(self, idx):
         """Return the content of timeslice idx"""
         if self.content[idx] is None:
@@ -139,15 +256,13 @@ class Corr:
             raise Exception("Reweighting status of correlator corrupted.")
 
     def gamma_method(self, **kwargs):
-        """Apply the gamma method to the content of the Corr."""
-        for item in self.content:
-            if not (item is None):
-                if self.N == 1:
-                    item[0].gamma_method(**kwargs)
-                else:
-                    for i in range(self.N):
-                        for j in range(self.N):
-                            item[i, j].gamma_method(**kwargs)
+        """Apply the gamma method to the content of the Corr.
+
+        All Obs of the Corr are processed together via pe.gamma_method_batch,
+        the keyword arguments n_jobs and executor can be used to parallelize the
+        computation (see docstring of pe.gamma_method_batch for details).
+        """
+        gamma_method_batch(self.content, **kwargs)
 
     gm = gamma_method
 
@@ -179,9 +294,22 @@ class Corr:
                 raise Exception("Vectors are of wrong shape!")
             if normalize:
                 vector_l, vector_r = vector_l / np.sqrt((vector_l @ vector_l)), vector_r / np.sqrt(vector_r @ vector_r)
+            res = self._as_array() if vector_l.dtype.kind in 'biuf' and vector_r.dtype.kind in 'biuf' else None
+            if res is not None:
+                array, mask = res
+                return Corr._from_array(array._linear(lambda x: np.einsum('i,tij...,j->t...', vector_l, x, vector_r)[:, None]), mask)
             newcontent = [None if _check_for_none(self, item) else np.asarray([vector_l.T @ item @ vector_r]) for item in self.content]
 
         else:
+            stacked = _stack_vectors([vector_l, vector_r], self.T, self.N)
+            res = self._as_array() if stacked is not None else None
+            if res is not None:
+                (vec_l, vec_r), v_mask = stacked
+                if normalize:
+                    vec_l, vec_r = vec_l / np.linalg.norm(vec_l, axis=-1, keepdims=True), vec_r / np.linalg.norm(vec_r, axis=-1, keepdims=True)
+                array, mask = res
+                return Corr._from_array(array._linear(lambda x: np.einsum('ti,tij...,tj->t...', vec_l, x, vec_r)[:, None]), mask & v_mask)
+
             # There are no checks here yet. There are so many possible scenarios, where this can go wrong.
             if normalize:
                 for t in range(self.T):
@@ -190,6 +318,53 @@ class Corr:
             newcontent = [None if (_check_for_none(self, self.content[t]) or vector_l[t] is None or vector_r[t] is None) else np.asarray([vector_l[t].T @ self.content[t] @ vector_r[t]]) for t in range(self.T)]
         return Corr(newcontent)
 
+    def projected_states(self, vectors, normalize=False, overlaps=False):
+        """Project the correlator matrix onto several states at once.
+
+        For correlators which can be represented by an ObsArray all projections are computed
+        in a single pass over the stacked fluctuations.
+
+        Parameters
+        ----------
+        vectors : list or numpy.ndarray
+            Vectors of n states, e.g. the output of Corr.GEVP. Every entry is either a single
+            vector of length N or a list of T vectors (None for undefined timeslices). Arrays of
+            shape (n, N) or (n, T, N) are accepted as well.
+        normalize : bool
+            Normalize the vectors before the projection (default False).
+        overlaps : bool
+            If True a matrix valued Corr of dimension n with the entries v_i^T C(t) v_j is
+            returned instead of the list of projected correlators (default False).
+
+        Returns
+        -------
+        res : list or Corr
+            List of the n projected correlators v_i^T C(t) v_i or for overlaps=True the
+            correlator matrix of all overlaps.
+        """
+        if self.N == 1:
+            raise Exception("Trying to project a Corr, that already has N=1.")
+        stacked = _stack_vectors(vectors, self.T, self.N)
+        res = self._as_array() if stacked is not None else None
+        if res is None:
+            if overlaps:
+                return Corr(np.array([[self.projected(v_i, v_j, normalize=normalize) for v_j in vectors] for v_i in vectors]))
+            return [self.projected(v, normalize=normalize) for v in vectors]
+
+        array, mask = res
+        vecs, v_mask = stacked
+        if normalize:
+            # The vectors of undefined timeslices are zero and stay unnormalized
+            vecs = np.divide(vecs, np.linalg.norm(vecs, axis=-1, keepdims=True), out=np.zeros_like(vecs), where=v_mask[:, None])
+        mask = mask & v_mask
+        if overlaps:
+            new_array = array._linear(lambda x: np.einsum('ati,tij...,btj->tab...', vecs, x, vecs))
+            if len(vecs) == 1:
+                new_array = new_array.reshape(self.T, 1)
+            return Corr._from_array(new_array, mask)
+        new_array = array._linear(lambda x: np.einsum('ati,tij...,atj->ta...', vecs, x, vecs))
+        return [Corr._from_array(new_array[:, [i]], mask.copy()) for i in range(len(vecs))]
+
     def item(self, i, j):
         """Picks the element [i,j] from every matrix and returns a correlator containing one Obs per timeslice.
 
@@ -202,6 +377,9 @@ class Corr:
         """
         if self.N == 1:
             raise Exception("Trying to pick item from projected Corr")
+        cached = self._cached_array()
+        if cached is not None:
+            return Corr._from_array(cached[0][:, [i], j], cached[1])
         newcontent = [None if (item is None) else item[i, j] for item in self.content]
         return Corr(newcontent)
 
@@ -228,6 +406,15 @@ class Corr:
         if self.T % 2 != 0:
             raise Exception("Can not symmetrize odd T")
 
+        res = self._array_timeslices(np.arange(self.T), -np.arange(self.T) % self.T)
+        if res is not None:
+            (array, reflected), mask = res
+            if mask[0] and np.argmax(np.where(mask, np.abs(array.values[:, 0]), 0)) != 0:
+                warnings.warn("Correlator does not seem to be symmetric around x0=0.", RuntimeWarning)
+            if not mask.any():
+                raise Exception("Corr could not be symmetrized: No redundant values")
+            return Corr._from_array(0.5 * (array + reflected), mask, prange=self.prange)
+
         if self.content[0] is not None:
             if np.argmax(
                     np.abs([o[0].value if o is not None else 0
@@ -255,6 +442,20 @@ class Corr:
         if self.T % 2 != 0:
             raise Exception("Can not symmetrize odd T")
 
+        res = self._array_timeslices(np.arange(self.T), -np.arange(self.T) % self.T)
+        if res is not None:
+            (array, reflected), mask = res
+            if mask[0]:
+                test = array[[0]].to_obs()
+                gamma_method_batch(test)
+                if not all([o.is_zero_within_error(3) for o in test.ravel()]):
+                    warnings.warn("Correlator does not seem to be anti-symmetric around x0=0.", RuntimeWarning)
+            if not mask.any():
+                raise Exception("Corr could not be symmetrized: No redundant values")
+            # The sign of the reflected timeslice is flipped at x0=0 which keeps the original value there
+            sign = np.where(np.arange(self.T) == 0, -1.0, 1.0).reshape((-1,) + (1,) * (array.ndim - 1))
+            return Corr._from_array(0.5 * (array - sign * reflected), mask, prange=self.prange)
+
         test = 1 * self
         test.gamma_method()
         if not all([o.is_zero_within_error(3) for o in test.content[0]]):
@@ -342,27 +543,28 @@ class Corr:
             Default is Eigenvalue.
         vector_obs : bool, optional
             If True, uncertainties are propagated in the eigenvector
-            computation. Default is False.
+            computation. The errors are obtained from the analytic first
+            order perturbation of the generalized eigenvectors.
+            Default is False.
 
         Other Parameters
         ----------------
         state : int, optional
            Returns only the vector(s) for a specified state.
            The lowest state is zero.
+        sort_method : str, optional
+           Algorithm used to find the optimal assignment for sort="Eigenvector".
+           - hungarian: Polynomial time assignment via scipy.optimize.linear_sum_assignment. (default)
+           - permutation: Exhaustive search over all N! permutations, only feasible for small N.
         method : str, optional
            Method used to solve the GEVP.
            - eigh: Use scipy.linalg.eigh to solve the GEVP.
            This is the default for vector_obs=False.
            - cholesky: Use manually implemented solution via the
-           Cholesky decomposition. Automatically chosen if vector_obs==True.
+           Cholesky decomposition of G0, the GEVPs on all timeslices are
+           solved in one stacked call. Automatically chosen if vector_obs==True.
 
         """
-        def _get_mat_at_t(t, vector_obs=vector_obs):
-            if vector_obs:
-                return symmetric_corr[t]
-            else:
-                return np.vectorize(lambda x: x.value)(symmetric_corr[t])
-
         if self.N == 1:
             raise Exception(
                 "GEVP methods only works on correlator matrices "
@@ -382,34 +584,23 @@ class Corr:
         else:
             symmetric_corr = self.matrix_symmetric()
 
-        G0 = _get_mat_at_t(t0)
+        # Check if matrix G0 is positive-semidefinite.
+        g0_test = np.vectorize(lambda x: x.value)(symmetric_corr[t0])
+        test1 = np.all(g0_test == g0_test.T.conj())
+        test2 = np.all(np.linalg.eigh(g0_test)[0] >= 0.0)
+        if not test1 or not test2:
+            raise Exception("Matrix G0 is not positive semidefinite")
 
         method = kwargs.get('method', 'eigh')
         if vector_obs:
-            chol = linalg.cholesky(G0)
-            chol_inv = linalg.inv(chol)
             method = 'cholesky'
-        else:
-            # Check if matrix G0 is positive-semidefinite.
-            g0_test = _get_mat_at_t(t0, vector_obs=False)
-            test1 = np.all(g0_test == g0_test.T.conj())
-            test2 = np.all(np.linalg.eigh(g0_test)[0] >= 0.0)
-            if not test1 or not test2:
-                raise Exception("Matrix G0 is not positive semidefinite")
-            chol = np.linalg.cholesky(g0_test)
-            if method == 'cholesky':
-                chol_inv = np.linalg.inv(chol)
-            else:
-                chol_inv = None
 
         if sort is None:
             if (ts is None):
                 raise Exception("ts is required if sort=None.")
             if (self.content[t0] is None) or (self.content[ts] is None):
                 raise Exception("Corr not defined at t0/ts.")
-            Gt = _get_mat_at_t(ts)
-            reordered_vecs = _GEVP_solver(
-                Gt, G0, method=method, chol_inv=chol_inv)
+            reordered_vecs = _GEVP_batch_solver(symmetric_corr, t0, [ts], method=method, vector_obs=vector_obs)[0]
             if kwargs.get('auto_gamma', False) and vector_obs:
                 [[o.gm() for o in ev if isinstance(o, Obs)]
                  for ev in reordered_vecs]
@@ -420,18 +611,12 @@ class Corr:
                     "ts has no effect when sorting by eigenvalue is chosen.",
                     RuntimeWarning)
             all_vecs = [None] * (t0 + 1)
-            for t in range(t0 + 1, self.T):
-                try:
-                    Gt = _get_mat_at_t(t)
-                    all_vecs.append(
-                        _GEVP_solver(Gt, G0, method=method, chol_inv=chol_inv))
-                except Exception:
-                    all_vecs.append(None)
+            all_vecs += _GEVP_batch_solver(symmetric_corr, t0, range(t0 + 1, self.T), method=method, vector_obs=vector_obs)
             if sort == "Eigenvector":
                 if ts is None:
                     raise Exception(
                         "ts is required for the Eigenvector sorting method.")
-                all_vecs = _sort_vectors(all_vecs, ts)
+                all_vecs = _sort_vectors(all_vecs, ts, method=kwargs.get('sort_method', 'hungarian'))
 
             reordered_vecs = [[v[s] if v is not None else None
                                for v in all_vecs] for s in range(self.N)]
@@ -511,10 +696,17 @@ class Corr:
         dt : int
             number of timeslices
         """
+        cached = self._cached_array()
+        if cached is not None:
+            idx = (np.arange(self.T) - dt) % self.T
+            return Corr._from_array(cached[0][idx], cached[1][idx])
         return Corr(list(np.roll(np.array(self.content, dtype=object), dt, axis=0)))
 
     def reverse(self):
         """Reverse the time ordering of the Corr"""
+        cached = self._cached_array()
+        if cached is not None:
+            return Corr._from_array(cached[0][::-1], cached[1][::-1])
         return Corr(self.content[:: -1])
 
     def thin(self, spacing=2, offset=0):
@@ -628,6 +820,10 @@ class Corr:
         """
         if self.N != 1:
             raise Exception("deriv only implemented for one-dimensional correlators.")
+        if variant in _deriv_stencils:
+            res = self._array_stencil(*_deriv_stencils[variant])
+            if res is not None:
+                return res
         if variant == "symmetric":
             newcontent = []
             for t in range(1, self.T - 1):
@@ -682,6 +878,27 @@ class Corr:
         else:
             raise Exception("Unknown variant.")
 
+    def _array_stencil(self, shifts, coefficients, scale, padding):
+        """Apply a finite difference stencil to the array representation of the correlator.
+
+        Returns scale * sum_i coefficients[i] * C(t + shifts[i]) at all timeslices at which all
+        entering timeslices are defined or None if the content cannot be represented by an ObsArray.
+        """
+        res = self._array_shifted(*shifts)
+        if res is None:
+            return None
+        arrays, mask = res
+        mask[:padding[0]] = False
+        mask[self.T - padding[1]:] = False
+        if not mask.any():
+            raise Exception("Derivative is undefined at all timeslices")
+        new_array = arrays[0] if coefficients[0] == 1 else coefficients[0] * arrays[0]
+        for coeff, array in zip(coefficients[1:], arrays[1:]):
+            new_array = new_array + coeff * array if coeff != -1 else new_array - array
+        if scale != 1:
+            new_array = scale * new_array
+        return Corr._from_array(new_array, mask)
+
     def second_deriv(self, variant="symmetric"):
         r"""Return the second derivative of the correlator with respect to x0.
 
@@ -701,6 +918,10 @@ class Corr:
         """
         if self.N != 1:
             raise Exception("second_deriv only implemented for one-dimensional correlators.")
+        if variant in _second_deriv_stencils:
+            res = self._array_stencil(*_second_deriv_stencils[variant])
+            if res is not None:
+                return res
         if variant == "symmetric":
             newcontent = []
             for t in range(1, self.T - 1):
@@ -758,10 +979,24 @@ class Corr:
             arccosh : Uses the explicit form of the symmetrized correlator (not recommended)
             logsym: uses the symmetric effective mass log(C(t-1) / C(t+1))/2
         guess : float
-            guess for the root finder, only relevant for the root variant
+            guess for the root finder, only relevant for the root variants at timeslices at which the
+            vectorized solver does not find a positive solution.
         """
         if self.N != 1:
             raise Exception('Correlator must be projected before getting m_eff')
+        if variant in ['log', 'logsym']:
+            shifts, padding = ([0, 1], [0, 1]) if variant == 'log' else ([-1, 1], [1, 1])
+            res = self._array_shifted(*shifts)
+            if res is not None:
+                (num, den), mask = res
+                mask[:padding[0]] = False
+                mask[self.T - padding[1]:] = False
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    mask &= (den.values[:, 0] != 0) & ~(num.values[:, 0] / den.values[:, 0] < 0)
+                    if not mask.any():
+                        raise Exception('m_eff is undefined at all timeslices')
+                    meff = np.log(num / den)
+                return Corr._from_array(meff if variant == 'log' else meff / 2, mask)
         if variant == 'log':
             newcontent = []
             for t in range(self.T - 1):
@@ -791,29 +1026,7 @@ class Corr:
             return np.log(Corr(newcontent, padding=[1, 1])) / 2
 
         elif variant in ['periodic', 'cosh', 'sinh']:
-            if variant in ['periodic', 'cosh']:
-                func = anp.cosh
-            else:
-                func = anp.sinh
-
-            def root_function(x, d):
-                return func(x * (t - self.T / 2)) / func(x * (t + 1 - self.T / 2)) - d
-
-            newcontent = []
-            for t in range(self.T - 1):
-                if (self.content[t] is None) or (self.content[t + 1] is None) or (self.content[t + 1][0].value == 0):
-                    newcontent.append(None)
-                # Fill the two timeslices in the middle of the lattice with their predecessors
-                elif variant == 'sinh' and t in [self.T / 2, self.T / 2 - 1]:
-                    newcontent.append(newcontent[-1])
-                elif self.content[t][0].value / self.content[t + 1][0].value < 0:
-                    newcontent.append(None)
-                else:
-                    newcontent.append(np.abs(find_root(self.content[t][0] / self.content[t + 1][0], root_function, guess=guess)))
-            if (all([x is None for x in newcontent])):
-                raise Exception('m_eff is undefined at all timeslices')
-
-            return Corr(newcontent, padding=[0, 1])
+            return self._m_eff_periodic(variant, guess)
 
         elif variant == 'arccosh':
             newcontent = []
@@ -829,6 +1042,68 @@ class Corr:
         else:
             raise Exception('Unknown variant.')
 
+    def _m_eff_periodic(self, variant, guess):
+        """Effective mass of the variants periodic, cosh and sinh solved for all timeslices at once.
+
+        The errors are propagated with the derivative of the solution obtained from the implicit
+        function theorem, see _solve_periodic_m_eff. Timeslices at which no positive solution exists
+        and correlators which cannot be represented by an ObsArray are passed to find_root.
+        """
+        res = self._array_shifted(0, 1)
+        if res is not None:
+            (num, den), mask = res
+            c0, c1 = num.values[:, 0], den.values[:, 0]
+        else:
+            mask = np.array([self.content[t] is not None and self.content[(t + 1) % self.T] is not None for t in range(self.T)])
+            c0 = np.array([np.nan if item is None else item[0].value for item in self.content])
+            c1 = np.roll(c0, -1)
+        mask[-1] = False
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mask &= (c1 != 0)
+            ratio = c0 / c1
+
+        # Fill the two timeslices in the middle of the lattice with their predecessors
+        source = np.arange(self.T)
+        middle = np.zeros(self.T, dtype=bool)
+        if variant == 'sinh' and self.T % 2 == 0:
+            middle[[self.T // 2 - 1, self.T // 2]] = True
+            source[middle] = self.T // 2 - 2
+
+        valid = mask & ~middle & ~(ratio < 0)
+        if res is not None:
+            m, dm = _solve_periodic_m_eff(np.where(valid, ratio, 1.0), np.arange(self.T), self.T, variant)
+            fallback = valid & ~np.isfinite(m)
+        else:
+            fallback = valid
+        new_mask = valid.copy()
+        if middle.any():
+            # The timeslice T/2 copies T/2-1, which in turn copies T/2-2
+            for t in [self.T // 2 - 1, self.T // 2]:
+                new_mask[t] = mask[t] and new_mask[t - 1] if self.T > 3 else False
+        if not new_mask.any():
+            raise Exception('m_eff is undefined at all timeslices')
+
+        if res is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                g0, g1 = dm / c1, -dm * c0 / c1 ** 2
+            new_array = num._elementwise(lambda x0, x1: m[:, None] + g0[:, None] * (x0 - c0[:, None]) + g1[:, None] * (x1 - c1[:, None]),
+                                         [den], [g0[:, None], g1[:, None]])
+            if not fallback.any():
+                return Corr._from_array(new_array[source], new_mask)
+
+        func = anp.sinh if variant == 'sinh' else anp.cosh
+        newcontent = [None] * self.T
+        for t in np.flatnonzero(new_mask):
+            if source[t] != t:
+                newcontent[t] = newcontent[source[t]]
+            elif fallback[t]:
+                def root_function(x, d, t=t):
+                    return func(x * (t - self.T / 2)) / func(x * (t + 1 - self.T / 2)) - d
+                newcontent[t] = np.abs(find_root(self.content[t][0] / self.content[t + 1][0], root_function, guess=guess))
+            else:
+                newcontent[t] = new_array[t, 0]
+        return Corr(newcontent)
+
     def fit(self, function, fitrange=None, silent=False, **kwargs):
         """Fit function to the data.
 
@@ -844,6 +1119,39 @@ class Corr:
         silent : bool
             Decides whether output is printed to the standard output.
         """
+        xs, ys = self._fit_data(fitrange)
+        result = least_squares(xs, ys, function, silent=silent, **kwargs)
+        return result
+
+    def fit_scan(self, function, fitranges, silent=True, **kwargs):
+        """Fit the same function to the data on many fit ranges.
+
+        The fits are performed with fits.least_squares_batch which shares the
+        setup between the individual fits and initializes every fit with the
+        parameters of the preceding one.
+
+        Parameters
+        ----------
+        function : obj
+            function to fit to the data. See fits.least_squares for details.
+        fitranges : list
+            List of two element lists containing the timeslices on which the
+            respective fit is supposed to start and stop (inclusive, see Corr.fit).
+        silent : bool
+            Decides whether output is printed to the standard output (default True).
+
+        See docstring of fits.least_squares_batch for details on the keyword arguments.
+
+        Returns
+        -------
+        output : list[Fit_result]
+            List with the results of the fits in the order of fitranges.
+        """
+        data = [self._fit_data(fitrange) for fitrange in fitranges]
+        return least_squares_batch([xs for xs, _ in data], [ys for _, ys in data], function, silent=silent, **kwargs)
+
+    def _fit_data(self, fitrange):
+        """Returns the timeslices and the Obs on which a fit in fitrange is performed."""
         if self.N != 1:
             raise Exception("Correlator must be projected before fitting")
 
@@ -860,8 +1168,7 @@ class Corr:
 
         xs = np.array([x for x in range(fitrange[0], fitrange[1] + 1) if not self.content[x] is None])
         ys = np.array([self.content[x][0] for x in range(fitrange[0], fitrange[1] + 1) if not self.content[x] is None])
-        result = least_squares(xs, ys, function, silent=silent, **kwargs)
-        return result
+        return xs, ys
 
     def plateau(self, plateau_range=None, method="fit", auto_gamma=False):
         """ Extract a plateau value from a Corr object
@@ -1173,10 +1480,46 @@ class Corr:
             comp = np.asarray(y)
         return np.asarray(self.content, dtype=object) == comp
 
+    def _array_binary(self, y, func):
+        """Apply the elementwise binary operation func to the array representations of self and y.
+
+        y can be a Corr, an Obs or a real number. Returns the resulting ObsArray and the mask of the
+        defined timeslices, or None if one of the operands cannot be represented by an ObsArray or
+        the operands are not defined on the same replica and configurations.
+        """
+        res = self._as_array()
+        if res is None:
+            return None
+        array, mask = res
+        if isinstance(y, Corr):
+            res_y = y._as_array()
+            if res_y is None or not array._same_layout(res_y[0]):
+                return None
+            other, mask_y = res_y
+            if self.N != y.N:
+                if self.N == 1:
+                    array = array.reshape(self.T, 1, 1)
+                else:
+                    other = other.reshape(y.T, 1, 1)
+            mask = mask & mask_y
+        elif isinstance(y, Obs):
+            if not array._same_layout(ObsArray([y])):
+                return None
+            other = y
+        elif isinstance(y, (int, float)):
+            other = y
+        else:
+            return None
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return func(array, other), mask
+
     def __add__(self, y):
         if isinstance(y, Corr):
             if ((self.N != y.N) or (self.T != y.T)):
                 raise Exception("Addition of Corrs with different shape")
+            res = self._array_binary(y, lambda a, b: a + b)
+            if res is not None:
+                return Corr._from_array(*res)
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]) or _check_for_none(y, y.content[t]):
@@ -1186,6 +1529,9 @@ class Corr:
             return Corr(newcontent)
 
         elif isinstance(y, (Obs, int, float, CObs, complex)):
+            res = self._array_binary(y, lambda a, b: a + b)
+            if res is not None:
+                return Corr._from_array(*res, prange=self.prange)
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]):
@@ -1205,6 +1551,9 @@ class Corr:
         if isinstance(y, Corr):
             if not ((self.N == 1 or y.N == 1 or self.N == y.N) and self.T == y.T):
                 raise Exception("Multiplication of Corr object requires N=N or N=1 and T=T")
+            res = self._array_binary(y, lambda a, b: a * b)
+            if res is not None:
+                return Corr._from_array(*res)
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]) or _check_for_none(y, y.content[t]):
@@ -1214,6 +1563,9 @@ class Corr:
             return Corr(newcontent)
 
         elif isinstance(y, (Obs, int, float, CObs, complex)):
+            res = self._array_binary(y, lambda a, b: a * b)
+            if res is not None:
+                return Corr._from_array(*res, prange=self.prange)
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]):
@@ -1235,6 +1587,9 @@ class Corr:
                 raise ValueError("Can only multiply correlators by square matrices.")
             if not self.N == y.shape[0]:
                 raise ValueError("matmul: mismatch of matrix dimensions")
+            res = self._as_array() if self.N > 1 and y.dtype.kind in 'biuf' else None
+            if res is not None:
+                return Corr._from_array(res[0]._linear(lambda x: np.einsum('tij...,jk->tik...', x, y)), res[1])
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]):
@@ -1262,6 +1617,9 @@ class Corr:
                 raise ValueError("Can only multiply correlators by square matrices.")
             if not self.N == y.shape[0]:
                 raise ValueError("matmul: mismatch of matrix dimensions")
+            res = self._as_array() if self.N > 1 and y.dtype.kind in 'biuf' else None
+            if res is not None:
+                return Corr._from_array(res[0]._linear(lambda x: np.einsum('ij,tjk...->tik...', y, x)), res[1])
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]):
@@ -1276,6 +1634,13 @@ class Corr:
         if isinstance(y, Corr):
             if not ((self.N == 1 or y.N == 1 or self.N == y.N) and self.T == y.T):
                 raise Exception("Multiplication of Corr object requires N=N or N=1 and T=T")
+            res = self._array_binary(y, lambda a, b: a / b)
+            if res is not None:
+                array, mask = res
+                mask = mask & ~np.isnan(array.values.reshape(self.T, -1).sum(axis=1))
+                if not mask.any():
+                    raise Exception("Division returns completely undefined correlator")
+                return Corr._from_array(array, mask)
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]) or _check_for_none(y, y.content[t]):
@@ -1300,6 +1665,9 @@ class Corr:
                 if y.is_zero():
                     raise Exception('Division by zero will return undefined correlator')
 
+            res = self._array_binary(y, lambda a, b: a / b)
+            if res is not None:
+                return Corr._from_array(*res, prange=self.prange)
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]):
@@ -1311,6 +1679,9 @@ class Corr:
         elif isinstance(y, (int, float)):
             if y == 0:
                 raise Exception('Division by zero will return undefined correlator')
+            res = self._array_binary(y, lambda a, b: a / b)
+            if res is not None:
+                return Corr._from_array(*res, prange=self.prange)
             newcontent = []
             for t in range(self.T):
                 if _check_for_none(self, self.content[t]):
@@ -1327,6 +1698,9 @@ class Corr:
             raise TypeError('Corr / wrong type')
 
     def __neg__(self):
+        res = self._as_array()
+        if res is not None:
+            return Corr._from_array(-1. * res[0], res[1], prange=self.prange)
         newcontent = [None if _check_for_none(self, item) else -1. * item for item in self.content]
         return Corr(newcontent, prange=self.prange)
 
@@ -1335,12 +1709,18 @@ class Corr:
 
     def __pow__(self, y):
         if isinstance(y, (Obs, int, float, CObs)):
+            res = self._array_binary(y, lambda a, b: a ** b)
+            if res is not None:
+                return Corr._from_array(*res, prange=self.prange)
             newcontent = [None if _check_for_none(self, item) else item**y for item in self.content]
             return Corr(newcontent, prange=self.prange)
         else:
             raise TypeError('Type of exponent not supported')
 
     def __abs__(self):
+        res = self._as_array()
+        if res is not None:
+            return Corr._from_array(abs(res[0]), res[1], prange=self.prange)
         newcontent = [None if _check_for_none(self, item) else np.abs(item) for item in self.content]
         return Corr(newcontent, prange=self.prange)
 
@@ -1349,14 +1729,30 @@ class Corr:
         return self ** 0.5
 
     def log(self):
+        res = self._as_array()
+        if res is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return Corr._from_array(np.log(res[0]), res[1], prange=self.prange)
         newcontent = [None if _check_for_none(self, item) else np.log(item) for item in self.content]
         return Corr(newcontent, prange=self.prange)
 
     def exp(self):
+        res = self._as_array()
+        if res is not None:
+            return Corr._from_array(np.exp(res[0]), res[1], prange=self.prange)
         newcontent = [None if _check_for_none(self, item) else np.exp(item) for item in self.content]
         return Corr(newcontent, prange=self.prange)
 
     def _apply_func_to_corr(self, func):
+        res = self._as_array() if isinstance(func, np.ufunc) and func.__name__ in _unary_derivatives else None
+        if res is not None:
+            array, mask = res
+            with np.errstate(divide='ignore', invalid='ignore'):
+                array = func(array)
+            mask = mask & ~np.isnan(array.values.reshape(self.T, -1).sum(axis=1))
+            if not mask.any():
+                raise Exception('Operation returns undefined correlator')
+            return Corr._from_array(array, mask)
         newcontent = [None if _check_for_none(self, item) else func(item) for item in self.content]
         for t in range(self.T):
             if _check_for_none(self, newcontent[t]):
@@ -1496,8 +1892,28 @@ class Corr:
         return Corr(newcontent)
 
 
-def _sort_vectors(vec_set_in, ts):
-    """Helper function used to find a set of Eigenvectors consistent over all timeslices"""
+def _sort_vectors(vec_set_in, ts, method='hungarian'):
+    """Helper function used to find a set of Eigenvectors consistent over all timeslices
+
+    The vectors v_k on every timeslice are assigned to the states of the reference
+    vectors at ts such that the product over k of |det(R_k)| is maximal, where R_k
+    is the reference matrix in which the row of the assigned state is replaced by v_k.
+
+    Parameters
+    ----------
+    vec_set_in : list
+        List of arrays containing the (Obs valued) vectors of all states per timeslice
+        or None.
+    ts : int
+        Reference timeslice.
+    method : str
+        - hungarian: det(R_k) is linear in v_k, such that the score factorizes into the
+          entries of the overlap matrix v @ R^{-1}. The optimal assignment is then found
+          via scipy.optimize.linear_sum_assignment for all timeslices. (default)
+        - permutation: Exhaustive search over all permutations.
+    """
+    if method not in ['hungarian', 'permutation']:
+        raise ValueError("Unknown sorting method '" + str(method) + "'. Choose 'hungarian' or 'permutation'.")
 
     if isinstance(vec_set_in[ts][0][0], Obs):
         vec_set = [anp.vectorize(lambda x: float(x))(vi) if vi is not None else vi for vi in vec_set_in]
@@ -1505,12 +1921,20 @@ def _sort_vectors(vec_set_in, ts):
         vec_set = vec_set_in
     reference_sorting = np.array(vec_set[ts])
     N = reference_sorting.shape[0]
-    sorted_vec_set = []
-    for t in range(len(vec_set)):
-        if vec_set[t] is None:
-            sorted_vec_set.append(None)
-        elif not t == ts:
-            perms = [list(o) for o in permutations([i for i in range(N)], N)]
+
+    valid = [t for t in range(len(vec_set)) if vec_set[t] is not None and t != ts]
+    best_perms = {}
+    if method == 'hungarian' and valid:
+        # det(R with row p replaced by v_k) = det(R) * (v_k @ R^{-1})[p]
+        overlaps = np.abs(np.array([vec_set[t] for t in valid], dtype=float) @ np.linalg.inv(reference_sorting))
+        with np.errstate(divide='ignore'):
+            costs = -np.log(overlaps)
+        costs[~np.isfinite(costs)] = np.finfo(np.float64).max / (2 * N)
+        for t, cost in zip(valid, costs):
+            best_perms[t] = scipy.optimize.linear_sum_assignment(cost)[1]
+    elif method == 'permutation':
+        perms = [list(o) for o in permutations([i for i in range(N)], N)]
+        for t in valid:
             best_score = 0
             for perm in perms:
                 current_score = 1
@@ -1521,13 +1945,167 @@ def _sort_vectors(vec_set_in, ts):
                 if current_score > best_score:
                     best_score = current_score
                     best_perm = perm
-            sorted_vec_set.append([vec_set_in[t][k] for k in best_perm])
+            best_perms[t] = best_perm
+
+    sorted_vec_set = []
+    for t in range(len(vec_set)):
+        if vec_set[t] is None:
+            sorted_vec_set.append(None)
+        elif not t == ts:
+            # Vector k is assigned to state best_perms[t][k].
+            sorted_vecs = [None] * N
+            for k in range(N):
+                sorted_vecs[best_perms[t][k]] = vec_set_in[t][k]
+            sorted_vec_set.append(sorted_vecs)
         else:
             sorted_vec_set.append(vec_set_in[t])
 
     return sorted_vec_set
 
 
+# Finite difference stencils (shifts, coefficients, scale, padding) of Corr.deriv and Corr.second_deriv
+_deriv_stencils = {'symmetric': ([1, -1], [1, -1], 0.5, [1, 1]),
+                   'forward': ([1, 0], [1, -1], 1, [0, 1]),
+                   'backward': ([0, -1], [1, -1], 1, [1, 0]),
+                   'improved': ([-2, -1, 1, 2], [1, -8, 8, -1], 1 / 12, [2, 2])}
+
+_second_deriv_stencils = {'symmetric': ([1, 0, -1], [1, -2, 1], 1, [1, 1]),
+                          'big_symmetric': ([2, 0, -2], [1, -2, 1], 1 / 4, [2, 2]),
+                          'improved': ([2, 1, 0, -1, -2], [-1, 16, -30, 16, -1], 1 / 12, [2, 2])}
+
+
+def _solve_periodic_m_eff(ratio, t, T, variant):
+    r"""Solve ratio = f(m (t - T/2)) / f(m (t + 1 - T/2)) for m > 0 and f = cosh or sinh at all timeslices at once.
+
+    The equation is solved in its logarithmic form with a bracketed Newton method.
+
+    Parameters
+    ----------
+    ratio : numpy.ndarray
+        Ratios C(t) / C(t + 1).
+    t : numpy.ndarray
+        Timeslices corresponding to ratio.
+    T : int
+        Temporal extent of the lattice.
+    variant : str
+        'sinh' for f = sinh, f = cosh otherwise.
+
+    Returns
+    -------
+    m : numpy.ndarray
+        Solutions, nan where no positive solution exists.
+    dm : numpy.ndarray
+        Derivatives of the solutions with respect to ratio obtained from the implicit function theorem,
+        $$\frac{\partial m}{\partial r} = \left[r\left(a\frac{f'(ma)}{f(ma)} - b\frac{f'(mb)}{f(mb)}\right)\right]^{-1}$$
+        with a = |t - T/2| and b = |t + 1 - T/2|.
+    """
+    a = np.abs(t - T / 2)
+    b = np.abs(t + 1 - T / 2)
+    sign = np.sign(a - b)
+    if variant == 'sinh':
+        def log_f(x):
+            return x + np.log1p(-np.exp(-2 * x))
+
+        def dlog_f(x):
+            return 1 / np.tanh(x)
+    else:
+        def log_f(x):
+            return np.logaddexp(x, -x)
+
+        def dlog_f(x):
+            return np.tanh(x)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        log_ratio = np.log(ratio)
+
+        def q(m):
+            return sign * (log_f(m * a) - log_f(m * b) - log_ratio)
+
+        def dq(m):
+            return sign * (a * dlog_f(m * a) - b * dlog_f(m * b))
+
+        # q is monotonically increasing in m, a positive root exists if q is negative for m -> 0
+        q_zero = -sign * log_ratio if variant != 'sinh' else sign * (np.log(a / b) - log_ratio)
+        valid = (sign != 0) & np.isfinite(log_ratio) & (q_zero < 0)
+        if variant == 'sinh':
+            valid &= (a > 0) & (b > 0)
+
+        lo = np.zeros_like(log_ratio)
+        hi = np.where(valid & (np.abs(log_ratio) > 0), np.abs(log_ratio), 1.0)
+        for _ in range(64):
+            unbracketed = valid & ~(q(hi) > 0)
+            if not unbracketed.any():
+                break
+            lo = np.where(unbracketed, hi, lo)
+            hi = np.where(unbracketed, 2 * hi, hi)
+        valid &= q(hi) > 0
+
+        m = hi
+        for _ in range(100):
+            q_m = q(m)
+            lo = np.where(q_m < 0, m, lo)
+            hi = np.where(q_m > 0, m, hi)
+            new_m = m - q_m / dq(m)
+            new_m = np.where((new_m > lo) & (new_m < hi), new_m, 0.5 * (lo + hi))
+            converged = (q_m == 0) | (np.abs(new_m - m) <= 4 * np.finfo(float).eps * new_m)
+            m = np.where(q_m == 0, m, new_m)
+            if np.all(converged | ~valid):
+                break
+
+        dm = 1 / (ratio * (a * dlog_f(m * a) - b * dlog_f(m * b)))
+    return np.where(valid, m, np.nan), np.where(valid, dm, np.nan)
+
+
+def _stack_vectors(vectors, T, N):
+    """Stack the projection vectors of several states into a float array of shape (n, T, N).
+
+    Every entry of vectors is either a single vector or a list of T vectors (None for undefined
+    timeslices). Returns the stacked vectors and the mask of the timeslices at which the vectors
+    of all states are defined, or None if the vectors are not real valued.
+    """
+    stacked = np.zeros((len(vectors), T, N))
+    mask = np.ones(T, dtype=bool)
+    for i, vec in enumerate(vectors):
+        if isinstance(vec, list):
+            if len(vec) != T:
+                raise Exception("Length of vector list must be equal to T")
+            for t, v in enumerate(vec):
+                if v is None:
+                    mask[t] = False
+                    continue
+                v = np.asarray(v)
+                if v.dtype.kind not in 'biuf':
+                    return None
+                stacked[i, t] = v
+        else:
+            vec = np.asarray(vec)
+            if vec.dtype.kind not in 'biuf':
+                return None
+            if vec.shape not in [(N,), (T, N)]:
+                raise Exception("Vectors are of wrong shape!")
+            stacked[i] = vec
+    return stacked, mask
+
+
+def _content_items(content):
+    """The timeslices and the Obs in the content of a Corr."""
+    return [(item, None if item is None else tuple(np.ravel(item))) for item in content]
+
+
+def _same_items(content, items):
+    """Checks whether content still consists of the same objects as recorded by _content_items."""
+    if len(content) != len(items):
+        return False
+    for item, (ref, ref_obs) in zip(content, items):
+        if item is not ref:
+            return False
+        if item is not None:
+            flat = np.ravel(item)
+            if len(flat) != len(ref_obs) or any(o is not r for o, r in zip(flat, ref_obs)):
+                return False
+    return True
+
+
 def _check_for_none(corr, entry):
     """Check if entry for correlator corr is None."""
     return len(list(filter(None, np.asarray(entry).flatten()))) < corr.N ** 2
@@ -1600,3 +2178,79 @@ def _GEVP_solver(Gt, G0, method='eigh', chol_inv=None):
 
     elif method == 'eigh':
         return scipy.linalg.eigh(Gt, G0, lower=True)[1].T[::-1]
+
+
+def _GEVP_batch_solver(corr, t0, t_list, method='eigh', vector_obs=False):
+    r"""Solve the GEVP $G(t)v_i=\lambda_i G(t_0)v_i$ for all timeslices in t_list.
+
+    For method 'cholesky' the GEVPs of all timeslices are reduced with the
+    Cholesky decomposition of G(t_0) and solved in one stacked call. If
+    vector_obs is True, the errors of G(t) and G(t_0) are propagated to the
+    eigenvectors via first order perturbation theory.
+
+    Returns
+    -------
+    list
+        For every timeslice in t_list an array containing the eigenvectors
+        (sorted by descending eigenvalue) or None if the GEVP could not be solved.
+    """
+    G0 = np.vectorize(lambda x: x.value)(corr.content[t0])
+    results = {}
+    valid = []
+    for t in t_list:
+        results[t] = None
+        if corr.content[t] is not None and not any(o is None for o in corr.content[t].ravel()):
+            valid.append(t)
+
+    if method != 'cholesky':
+        for t in valid:
+            try:
+                results[t] = _GEVP_solver(np.vectorize(lambda x: x.value)(corr.content[t]), G0, method=method)
+            except Exception:
+                pass
+        return [results[t] for t in t_list]
+
+    chol_inv = np.linalg.inv(np.linalg.cholesky(G0))
+    Gts = np.array([np.vectorize(lambda x: x.value)(corr.content[t]) for t in valid]).reshape(-1, corr.N, corr.N)
+    finite = np.all(np.isfinite(Gts), axis=(1, 2))
+    w = np.full((len(valid), corr.N), np.nan)
+    vecs = np.full((len(valid), corr.N, corr.N), np.nan)
+    if np.any(finite):
+        w[finite], vecs[finite] = _GEVP_cholesky(Gts[finite], chol_inv)
+
+    for i, t in enumerate(valid):
+        if not np.all(np.isfinite(vecs[i])):
+            continue
+        if vector_obs:
+            results[t] = _GEVP_vector_obs(corr.content[t], corr.content[t0], w[i], vecs[i])
+        else:
+            results[t] = vecs[i]
+    return [results[t] for t in t_list]
+
+
+def _GEVP_cholesky(Gts, chol_inv):
+    """Solve the GEVP for a stack of matrices Gts given the inverse Cholesky decomposition of G0.
+
+    Returns the eigenvalues of shape (n, N) in descending order and the
+    eigenvectors of shape (n, N, N) where the second axis labels the states.
+    """
+    w, vecs = np.linalg.eigh(chol_inv @ (Gts @ chol_inv.T))
+    vecs = chol_inv.T @ vecs
+    return w[..., ::-1], np.swapaxes(vecs, -1, -2)[..., ::-1, :]
+
+
+def _GEVP_vector_obs(Gt, G0, w, vecs):
+    r"""Propagate the errors of Gt and G0 to the eigenvectors of the GEVP.
+
+    For eigenvectors normalized as $v_n^T G_0 v_n=1$ the first order perturbation reads
+    $\delta v_n=\sum_{m\neq n} v_m\frac{v_m^T(\delta G_t - \lambda_n\delta G_0)v_n}{\lambda_n-\lambda_m}-\frac{1}{2}v_n v_n^T\delta G_0 v_n$.
+    """
+    with np.errstate(divide='ignore'):
+        coeff = 1 / (w[:, None] - w[None, :])
+    np.fill_diagonal(coeff, 0.0)
+    # a[n, k, i] = sum_m v_m[k] v_m[i] / (lambda_n - lambda_m)
+    a = np.einsum('mk,nm,mi->nki', vecs, coeff, vecs)
+    grad_t = np.einsum('nki,nj->nkij', a, vecs)
+    grad_0 = -w[:, None, None, None] * grad_t - 0.5 * np.einsum('nk,ni,nj->nkij', vecs, vecs, vecs)
+    return derived_observable(lambda x, **kwargs: _GEVP_cholesky(x[1], np.linalg.inv(np.linalg.cholesky(x[0])))[1],
+                              np.array([G0, Gt]), man_grad=np.stack([grad_0, grad_t], axis=2))
@@ -1,4 +1,6 @@
 import gc
+import os
+import concurrent.futures
 from collections.abc import Sequence
 import warnings
 import numpy as np
@@ -14,7 +16,7 @@ from autograd import hessian as auto_hessian
 from autograd import elementwise_grad as egrad
 from numdifftools import Jacobian as num_jacobian
 from numdifftools import Hessian as num_hessian
-from .obs import Obs, derived_observable, covariance, cov_Obs
+from .obs import Obs, derived_observable, covariance, cov_Obs, gamma_method_batch, _covariance_matrix
 
 
 class Fit_result(Sequence):
@@ -43,8 +45,11 @@ class Fit_result(Sequence):
         return len(self.fit_parameters)
 
     def gamma_method(self, **kwargs):
-        """Apply the gamma method to all fit parameters"""
-        [o.gamma_method(**kwargs) for o in self.fit_parameters]
+        """Apply the gamma method to all fit parameters
+
+        See docstring of pe.gamma_method_batch for details on the keyword arguments.
+        """
+        gamma_method_batch(self.fit_parameters, **kwargs)
 
     gm = gamma_method
 
@@ -163,12 +168,26 @@ def least_squares(x, y, func, priors=None, silent=False, **kwargs):
         If True, a quantile-quantile plot of the fit result is generated (default False).
     num_grad : bool
         Use numerical differentation instead of automatic differentiation to perform the error propagation (default False).
+    gauss_newton : bool
+        If True, the hessian of the chisquare and its mixed derivatives with respect to the data and priors are assembled
+        analytically from the Jacobian and the second derivatives of the fit function, exploiting that the chisquare
+        is a sum of squared residuals. Only the fit function is differentiated, which is considerably faster for fits
+        to many data points. The result agrees with the default path up to rounding (default False).
 
     Returns
     -------
     output : Fit_result
         Parameters and information on the fitted result.
     '''
+    return _least_squares(x, y, func, priors=priors, silent=silent, **kwargs)
+
+
+def _least_squares(x, y, func, priors=None, silent=False, n_parms=None, corr=None, **kwargs):
+    """Implementation of least_squares.
+
+    n_parms and corr can be provided to skip the determination of the number of fit
+    parameters and the estimation of the correlation matrix of y for correlated fits.
+    """
     output = Fit_result()
 
     if (isinstance(x, dict) and isinstance(y, dict) and isinstance(func, dict)):
@@ -219,20 +238,11 @@ def least_squares(x, y, func, priors=None, silent=False, **kwargs):
             raise TypeError('func (key=' + key + ') is not a function.')
         if np.asarray(xd[key]).shape[-1] != len(yd[key]):
             raise ValueError('x and y input (key=' + key + ') do not have the same length')
-        for n_loc in range(100):
-            try:
-                funcd[key](np.arange(n_loc), x_all.T[0])
-            except TypeError:
-                continue
-            except IndexError:
-                continue
-            else:
-                break
-        else:
-            raise RuntimeError("Fit function (key=" + key + ") is not valid.")
-        n_parms_ls.append(n_loc)
+        if n_parms is None:
+            n_parms_ls.append(_n_fit_parms(funcd[key], x_all.T[0], key))
 
-    n_parms = max(n_parms_ls)
+    if n_parms is None:
+        n_parms = max(n_parms_ls)
 
     if len(key_ls) > 1:
         for key in key_ls:
@@ -287,21 +297,23 @@ def least_squares(x, y, func, priors=None, silent=False, **kwargs):
     else:
         x0 = [0.1] * n_parms
 
+    def model_all(p):
+        return anp.concatenate([anp.array(funcd[key](p, xd[key])).reshape(-1) for key in key_ls])
+
     if priors is None:
         def general_chisqfunc_uncorr(p, ivars, pr):
-            model = anp.concatenate([anp.array(funcd[key](p, xd[key])).reshape(-1) for key in key_ls])
-            return (ivars - model) / dy_f
+            return (ivars - model_all(p)) / dy_f
     else:
         def general_chisqfunc_uncorr(p, ivars, pr):
-            model = anp.concatenate([anp.array(funcd[key](p, xd[key])).reshape(-1) for key in key_ls])
-            return anp.concatenate(((ivars - model) / dy_f, (p[prior_mask] - pr) / dp_f))
+            return anp.concatenate(((ivars - model_all(p)) / dy_f, (p[prior_mask] - pr) / dp_f))
 
     def chisqfunc_uncorr(p):
         return anp.sum(general_chisqfunc_uncorr(p, y_f, p_f) ** 2)
 
     if kwargs.get('correlated_fit') is True:
 
-        corr = covariance(y_all, correlation=True, **kwargs)
+        if corr is None:
+            corr = covariance(y_all, correlation=True, **kwargs)
 
         # Check condition number.
         if (condn := np.linalg.cond(corr)) > 0.1 / np.finfo(float).eps:
@@ -319,11 +331,8 @@ def least_squares(x, y, func, priors=None, silent=False, **kwargs):
             chol, np.diag(1 / np.asarray(dy_f)), lower=True)
 
         def general_chisqfunc(p, ivars, pr):
-            model = anp.concatenate(
-                [anp.array(funcd[key](p, xd[key])).reshape(-1)
-                 for key in key_ls])
             return anp.concatenate(
-                (anp.dot(chol_inv, (ivars - model)),
+                (anp.dot(chol_inv, (ivars - model_all(p))),
                  (p[prior_mask] - pr) / dp_f))
 
         def chisqfunc(p):
@@ -432,21 +441,31 @@ def least_squares(x, y, func, priors=None, silent=False, **kwargs):
 
     fitp = fit_result.x
 
-    try:
-        hess = hessian(chisqfunc)(fitp)
-    except TypeError:
-        raise Exception("It is required to use autograd.numpy instead of numpy within fit functions, see the documentation for details.") from None
-
     len_y = len(y_f)
 
-    def chisqfunc_compact(d):
-        return anp.sum(general_chisqfunc(d[:n_parms], d[n_parms: n_parms + len_y], d[n_parms + len_y:]) ** 2)
+    if kwargs.get('gauss_newton') is True:
+        if kwargs.get('correlated_fit') is True:
+            weights = chol_inv
+        else:
+            weights = np.diag(1 / np.asarray(dy_f))
+        try:
+            hess, jac_jac_y = _gauss_newton_derivatives(model_all, fitp, y_f, weights, prior_mask, dp_f, jacobian, hessian)
+        except TypeError:
+            raise Exception("It is required to use autograd.numpy instead of numpy within fit functions, see the documentation for details.") from None
+    else:
+        try:
+            hess = hessian(chisqfunc)(fitp)
+        except TypeError:
+            raise Exception("It is required to use autograd.numpy instead of numpy within fit functions, see the documentation for details.") from None
 
-    jac_jac_y = hessian(chisqfunc_compact)(np.concatenate((fitp, y_f, p_f)))
+        def chisqfunc_compact(d):
+            return anp.sum(general_chisqfunc(d[:n_parms], d[n_parms: n_parms + len_y], d[n_parms + len_y:]) ** 2)
 
-    # Compute hess^{-1} @ jac_jac_y[:n_parms + m, n_parms + m:] using LAPACK dgesv
+        jac_jac_y = hessian(chisqfunc_compact)(np.concatenate((fitp, y_f, p_f)))[:n_parms, n_parms:]
+
+    # Compute hess^{-1} @ jac_jac_y using LAPACK dgesv
     try:
-        deriv_y = -scipy.linalg.solve(hess, jac_jac_y[:n_parms, n_parms:])
+        deriv_y = -scipy.linalg.solve(hess, jac_jac_y)
     except np.linalg.LinAlgError:
         raise Exception("Cannot invert hessian matrix.")
 
@@ -477,6 +496,149 @@ def least_squares(x, y, func, priors=None, silent=False, **kwargs):
     return output
 
 
+def least_squares_batch(x_list, y_list, func, priors=None, silent=True, warm_start=True, n_jobs=None, executor=None, **kwargs):
+    r'''Performs the same least squares fit on many datasets, e.g. for a scan over fit ranges.
+
+    Compared to individual calls of least_squares the number of fit parameters
+    is determined only once and for correlated fits the correlation matrix of
+    all Obs which appear in y_list is estimated once and shared between the fits.
+    By default the analytic Gauss-Newton error propagation is used
+    (see least_squares, can be overwritten with gauss_newton=False).
+
+    Parameters
+    ----------
+    x_list : list
+        list of arrays of x values, one for each fit.
+    y_list : list
+        list of lists of Obs, one for each fit.
+    func : object
+        fit function, see least_squares for details. Combined fits are not supported.
+    priors : list or dict, optional
+        priors which are applied to every fit, see least_squares for details.
+    silent : bool, optional
+        If True all output to the console is omitted (default True).
+    warm_start : bool, optional
+        If True every fit is initialized with the parameters of the preceding fit.
+        When the fits are distributed over several workers, the first fit serves
+        as initial guess for all remaining ones (default True).
+    n_jobs : int, optional
+        Number of threads over which the fits are distributed. -1 uses all
+        available cores. Default None (serial computation).
+    executor : concurrent.futures.Executor, optional
+        Executor which is used instead of a thread pool with n_jobs threads.
+
+    All other keyword arguments are passed to least_squares.
+
+    Returns
+    -------
+    output : list[Fit_result]
+        List with the results of the individual fits.
+    '''
+    if len(x_list) != len(y_list):
+        raise ValueError('x_list and y_list do not have the same length.')
+    if len(x_list) == 0:
+        return []
+    if not callable(func):
+        raise TypeError('func has to be a function, combined fits are not supported by least_squares_batch.')
+    if n_jobs is not None and not isinstance(n_jobs, int):
+        raise TypeError("n_jobs has to be an integer.")
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+
+    x_list = [np.asarray(x) for x in x_list]
+    y_list = [np.asarray(y) for y in y_list]
+    kwargs.setdefault('gauss_newton', True)
+    n_parms = _n_fit_parms(func, x_list[0].T[0], '')
+
+    corr_list = [None] * len(y_list)
+    if kwargs.get('correlated_fit') is True and not isinstance(kwargs.get('smooth'), int) and not kwargs.get('visualize'):
+        obs_ids = {}
+        for y in y_list:
+            for o in y:
+                obs_ids.setdefault(id(o), (len(obs_ids), o))
+        all_cov = _covariance_matrix([o for _, o in obs_ids.values()])
+        norm = 1 / np.sqrt(np.diag(all_cov))
+        all_corr = norm[:, None] * all_cov * norm[None, :]
+        for i, y in enumerate(y_list):
+            pos = [obs_ids[id(o)][0] for o in y]
+            corr_list[i] = all_corr[np.ix_(pos, pos)]
+
+    def fit(i, initial_guess=None):
+        fit_kwargs = dict(kwargs)
+        if initial_guess is not None and 'initial_guess' not in kwargs:
+            fit_kwargs['initial_guess'] = initial_guess
+        return _least_squares(x_list[i], y_list[i], func, priors=priors, silent=silent, n_parms=n_parms, corr=corr_list[i], **fit_kwargs)
+
+    n_workers = max(1, n_jobs or 1)
+    if executor is None and n_workers == 1:
+        results = []
+        for i in range(len(x_list)):
+            guess = [o.value for o in results[-1]] if (warm_start and results) else None
+            results.append(fit(i, guess))
+        return results
+
+    results = [fit(0)]
+    guess = [o.value for o in results[0]] if warm_start else None
+    own_executor = None
+    if executor is None:
+        executor = own_executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_workers)
+    try:
+        futures = [executor.submit(fit, i, guess) for i in range(1, len(x_list))]
+        results += [future.result() for future in futures]
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+    return results
+
+
+def _n_fit_parms(func, x, key):
+    """Determines the number of parameters of the fit function func by probing."""
+    for n_loc in range(100):
+        try:
+            func(np.arange(n_loc), x)
+        except TypeError:
+            continue
+        except IndexError:
+            continue
+        else:
+            return n_loc
+    raise RuntimeError("Fit function (key=" + key + ") is not valid.")
+
+
+def _gauss_newton_derivatives(model, p, y, weights, prior_mask, dp, jacobian, hessian):
+    """Analytic second derivatives of a chisquare built from squared residuals.
+
+    The residuals are r = (weights @ (y - model(p)), (p[prior_mask] - priors) / dp).
+    Since r is linear in the data and the priors, only the Jacobian and the
+    second derivatives of the model with respect to the parameters are required.
+
+    Returns
+    -------
+    hess : numpy.ndarray
+        Hessian of the chisquare with respect to the parameters.
+    jac_jac_y : numpy.ndarray
+        Mixed second derivatives of the chisquare with respect to the parameters
+        and the concatenation of data and priors.
+    """
+    n_parms = len(p)
+    model_jac = np.reshape(jacobian(model)(p), (len(y), n_parms))
+    res = weights @ (np.asarray(y) - model(p))
+    weighted_res = weights.T @ res
+
+    prior_jac = np.zeros((len(dp), n_parms))
+    prior_jac[np.arange(len(dp)), prior_mask] = 1 / np.asarray(dp)
+    res_jac = np.concatenate((-weights @ model_jac, prior_jac))
+
+    def weighted_model(q):
+        return anp.dot(weighted_res, model(q))
+
+    model_hess = np.reshape(hessian(weighted_model)(p), (n_parms, n_parms))
+    hess = 2 * (res_jac.T @ res_jac - model_hess)
+
+    jac_jac_y = 2 * np.concatenate((-(weights @ model_jac).T @ weights, -prior_jac.T / np.asarray(dp)), axis=1)
+    return hess, jac_jac_y
+
+
 def total_least_squares(x, y, func, silent=False, **kwargs):
     r'''Performs a non-linear fit to y = func(x) and returns a list of Obs corresponding to the fit parameters.
 
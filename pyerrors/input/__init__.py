@@ -7,6 +7,7 @@ See `pyerrors.obs.Obs.export_jackknife` and `pyerrors.obs.import_jackknife` for
 '''
 from . import bdio
 from . import dobs
+from . import hdf5
 from . import hadrons
 from . import json
 from . import misc
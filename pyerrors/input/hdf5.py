@@ -0,0 +1,259 @@
+import json
+import getpass
+import socket
+import datetime
+import platform
+import numpy as np
+import h5py
+from ..obs import Obs, to_memmap, _intern_idl
+from ..covobs import Covobs
+from ..correlators import Corr
+from ..misc import _assert_equal_properties
+from .. import version as pyerrorsversion
+
+_format_version = '1.0'
+
+
+def dump(ol, fname, description='', compression=None):
+    """Export a list or dict of Obs or structures containing Obs to a binary .h5 or .npz file.
+
+    In contrast to the json format the data is stored in binary form. For every
+    object the fluctuations on each replica are stored as one contiguous array
+    of shape (number of Obs, number of configurations), the configurations as
+    integer array or as (start, stop, step) of a range and the covariance
+    matrices and gradients of covobs as matrices. Every object is stored in a
+    separate group such that selected objects can be loaded without reading the
+    remainder of the file, see `load`.
+
+    Parameters
+    ----------
+    ol : list or dict
+        List or dict (with str keys) of objects that will be exported. At the moment,
+        these objects can be either of: Obs, list, numpy.ndarray, Corr.
+        All Obs inside a structure have to be defined on the same set of configurations.
+    fname : str
+        Filename of the output file. Files ending in .npz are written as numpy zip
+        archives, all other files in the HDF5 format (the suffix .h5 is appended
+        if fname has neither of the suffixes .h5, .hdf5 and .npz).
+    description : str
+        Optional string that describes the contents of the file.
+    compression : str, optional
+        'gzip' or 'lzf' compresses the HDF5 datasets, any other value than None
+        results in a compressed .npz file (default None).
+    """
+    if isinstance(ol, dict):
+        container = 'dict'
+        for key in ol:
+            if not isinstance(key, str) or '/' in key or key == 'metadata':
+                raise ValueError("Keys have to be strings which do not contain '/' and differ from 'metadata'.")
+        items = list(ol.items())
+    else:
+        container = 'list'
+        if not isinstance(ol, list):
+            ol = [ol]
+        items = [(str(i), o) for i, o in enumerate(ol)]
+
+    meta = {'program': 'pyerrors %s' % (pyerrorsversion.__version__),
+            'version': _format_version,
+            'who': getpass.getuser(),
+            'date': datetime.datetime.now().astimezone().strftime('%Y-%m-%d %H:%M:%S %z'),
+            'host': socket.gethostname() + ', ' + platform.platform(),
+            'description': description,
+            'container': container,
+            'keys': [key for key, _ in items]}
+
+    objects = [(key,) + _encode(o) for key, o in items]
+
+    fname = _filename(fname)
+    if fname.endswith('.npz'):
+        arrays = {'metadata': np.array(json.dumps(meta))}
+        for key, o_meta, o_arrays in objects:
+            arrays[key + '/metadata'] = np.array(json.dumps(o_meta))
+            for path, arr in o_arrays.items():
+                arrays[key + '/' + path] = arr
+        if compression is None:
+            np.savez(fname, **arrays)
+        else:
+            np.savez_compressed(fname, **arrays)
+    else:
+        with h5py.File(fname, 'w') as f:
+            f.attrs['metadata'] = json.dumps(meta)
+            for key, o_meta, o_arrays in objects:
+                group = f.create_group(key)
+                group.attrs['metadata'] = json.dumps(o_meta)
+                for path, arr in o_arrays.items():
+                    group.create_dataset(path, data=arr, compression=compression)
+
+
+def load(fname, keys=None, verbose=True, full_output=False, mmap_dir=None):
+    """Import a list or dict of Obs or structures containing Obs from a .h5 or .npz file written by `dump`.
+
+    Parameters
+    ----------
+    fname : str
+        Filename of the input file.
+    keys : list, optional
+        Only the objects with the given keys are loaded, i.e. the positions in the
+        exported list or the keys of the exported dict. By default all objects are loaded.
+    verbose : bool
+        Print additional information that was written to the file.
+    full_output : bool
+        If True, a dict containing auxiliary information and the data is returned.
+        If False, only the data is returned.
+    mmap_dir : str, optional
+        If specified, the deltas of the imported Obs are moved into memory-mapped
+        temporary files in this directory, see `pyerrors.obs.to_memmap`.
+
+    Returns
+    -------
+    result : list or dict
+        reconstructed list (or dict) of objects
+    or
+    result : Obs, list, numpy.ndarray or Corr
+        only one object if a list with one entry was exported
+    or
+    result : dict
+        if full_output=True
+    """
+    fname = _filename(fname)
+    if fname.endswith('.npz'):
+        with np.load(fname, allow_pickle=False) as f:
+            meta = json.loads(str(f['metadata']))
+            selected = _select_keys(meta, keys)
+            data = [_decode(json.loads(str(f[key + '/metadata'])), lambda path, key=key: f[key + '/' + path]) for key in selected]
+    else:
+        with h5py.File(fname, 'r') as f:
+            meta = json.loads(f.attrs['metadata'])
+            selected = _select_keys(meta, keys)
+            data = [_decode(json.loads(f[key].attrs['metadata']), lambda path, key=key: f[key][path][()]) for key in selected]
+
+    if mmap_dir is not None:
+        to_memmap(data, mmap_dir)
+
+    if verbose:
+        print('Data has been written using %s.' % (meta['program']))
+        print('Format version %s' % (meta['version']))
+        print('Written by %s on %s on host %s' % (meta['who'], meta['date'], meta['host']))
+        if meta['description']:
+            print()
+            print('Description: ', meta['description'])
+
+    if meta['container'] == 'dict':
+        data = dict(zip(selected, data))
+    elif keys is None and len(data) == 1 and not full_output:
+        data = data[0]
+
+    if full_output:
+        res = {key: meta[key] for key in ['program', 'version', 'who', 'date', 'host', 'description']}
+        res['obsdata'] = data
+        return res
+    return data
+
+
+def _filename(fname):
+    if not fname.endswith(('.h5', '.hdf5', '.npz')):
+        fname += '.h5'
+    return fname
+
+
+def _select_keys(meta, keys):
+    if keys is None:
+        return meta['keys']
+    selected = [str(key) for key in keys]
+    for key in selected:
+        if key not in meta['keys']:
+            raise KeyError("Object '%s' not contained in the file." % (key))
+    return selected
+
+
+def _encode(o):
+    """Returns the metadata and the arrays of the object o."""
+    if isinstance(o, Obs):
+        meta = {'type': 'Obs', 'shape': []}
+        flat = [o]
+    elif isinstance(o, list):
+        meta = {'type': 'List', 'shape': [len(o)]}
+        flat = o
+    elif isinstance(o, np.ndarray):
+        meta = {'type': 'Array', 'shape': list(o.shape)}
+        flat = list(o.ravel())
+    elif isinstance(o, Corr):
+        defined = [item is not None for item in o.content]
+        if not any(defined):
+            raise ValueError("Corr without defined timeslices cannot be exported.")
+        meta = {'type': 'Corr', 'shape': [sum(defined)] + list(np.shape(o.content[defined.index(True)])),
+                'defined': defined, 'corr_tag': o.tag, 'prange': None if o.prange is None else [int(p) for p in o.prange]}
+        flat = [obs for item in o.content if item is not None for obs in np.ravel(item)]
+    else:
+        raise Exception("Unkown datatype.")
+    _assert_equal_properties(flat)
+
+    first = flat[0]
+    meta['reweighted'] = bool(first.reweighted)
+    tags = [obs.tag for obs in flat]
+    meta['tags'] = tags if any(tag is not None for tag in tags) else None
+
+    arrays = {'value': np.array([obs.value for obs in flat], dtype=float)}
+    meta['replica'] = []
+    for i, r_name in enumerate([name for name in first.names if name not in first.cov_names]):
+        idx = first.idl[r_name]
+        meta['replica'].append({'name': r_name, 'range': [idx.start, idx.stop, idx.step] if isinstance(idx, range) else None})
+        deltas = [np.asarray(obs.deltas[r_name]) for obs in flat]
+        arrays['replica%d/r_values' % i] = np.array([obs.r_values[r_name] for obs in flat], dtype=float)
+        arrays['replica%d/deltas' % i] = np.array(deltas, dtype=np.result_type(*set(d.dtype for d in deltas)))
+        if not isinstance(idx, range):
+            arrays['replica%d/idl' % i] = np.array(idx, dtype=np.int64)
+    meta['covobs'] = first.cov_names
+    for i, c_name in enumerate(first.cov_names):
+        arrays['covobs%d/cov' % i] = first.covobs[c_name].cov
+        arrays['covobs%d/grad' % i] = np.array([obs.covobs[c_name].grad[:, 0] for obs in flat])
+    return meta, arrays
+
+
+def _decode(meta, read):
+    """Reconstructs an object from its metadata and the function read which returns the array stored under a path."""
+    values = read('value')
+    n_obs = len(values)
+    names = []
+    idl = []
+    r_values = []
+    deltas = []
+    for i, rep in enumerate(meta['replica']):
+        names.append(rep['name'])
+        if rep['range'] is not None:
+            idl.append(range(*rep['range']))
+        else:
+            idl.append(_intern_idl([int(cfg) for cfg in read('replica%d/idl' % i)]))
+        r_values.append(read('replica%d/r_values' % i))
+        deltas.append(read('replica%d/deltas' % i))
+    covobs = [(name, read('covobs%d/cov' % i), read('covobs%d/grad' % i)) for i, name in enumerate(meta['covobs'])]
+    tags = meta['tags'] if meta['tags'] is not None else [None] * n_obs
+
+    flat = []
+    for j in range(n_obs):
+        if names:
+            obs = Obs([d[j] for d in deltas], names, idl=idl, means=[r[j] for r in r_values])
+        else:
+            obs = Obs([], [], means=[])
+        obs._value = values[j]
+        for name, cov, grad in covobs:
+            obs._covobs[name] = Covobs(None, cov, name, grad=grad[j])
+            obs.names.append(name)
+        obs.reweighted = meta['reweighted']
+        obs.tag = tags[j]
+        flat.append(obs)
+
+    if meta['type'] == 'Obs':
+        return flat[0]
+    elif meta['type'] == 'List':
+        return flat
+    array = np.empty(len(flat), dtype=object)
+    array[:] = flat
+    array = array.reshape(meta['shape'])
+    if meta['type'] == 'Array':
+        return array
+    content = iter(array)
+    my_corr = Corr([next(content) if defined else None for defined in meta['defined']])
+    my_corr.tag = meta['corr_tag']
+    my_corr.prange = meta['prange']
+    return my_corr
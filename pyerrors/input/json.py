@@ -1,5 +1,9 @@
+import os
+import json as _std_json
 import rapidjson as json
 import gzip
+import concurrent.futures
+from multiprocessing import shared_memory, resource_tracker
 import getpass
 import socket
 import datetime
@@ -7,7 +11,7 @@ import platform
 import warnings
 import re
 import numpy as np
-from ..obs import Obs
+from ..obs import Obs, to_memmap
 from ..covobs import Covobs
 from ..correlators import Corr
 from ..misc import _assert_equal_properties
@@ -38,7 +42,6 @@ def create_json_string(ol, description='', indent=1):
 
     def _gen_data_d_from_list(ol):
         dl = []
-        No = len(ol)
         for name in ol[0].mc_names:
             ed = {}
             ed['id'] = name
@@ -46,12 +49,12 @@ def create_json_string(ol, description='', indent=1):
             for r_name in ol[0].e_content[name]:
                 rd = {}
                 rd['name'] = r_name
-                rd['deltas'] = []
-                offsets = [o.r_values[r_name] - o.value for o in ol]
-                deltas = np.column_stack([ol[oi].deltas[r_name] + offsets[oi] for oi in range(No)])
-                for i in range(len(ol[0].idl[r_name])):
-                    rd['deltas'].append([ol[0].idl[r_name][i]])
-                    rd['deltas'][-1] += deltas[i].tolist()
+                offsets = np.array([o.r_values[r_name] - o.value for o in ol])
+                # Rows [cfg, delta_1, ..., delta_No] built from one stacked block without a loop over the configurations
+                rows = np.empty((len(ol[0].idl[r_name]), len(ol) + 1), dtype=object)
+                rows[:, 0] = list(ol[0].idl[r_name])
+                rows[:, 1:] = np.array([o.deltas[r_name] for o in ol], dtype=np.float64).T + offsets
+                rd['deltas'] = rows.tolist()
                 ed['replica'].append(rd)
             dl.append(ed)
         return dl
@@ -62,13 +65,8 @@ def create_json_string(ol, description='', indent=1):
             ed = {}
             ed['id'] = name
             ed['layout'] = str(ol[0].covobs[name].cov.shape).lstrip('(').rstrip(')').rstrip(',')
-            ed['cov'] = list(np.ravel(ol[0].covobs[name].cov))
-            ncov = ol[0].covobs[name].cov.shape[0]
-            ed['grad'] = []
-            for i in range(ncov):
-                ed['grad'].append([])
-                for o in ol:
-                    ed['grad'][-1].append(o.covobs[name].grad[i][0])
+            ed['cov'] = np.ravel(ol[0].covobs[name].cov).tolist()
+            ed['grad'] = np.array([o.covobs[name].grad[:, 0] for o in ol]).T.tolist()
             dl.append(ed)
         return dl
 
@@ -160,7 +158,8 @@ def create_json_string(ol, description='', indent=1):
         dat['tag']['tag'] = taglist
         if my_corr.prange is not None:
             dat['tag']['prange'] = my_corr.prange
-        return dat
+        # The tag precedes the data such that the entry can be selected before its data is parsed
+        return {key: dat[key] for key in sorted(dat, key=lambda key: key not in ['type', 'layout', 'tag'])}
 
     if not isinstance(ol, list):
         ol = [ol]
@@ -216,7 +215,7 @@ def create_json_string(ol, description='', indent=1):
         return json.dumps(d, indent=indent, ensure_ascii=False, default=_jsonifier, write_mode=json.WM_COMPACT)
 
 
-def dump_to_json(ol, fname, description='', indent=1, gz=True):
+def dump_to_json(ol, fname, description='', indent=1, gz=True, compresslevel=9):
     """Export a list of Obs or structures containing Obs to a .json(.gz) file.
     Dict keys that are not JSON-serializable such as floats are converted to strings.
 
@@ -235,6 +234,8 @@ def dump_to_json(ol, fname, description='', indent=1, gz=True):
         saves disk space.
     gz : bool
         If True, the output is a gzipped json. If False, the output is a json file.
+    compresslevel : int
+        Compression level of gzip between 1 (fastest) and 9 (smallest file), default 9.
 
     Returns
     -------
@@ -250,7 +251,7 @@ def dump_to_json(ol, fname, description='', indent=1, gz=True):
         if not fname.endswith('.gz'):
             fname += '.gz'
 
-        fp = gzip.open(fname, 'wb')
+        fp = gzip.open(fname, 'wb', compresslevel=compresslevel)
         fp.write(jsonstring.encode('utf-8'))
     else:
         fp = open(fname, 'w', encoding='utf-8')
@@ -258,7 +259,7 @@ def dump_to_json(ol, fname, description='', indent=1, gz=True):
     fp.close()
 
 
-def _parse_json_dict(json_dict, verbose=True, full_output=False):
+def _parse_json_dict(json_dict, verbose=True, full_output=False, unpack=True):
     """Reconstruct a list of Obs or structures containing Obs from a dict that
     was built out of a json string.
 
@@ -274,6 +275,8 @@ def _parse_json_dict(json_dict, verbose=True, full_output=False):
     full_output : bool
         If True, a dict containing auxiliary information and the data is returned.
         If False, only the data is returned.
+    unpack : bool
+        If True, a list with only one entry is unpacked.
 
     Returns
     -------
@@ -302,8 +305,13 @@ def _parse_json_dict(json_dict, verbose=True, full_output=False):
                             tmp_list = tmp_list[:len(ens["id"])] + ["|"] + tmp_list[len(ens["id"]):]
                             rep_name = ''.join(tmp_list)
                     retd['names'].append(rep_name)
-                    retd['idl'].append([di[0] for di in rep['deltas']])
-                    retd['deltas'].append(np.array([di[1:] for di in rep['deltas']]))
+                    if isinstance(rep['deltas'], np.ndarray):
+                        # Decoded by the streaming parser
+                        retd['idl'].append(rep['deltas'][:, 0].astype(np.int64).tolist())
+                        retd['deltas'].append(rep['deltas'][:, 1:])
+                    else:
+                        retd['idl'].append([di[0] for di in rep['deltas']])
+                        retd['deltas'].append(np.array([di[1:] for di in rep['deltas']]))
         return retd
 
     def _gen_covobsd_from_cdatad(d):
@@ -331,7 +339,7 @@ def _parse_json_dict(json_dict, verbose=True, full_output=False):
         cd = _gen_covobsd_from_cdatad(o.get('cdata', {}))
 
         if od:
-            ret = Obs([[ddi[0] + values[0] for ddi in di] for di in od['deltas']], od['names'], idl=od['idl'])
+            ret = Obs([di[:, 0] + values[0] for di in od['deltas']], od['names'], idl=od['idl'])
             ret._value = values[0]
         else:
             ret = Obs([], [], means=[])
@@ -356,7 +364,7 @@ def _parse_json_dict(json_dict, verbose=True, full_output=False):
         taglist = o.get('tag', layout * [None])
         for i in range(layout):
             if od:
-                ret.append(Obs([list(di[:, i] + values[i]) for di in od['deltas']], od['names'], idl=od['idl']))
+                ret.append(Obs([di[:, i] + values[i] for di in od['deltas']], od['names'], idl=od['idl']))
                 ret[-1]._value = values[i]
             else:
                 ret.append(Obs([], [], means=[]))
@@ -464,7 +472,7 @@ def _parse_json_dict(json_dict, verbose=True, full_output=False):
 
         return retd
     else:
-        if len(obsdata) == 1:
+        if len(obsdata) == 1 and unpack:
             ol = ol[0]
 
         return ol
@@ -500,7 +508,7 @@ def import_json_string(json_string, verbose=True, full_output=False):
     return _parse_json_dict(json.loads(json_string), verbose, full_output)
 
 
-def load_json(fname, verbose=True, gz=True, full_output=False):
+def load_json(fname, verbose=True, gz=True, full_output=False, mmap_dir=None, streaming=False, indices=None, tags=None):
     """Import a list of Obs or structures containing Obs from a .json(.gz) file.
 
     The following structures are supported: Obs, list, numpy.ndarray, Corr
@@ -517,6 +525,21 @@ def load_json(fname, verbose=True, gz=True, full_output=False):
     full_output : bool
         If True, a dict containing auxiliary information and the data is returned.
         If False, only the data is returned.
+    mmap_dir : str, optional
+        If specified, the deltas of the imported Obs are moved into memory-mapped
+        temporary files in this directory, see `pyerrors.obs.to_memmap`.
+    streaming : bool
+        If True, the file is parsed incrementally. The deltas are decoded directly
+        into numpy arrays and only the remaining small part of the file is handled
+        by the json parser, which considerably reduces the memory footprint and the
+        time needed to read large files (default False).
+    indices : list, optional
+        Only the structures at the given positions in the file are imported.
+    tags : list, optional
+        Only the structures for which one of the tags (the tag of the Corr or one of
+        the tags of the Obs) is contained in tags are imported. If indices and tags
+        are given, the structures selected by either of them are imported. In
+        streaming mode the deltas of the remaining structures are skipped.
 
     Returns
     -------
@@ -524,25 +547,195 @@ def load_json(fname, verbose=True, gz=True, full_output=False):
         reconstructed list of observables from the json string
     or
     result : Obs
-        only one observable if the list only has one entry
+        only one observable if the list only has one entry and no selection is given
     or
     result : dict
         if full_output=True
     """
+    d = _read_json_file(fname, gz, streaming, indices, tags)
+    return _result_from_json_dict(d, verbose, full_output, mmap_dir, indices is not None or tags is not None)
+
+
+def _read_json_file(fname, gz=True, streaming=False, indices=None, tags=None):
+    """Reads the json dict from a .json(.gz) file and removes the entries which are not selected."""
     if not fname.endswith('.json') and not fname.endswith('.gz'):
         fname += '.json'
     if gz:
         if not fname.endswith('.gz'):
             fname += '.gz'
-        with gzip.open(fname, 'r') as fin:
-            d = json.load(fin)
+        if streaming:
+            with gzip.open(fname, 'rt', encoding='utf-8') as fin:
+                d = _stream_json_dict(fin, indices, tags)
+        else:
+            with gzip.open(fname, 'r') as fin:
+                d = json.load(fin)
     else:
         if fname.endswith('.gz'):
             warnings.warn("Trying to read from %s without unzipping!" % fname, UserWarning)
         with open(fname, 'r', encoding='utf-8') as fin:
-            d = json.loads(fin.read())
+            if streaming:
+                d = _stream_json_dict(fin, indices, tags)
+            else:
+                d = json.loads(fin.read())
+
+    if indices is not None or tags is not None:
+        d['obsdata'] = [entry for i, entry in enumerate(d['obsdata']) if _is_selected(entry, i, indices, tags)]
+    return d
+
+
+def _result_from_json_dict(d, verbose, full_output, mmap_dir, select):
+    result = _parse_json_dict(d, verbose, full_output, unpack=not select)
+    if mmap_dir is not None:
+        to_memmap(result['obsdata'] if full_output else result, mmap_dir)
+    return result
+
+
+def _entry_tags(entry):
+    """Returns the list of tags of an obsdata entry."""
+    tag = entry.get('tag')
+    if isinstance(tag, dict):
+        tag = tag.get('tag')
+    return tag if isinstance(tag, list) else []
 
-    return _parse_json_dict(d, verbose, full_output)
+
+def _is_selected(entry, index, indices, tags):
+    """Checks whether the obsdata entry at position index is selected by indices or tags."""
+    if indices is None and tags is None:
+        return True
+    if indices is not None and index in indices:
+        return True
+    return tags is not None and any(tag in tags for tag in _entry_tags(entry) if tag is not None)
+
+
+_deltas_start = re.compile(r'"deltas"\s*:\s*\[')
+_deltas_end = re.compile(r'\]\s*\]')
+_json_tokens = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+_tag_start = re.compile(r'"tag"\s*:\s*')
+_corr_type = re.compile(r'"type"\s*:\s*"Corr"')
+_delimiters = str.maketrans('[],', '   ')
+_raw_decoder = _std_json.JSONDecoder()
+
+
+def _stream_json_dict(fin, indices=None, tags=None, chunk_size=2 ** 22):
+    """Incrementally parse the content of a pyerrors json file from the text stream fin.
+
+    The deltas arrays of the replica in obsdata are decoded chunk by chunk into
+    numpy arrays and replaced by placeholders before the remaining skeleton of
+    the file is handed to the json parser. The deltas of obsdata entries which
+    are selected neither by indices nor by tags are skipped without being decoded.
+    """
+    skeleton = []
+    arrays = []
+    buffer = ''
+    # Start of the text which is not yet part of the skeleton, end of the tracked text and start of the next search
+    pos = tracked = search = 0
+    eof = False
+    # Stack of the opened containers with the keys under which they are stored,
+    # index and text (up to the first deltas) of the current obsdata entry
+    state = {'stack': [], 'key': None, 'index': -1, 'entry': '', 'selected': None}
+
+    def _read():
+        nonlocal buffer, pos, tracked, search, eof
+        chunk = fin.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        tracked -= pos
+        search -= pos
+        pos = 0
+
+    def _track(text):
+        stack = state['stack']
+        entry_start = None
+        for token in _json_tokens.finditer(text):
+            tok = token.group()
+            if tok[0] == '"':
+                state['key'] = tok
+            elif tok in '[{':
+                if tok == '{' and len(stack) == 2 and stack[1] == '["obsdata"':
+                    state['index'] += 1
+                    state['selected'] = None
+                    entry_start = token.start()
+                stack.append(tok + (state['key'] if stack and stack[-1][0] == '{' else ''))
+                state['key'] = None
+            else:
+                stack.pop()
+        if entry_start is not None:
+            state['entry'] = text[entry_start:]
+        elif state['selected'] is None and len(stack) > 2 and stack[1] == '["obsdata"':
+            state['entry'] += text
+
+    def _in_replica():
+        # root{ obsdata[ entry{ data[ ensemble{ replica[ replica{
+        return state['stack'][1::2] == ['["obsdata"', '["data"', '["replica"'] and len(state['stack']) == 7
+
+    def _selected():
+        if state['selected'] is None:
+            state['selected'] = (indices is None and tags is None) or (indices is not None and state['index'] in indices)
+            if not state['selected'] and tags is not None:
+                match = _tag_start.search(state['entry'])
+                if match is None:
+                    # Older versions wrote the tag of a Corr after its data, in this case the
+                    # deltas are decoded and the entry is selected after parsing.
+                    state['selected'] = _corr_type.search(state['entry']) is not None
+                else:
+                    tag = _raw_decoder.raw_decode(state['entry'], match.end())[0]
+                    state['selected'] = _is_selected({'tag': tag}, state['index'], None, tags)
+        return state['selected']
+
+    while True:
+        match = _deltas_start.search(buffer, search)
+        if match is None:
+            if eof:
+                break
+            # Keep a possibly incomplete match at the end of the buffer
+            search = max(search, len(buffer) - 64)
+            _read()
+            continue
+        _track(buffer[tracked:match.start()])
+        tracked = match.start()
+        if not _in_replica():
+            # A deltas key in the description or a tag is part of the skeleton
+            search = match.start() + 1
+            continue
+        skeleton.append(buffer[pos:match.start()])
+        selected = _selected()
+        pos = match.end()
+        rows = []
+        n_cols = None
+        while True:
+            end = _deltas_end.search(buffer, pos)
+            # The closing bracket of the last complete row is kept in the buffer to detect the end of the block
+            stop = end.start() + 1 if end is not None else buffer.rfind(']', pos)
+            if stop > pos:
+                text = buffer[pos:stop]
+                if selected and text.strip(' \n\t,]'):
+                    if n_cols is None:
+                        n_cols = text[text.index('['):].split(']')[0].count(',') + 1
+                    flat = np.fromstring(text.translate(_delimiters), sep=' ')
+                    if len(flat) % n_cols:
+                        raise ValueError('Malformed deltas in json file.')
+                    rows.append(flat.reshape(-1, n_cols))
+                pos = stop
+            if end is not None:
+                pos = tracked = search = end.end()
+                break
+            if eof:
+                raise ValueError('Unexpected end of file within deltas.')
+            _read()
+        if selected:
+            arrays.append(rows[0] if len(rows) == 1 else np.concatenate(rows))
+            skeleton.append('"deltas": %d' % (len(arrays) - 1))
+        else:
+            skeleton.append('"deltas": -1')
+    skeleton.append(buffer[pos:])
+
+    d = json.loads(''.join(skeleton))
+    for entry in d['obsdata']:
+        for ens in entry.get('data', []):
+            for rep in ens['replica']:
+                if rep['deltas'] >= 0:
+                    rep['deltas'] = arrays[rep['deltas']]
+    return d
 
 
 def _ol_from_dict(ind, reps='DICTOBS'):
@@ -625,7 +818,7 @@ def _ol_from_dict(ind, reps='DICTOBS'):
     return ol, nd
 
 
-def dump_dict_to_json(od, fname, description='', indent=1, reps='DICTOBS', gz=True):
+def dump_dict_to_json(od, fname, description='', indent=1, reps='DICTOBS', gz=True, compresslevel=9):
     """Export a dict of Obs or structures containing Obs to a .json(.gz) file
 
     Parameters
@@ -645,6 +838,8 @@ def dump_dict_to_json(od, fname, description='', indent=1, reps='DICTOBS', gz=Tr
         Specify the structure of the placeholder in exported dict to be reps[0-9]+.
     gz : bool
         If True, the output is a gzipped json. If False, the output is a json file.
+    compresslevel : int
+        Compression level of gzip between 1 (fastest) and 9 (smallest file), default 9.
 
     Returns
     -------
@@ -662,7 +857,7 @@ def dump_dict_to_json(od, fname, description='', indent=1, reps='DICTOBS', gz=Tr
     desc_dict = {'INFO': infostring, 'OBSDICT': {}, 'description': description}
     ol, desc_dict['OBSDICT'] = _ol_from_dict(od, reps=reps)
 
-    dump_to_json(ol, fname, description=desc_dict, indent=indent, gz=gz)
+    dump_to_json(ol, fname, description=desc_dict, indent=indent, gz=gz, compresslevel=compresslevel)
 
 
 def _od_from_list_and_dict(ol, ind, reps='DICTOBS'):
@@ -728,7 +923,7 @@ def _od_from_list_and_dict(ol, ind, reps='DICTOBS'):
     return nd
 
 
-def load_json_dict(fname, verbose=True, gz=True, full_output=False, reps='DICTOBS'):
+def load_json_dict(fname, verbose=True, gz=True, full_output=False, reps='DICTOBS', mmap_dir=None, streaming=False):
     """Import a dict of Obs or structures containing Obs from a .json(.gz) file.
 
     The following structures are supported: Obs, list, numpy.ndarray, Corr
@@ -746,6 +941,11 @@ def load_json_dict(fname, verbose=True, gz=True, full_output=False, reps='DICTOB
         If False, only the data is returned.
     reps : str
         Specify the structure of the placeholder in imported dict to be reps[0-9]+.
+    mmap_dir : str, optional
+        If specified, the deltas of the imported Obs are moved into memory-mapped
+        temporary files in this directory, see `pyerrors.obs.to_memmap`.
+    streaming : bool
+        If True, the file is parsed incrementally, see `load_json` (default False).
 
     Returns
     -------
@@ -755,7 +955,11 @@ def load_json_dict(fname, verbose=True, gz=True, full_output=False, reps='DICTOB
     data : dict
         Read data and meta-data
     """
-    indata = load_json(fname, verbose=verbose, gz=gz, full_output=True)
+    indata = load_json(fname, verbose=verbose, gz=gz, full_output=True, mmap_dir=mmap_dir, streaming=streaming)
+    return _od_from_json_output(indata, full_output, reps)
+
+
+def _od_from_json_output(indata, full_output, reps):
     description = indata['description']['description']
     indict = indata['description']['OBSDICT']
     ol = indata['obsdata']
@@ -767,3 +971,119 @@ def load_json_dict(fname, verbose=True, gz=True, full_output=False, reps='DICTOB
         return indata
     else:
         return od
+
+
+def load_many(paths, n_jobs=-1, as_dict=False, verbose=True, gz=True, full_output=False, mmap_dir=None, reps='DICTOBS', indices=None, tags=None):
+    """Import the content of many .json(.gz) files in parallel.
+
+    The files are decompressed and parsed in a pool of processes with the
+    streaming parser of `load_json`. The deltas are transferred back to the main
+    process via shared memory, where the Obs are constructed.
+
+    Parameters
+    ----------
+    paths : list
+        List of filenames of the input files.
+    n_jobs : int, optional
+        Number of processes over which the files are distributed. -1 uses all
+        available cores, None reads the files one after another in the main
+        process (default -1).
+    as_dict : bool
+        If True, the files are assumed to be written with `dump_dict_to_json`
+        and are imported as with `load_json_dict`, otherwise as with `load_json`.
+    verbose : bool
+        Print additional information that was written to the files.
+    gz : bool
+        If True, assumes that data is gzipped. If False, assumes JSON file.
+    full_output : bool
+        If True, a dict containing auxiliary information and the data is returned
+        for every file. If False, only the data is returned.
+    mmap_dir : str, optional
+        If specified, the deltas of the imported Obs are moved into memory-mapped
+        temporary files in this directory, see `pyerrors.obs.to_memmap`.
+    reps : str
+        Specify the structure of the placeholder in imported dicts to be reps[0-9]+,
+        only used if as_dict=True.
+    indices : list, optional
+        Selects the structures by their position in every file, see `load_json`.
+    tags : list, optional
+        Selects the structures by their tags in every file, see `load_json`.
+
+    Returns
+    -------
+    result : list
+        The results of `load_json` (or `load_json_dict`) for every file, in the
+        order of paths.
+    """
+    if n_jobs is not None and not isinstance(n_jobs, int):
+        raise TypeError("n_jobs has to be an integer.")
+    if as_dict and (indices is not None or tags is not None):
+        raise ValueError("indices and tags are not supported for the import of dicts.")
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    select = indices is not None or tags is not None
+
+    def _result(d):
+        if as_dict:
+            return _od_from_json_output(_result_from_json_dict(d, verbose, True, mmap_dir, select), full_output, reps)
+        return _result_from_json_dict(d, verbose, full_output, mmap_dir, select)
+
+    if n_jobs is None or n_jobs < 2 or len(paths) < 2:
+        return [_result(_read_json_file(fname, gz, True, indices, tags)) for fname in paths]
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(n_jobs, len(paths))) as executor:
+        futures = [executor.submit(_load_to_shared_memory, fname, gz, indices, tags) for fname in paths]
+        try:
+            for future in futures:
+                results.append(_result(_load_from_shared_memory(*future.result())))
+        except BaseException:
+            # Release the shared memory of the files which have not been processed
+            for future in futures[len(results) + 1:]:
+                future.cancel()
+                if not future.cancelled() and future.exception() is None:
+                    _load_from_shared_memory(*future.result())
+            raise
+    return results
+
+
+def _replica_of_json_dict(d):
+    return [rep for entry in d['obsdata'] for ens in entry.get('data', []) for rep in ens['replica']]
+
+
+def _load_to_shared_memory(fname, gz, indices, tags):
+    """Parses the file in a worker process and moves the deltas into one block of shared memory.
+
+    The deltas in the dict are replaced by their offset and shape in the shared memory.
+    """
+    d = _read_json_file(fname, gz, True, indices, tags)
+    replica = _replica_of_json_dict(d)
+    size = sum(rep['deltas'].nbytes for rep in replica)
+    if size == 0:
+        return d, None
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    offset = 0
+    for rep in replica:
+        deltas = rep['deltas']
+        np.ndarray(deltas.shape, dtype=np.float64, buffer=shm.buf, offset=offset)[:] = deltas
+        rep['deltas'] = [offset, deltas.shape]
+        offset += deltas.nbytes
+    shm.close()
+    # The main process takes over the ownership of the shared memory and unlinks it
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return d, shm.name
+
+
+def _load_from_shared_memory(d, name):
+    """Copies the deltas from the shared memory block into the dict and releases the shared memory."""
+    if name is None:
+        return d
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        for rep in _replica_of_json_dict(d):
+            offset, shape = rep['deltas']
+            rep['deltas'] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=offset).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return d
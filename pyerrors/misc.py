@@ -176,10 +176,12 @@ def gen_correlated_data(means, cov, name, tau=0.5, samples=1000):
 
 def _assert_equal_properties(ol, otype=Obs):
     otype = type(ol[0])
+    reference = {attr: getattr(ol[0], attr) for attr in ["reweighted", "e_content", "idl"] if hasattr(ol[0], attr)}
     for o in ol[1:]:
+        if o is ol[0]:
+            continue
         if not isinstance(o, otype):
             raise Exception("Wrong data type in list.")
-        for attr in ["reweighted", "e_content", "idl"]:
-            if hasattr(ol[0], attr):
-                if not getattr(ol[0], attr) == getattr(o, attr):
-                    raise Exception(f"All Obs in list have to have the same state '{attr}'.")
+        for attr, value in reference.items():
+            if not value == getattr(o, attr):
+                raise Exception(f"All Obs in list have to have the same state '{attr}'.")
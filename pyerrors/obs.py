@@ -1,6 +1,16 @@
+import os
+import sys
+import tempfile
 import warnings
 import hashlib
+import concurrent.futures
+import functools
+import threading
+import contextlib
 import pickle
+import weakref
+import itertools
+import collections
 import numpy as np
 import autograd.numpy as anp  # Thinly-wrapped numpy
 import scipy
@@ -43,12 +53,17 @@ class Obs:
     N_sigma_dict : dict
         Dictionary for N_sigma values. If an entry for a given ensemble exists
         this overwrites the standard value for that ensemble.
+    deltas_dtype : numpy.dtype
+        dtype in which the deltas of newly created Obs are stored (default None,
+        no conversion). np.float32 halves the memory footprint of the Obs, the
+        gamma method always accumulates in double precision. See also
+        `compact_storage` and `memory_report`.
     """
     __slots__ = ['names', 'shape', 'r_values', 'deltas', 'N', '_value', '_dvalue',
                  'ddvalue', 'reweighted', 'S', 'tau_exp', 'N_sigma',
                  'e_dvalue', 'e_ddvalue', 'e_tauint', 'e_dtauint',
                  'e_windowsize', 'e_rho', 'e_drho', 'e_n_tauint', 'e_n_dtauint',
-                 'idl', 'tag', '_covobs', '__dict__']
+                 'idl', 'tag', '_covobs', '__dict__', '_lazy']
 
     S_global = 2.0
     S_dict = {}
@@ -56,6 +71,7 @@ class Obs:
     tau_exp_dict = {}
     N_sigma_global = 1.0
     N_sigma_dict = {}
+    deltas_dtype = None
 
     def __init__(self, samples, names, idl=None, **kwargs):
         """ Initialize Obs object.
@@ -68,6 +84,11 @@ class Obs:
             list of strings labeling the individual samples
         idl : list, optional
             list of ranges or lists on which the samples are defined
+
+        Notes
+        -----
+        Samples which are numpy.memmap instances result in memory-mapped deltas,
+        see `to_memmap`.
         """
 
         if kwargs.get("means") is None and len(samples):
@@ -101,6 +122,8 @@ class Obs:
             for name, idx in sorted(zip(names, idl)):
                 if isinstance(idx, range):
                     self.idl[name] = idx
+                elif _is_interned(idx):
+                    self.idl[name] = idx
                 elif isinstance(idx, (list, np.ndarray)):
                     dc = np.unique(np.diff(idx))
                     if np.any(dc < 0):
@@ -110,7 +133,7 @@ class Obs:
                     if len(dc) == 1:
                         self.idl[name] = range(idx[0], idx[-1] + dc[0], dc[0])
                     else:
-                        self.idl[name] = list(idx)
+                        self.idl[name] = _intern_idl(idx)
                 else:
                     raise TypeError('incompatible type for idl[%s].' % (name))
         else:
@@ -122,7 +145,7 @@ class Obs:
                 self.shape[name] = len(self.idl[name])
                 self.N += self.shape[name]
                 self.r_values[name] = mean
-                self.deltas[name] = sample
+                self.deltas[name] = _store_deltas(sample)
         else:
             for name, sample in sorted(zip(names, samples)):
                 self.shape[name] = len(self.idl[name])
@@ -130,7 +153,10 @@ class Obs:
                 if len(sample) != self.shape[name]:
                     raise ValueError('Incompatible samples and idx for %s: %d vs. %d' % (name, len(sample), self.shape[name]))
                 self.r_values[name] = np.mean(sample)
-                self.deltas[name] = sample - self.r_values[name]
+                if isinstance(sample, np.memmap):
+                    self.deltas[name] = _memmap_map(lambda x: x - self.r_values[name], sample)
+                else:
+                    self.deltas[name] = _store_deltas(sample - self.r_values[name])
                 self._value += self.shape[name] * self.r_values[name]
             self._value /= self.N
 
@@ -173,6 +199,23 @@ class Obs:
     def covobs(self):
         return self._covobs
 
+    def __getattr__(self, name):
+        # Only called for attributes which are not set, e.g. the deferred attributes of a lazy Obs.
+        if name == '_lazy':
+            return None
+        if name in Obs.__slots__ and self._lazy is not None:
+            _materialize(self)
+            return getattr(self, name)
+        raise AttributeError(f"'Obs' object has no attribute '{name}'")
+
+    def __setstate__(self, state):
+        # Unpickled and copied Obs share the interned lists of configurations.
+        for part in (state if isinstance(state, tuple) else (state,)):
+            for key, value in (part or {}).items():
+                setattr(self, key, value)
+        if isinstance(state, tuple) and 'idl' in (state[1] or {}):
+            self.idl = {name: _intern_idl(idx) for name, idx in self.idl.items()}
+
     def gamma_method(self, **kwargs):
         """Estimate the error and related properties of the Obs.
 
@@ -194,7 +237,38 @@ class Obs:
             of the autocorrelation function (default True)
         """
 
+        fft = self._init_gamma_method(kwargs)
+
         e_content = self.e_content
+        for e, e_name in enumerate(self.mc_names):
+            gapsize = _determine_gap(self, e_content, e_name)
+
+            r_length = []
+            for r_name in e_content[e_name]:
+                if isinstance(self.idl[r_name], range):
+                    r_length.append(len(self.idl[r_name]) * self.idl[r_name].step // gapsize)
+                else:
+                    r_length.append((self.idl[r_name][-1] - self.idl[r_name][0] + 1) // gapsize)
+
+            e_N = np.sum([self.shape[r_name] for r_name in e_content[e_name]])
+            w_max = max(r_length) // 2
+            e_gamma = np.zeros(w_max)
+
+            for r_name in e_content[e_name]:
+                e_gamma += self._calc_gamma(self.deltas[r_name], self.idl[r_name], self.shape[r_name], w_max, fft, gapsize)
+
+            e_gamma /= _gamma_div(tuple(_idl_key(self.idl[r_name]) for r_name in e_content[e_name]), w_max, fft, gapsize)
+
+            self._compute_window(e_name, e_gamma, e_N, w_max)
+
+        self._finalize_gamma_method()
+        return
+
+    def _init_gamma_method(self, kwargs):
+        """Reset the results of the gamma method and parse its keyword arguments.
+
+        Returns whether the fft algorithm is to be used.
+        """
         self.e_dvalue = {}
         self.e_ddvalue = {}
         self.e_tauint = {}
@@ -202,7 +276,6 @@ class Obs:
         self.e_windowsize = {}
         self.e_n_tauint = {}
         self.e_n_dtauint = {}
-        e_gamma = {}
         self.e_rho = {}
         self.e_drho = {}
         self._dvalue = 0
@@ -217,18 +290,20 @@ class Obs:
         else:
             fft = True
 
+        e_names = self.e_names
+
         def _parse_kwarg(kwarg_name):
             if kwarg_name in kwargs:
                 tmp = kwargs.get(kwarg_name)
                 if isinstance(tmp, (int, float)):
                     if tmp < 0:
                         raise Exception(kwarg_name + ' has to be larger or equal to 0.')
-                    for e, e_name in enumerate(self.e_names):
+                    for e_name in e_names:
                         getattr(self, kwarg_name)[e_name] = tmp
                 else:
                     raise TypeError(kwarg_name + ' is not in proper format.')
             else:
-                for e, e_name in enumerate(self.e_names):
+                for e_name in e_names:
                     if e_name in getattr(Obs, kwarg_name + '_dict'):
                         getattr(self, kwarg_name)[e_name] = getattr(Obs, kwarg_name + '_dict')[e_name]
                     else:
@@ -238,92 +313,89 @@ class Obs:
         _parse_kwarg('tau_exp')
         _parse_kwarg('N_sigma')
 
-        for e, e_name in enumerate(self.mc_names):
-            gapsize = _determine_gap(self, e_content, e_name)
-
-            r_length = []
-            for r_name in e_content[e_name]:
-                if isinstance(self.idl[r_name], range):
-                    r_length.append(len(self.idl[r_name]) * self.idl[r_name].step // gapsize)
-                else:
-                    r_length.append((self.idl[r_name][-1] - self.idl[r_name][0] + 1) // gapsize)
-
-            e_N = np.sum([self.shape[r_name] for r_name in e_content[e_name]])
-            w_max = max(r_length) // 2
-            e_gamma[e_name] = np.zeros(w_max)
-            self.e_rho[e_name] = np.zeros(w_max)
-            self.e_drho[e_name] = np.zeros(w_max)
-
-            for r_name in e_content[e_name]:
-                e_gamma[e_name] += self._calc_gamma(self.deltas[r_name], self.idl[r_name], self.shape[r_name], w_max, fft, gapsize)
+        return fft
 
-            gamma_div = np.zeros(w_max)
-            for r_name in e_content[e_name]:
-                gamma_div += self._calc_gamma(np.ones((self.shape[r_name])), self.idl[r_name], self.shape[r_name], w_max, fft, gapsize)
-            gamma_div[gamma_div < 1] = 1.0
-            e_gamma[e_name] /= gamma_div[:w_max]
+    def _compute_window(self, e_name, e_gamma, e_N, w_max):
+        """Determine the summation window and the error contribution of ensemble e_name.
 
-            if np.abs(e_gamma[e_name][0]) < 10 * np.finfo(float).tiny:  # Prevent division by zero
+        Parameters
+        ----------
+        e_name : str
+            Name of the ensemble.
+        e_gamma : numpy.ndarray
+            Normalized autocorrelation function of the ensemble.
+        e_N : int
+            Number of configurations of the ensemble.
+        w_max : int
+            Upper bound for the summation window.
+        """
+        self.e_rho[e_name] = np.zeros(w_max)
+        self.e_drho[e_name] = np.zeros(w_max)
+
+        if np.abs(e_gamma[0]) < 10 * np.finfo(float).tiny:  # Prevent division by zero
+            self.e_tauint[e_name] = 0.5
+            self.e_dtauint[e_name] = 0.0
+            self.e_dvalue[e_name] = 0.0
+            self.e_ddvalue[e_name] = 0.0
+            self.e_windowsize[e_name] = 0
+            return
+
+        self.e_rho[e_name] = e_gamma[:w_max] / e_gamma[0]
+        self.e_n_tauint[e_name] = np.cumsum(np.concatenate(([0.5], self.e_rho[e_name][1:])))
+        # Make sure no entry of tauint is smaller than 0.5
+        self.e_n_tauint[e_name][self.e_n_tauint[e_name] <= 0.5] = 0.5 + np.finfo(np.float64).eps
+        # hep-lat/0306017 eq. (42)
+        self.e_n_dtauint[e_name] = self.e_n_tauint[e_name] * 2 * np.sqrt(np.abs(np.arange(w_max) + 0.5 - self.e_n_tauint[e_name]) / e_N)
+        self.e_n_dtauint[e_name][0] = 0.0
+
+        def _compute_drho(i):
+            self.e_drho[e_name][i] = _drho(self.e_rho[e_name], i, w_max, e_N)
+
+        if self.tau_exp[e_name] > 0:
+            _compute_drho(1)
+            texp = self.tau_exp[e_name]
+            # Critical slowing down analysis
+            if w_max // 2 <= 1:
+                raise Exception("Need at least 8 samples for tau_exp error analysis")
+            for n in range(1, w_max // 2):
+                _compute_drho(n + 1)
+                if (self.e_rho[e_name][n] - self.N_sigma[e_name] * self.e_drho[e_name][n]) < 0 or n >= w_max // 2 - 2:
+                    # Bias correction hep-lat/0306017 eq. (49) included
+                    self.e_tauint[e_name] = self.e_n_tauint[e_name][n] * (1 + (2 * n + 1) / e_N) / (1 + 1 / e_N) + texp * np.abs(self.e_rho[e_name][n + 1])  # The absolute makes sure, that the tail contribution is always positive
+                    self.e_dtauint[e_name] = np.sqrt(self.e_n_dtauint[e_name][n] ** 2 + texp ** 2 * self.e_drho[e_name][n + 1] ** 2)
+                    # Error of tau_exp neglected so far, missing term: self.e_rho[e_name][n + 1] ** 2 * d_tau_exp ** 2
+                    self.e_dvalue[e_name] = np.sqrt(2 * self.e_tauint[e_name] * e_gamma[0] * (1 + 1 / e_N) / e_N)
+                    self.e_ddvalue[e_name] = self.e_dvalue[e_name] * np.sqrt((n + 0.5) / e_N)
+                    self.e_windowsize[e_name] = n
+                    break
+        else:
+            if self.S[e_name] == 0.0:
                 self.e_tauint[e_name] = 0.5
                 self.e_dtauint[e_name] = 0.0
-                self.e_dvalue[e_name] = 0.0
-                self.e_ddvalue[e_name] = 0.0
+                self.e_dvalue[e_name] = np.sqrt(e_gamma[0] / (e_N - 1))
+                self.e_ddvalue[e_name] = self.e_dvalue[e_name] * np.sqrt(0.5 / e_N)
                 self.e_windowsize[e_name] = 0
-                continue
-
-            self.e_rho[e_name] = e_gamma[e_name][:w_max] / e_gamma[e_name][0]
-            self.e_n_tauint[e_name] = np.cumsum(np.concatenate(([0.5], self.e_rho[e_name][1:])))
-            # Make sure no entry of tauint is smaller than 0.5
-            self.e_n_tauint[e_name][self.e_n_tauint[e_name] <= 0.5] = 0.5 + np.finfo(np.float64).eps
-            # hep-lat/0306017 eq. (42)
-            self.e_n_dtauint[e_name] = self.e_n_tauint[e_name] * 2 * np.sqrt(np.abs(np.arange(w_max) + 0.5 - self.e_n_tauint[e_name]) / e_N)
-            self.e_n_dtauint[e_name][0] = 0.0
-
-            def _compute_drho(i):
-                tmp = (self.e_rho[e_name][i + 1:w_max]
-                       + np.concatenate([self.e_rho[e_name][i - 1:None if i - (w_max - 1) // 2 <= 0 else (2 * i - (2 * w_max) // 2):-1],
-                                         self.e_rho[e_name][1:max(1, w_max - 2 * i)]])
-                       - 2 * self.e_rho[e_name][i] * self.e_rho[e_name][1:w_max - i])
-                self.e_drho[e_name][i] = np.sqrt(np.sum(tmp ** 2) / e_N)
-
-            if self.tau_exp[e_name] > 0:
-                _compute_drho(1)
-                texp = self.tau_exp[e_name]
-                # Critical slowing down analysis
-                if w_max // 2 <= 1:
-                    raise Exception("Need at least 8 samples for tau_exp error analysis")
-                for n in range(1, w_max // 2):
-                    _compute_drho(n + 1)
-                    if (self.e_rho[e_name][n] - self.N_sigma[e_name] * self.e_drho[e_name][n]) < 0 or n >= w_max // 2 - 2:
-                        # Bias correction hep-lat/0306017 eq. (49) included
-                        self.e_tauint[e_name] = self.e_n_tauint[e_name][n] * (1 + (2 * n + 1) / e_N) / (1 + 1 / e_N) + texp * np.abs(self.e_rho[e_name][n + 1])  # The absolute makes sure, that the tail contribution is always positive
-                        self.e_dtauint[e_name] = np.sqrt(self.e_n_dtauint[e_name][n] ** 2 + texp ** 2 * self.e_drho[e_name][n + 1] ** 2)
-                        # Error of tau_exp neglected so far, missing term: self.e_rho[e_name][n + 1] ** 2 * d_tau_exp ** 2
-                        self.e_dvalue[e_name] = np.sqrt(2 * self.e_tauint[e_name] * e_gamma[e_name][0] * (1 + 1 / e_N) / e_N)
-                        self.e_ddvalue[e_name] = self.e_dvalue[e_name] * np.sqrt((n + 0.5) / e_N)
-                        self.e_windowsize[e_name] = n
-                        break
             else:
-                if self.S[e_name] == 0.0:
-                    self.e_tauint[e_name] = 0.5
-                    self.e_dtauint[e_name] = 0.0
-                    self.e_dvalue[e_name] = np.sqrt(e_gamma[e_name][0] / (e_N - 1))
-                    self.e_ddvalue[e_name] = self.e_dvalue[e_name] * np.sqrt(0.5 / e_N)
-                    self.e_windowsize[e_name] = 0
-                else:
-                    # Standard automatic windowing procedure
-                    tau = self.S[e_name] / np.log((2 * self.e_n_tauint[e_name][1:] + 1) / (2 * self.e_n_tauint[e_name][1:] - 1))
-                    g_w = np.exp(- np.arange(1, len(tau) + 1) / tau) - tau / np.sqrt(np.arange(1, len(tau) + 1) * e_N)
-                    for n in range(1, w_max):
-                        if g_w[n - 1] < 0 or n >= w_max - 1:
-                            _compute_drho(n)
-                            self.e_tauint[e_name] = self.e_n_tauint[e_name][n] * (1 + (2 * n + 1) / e_N) / (1 + 1 / e_N)  # Bias correction hep-lat/0306017 eq. (49)
-                            self.e_dtauint[e_name] = self.e_n_dtauint[e_name][n]
-                            self.e_dvalue[e_name] = np.sqrt(2 * self.e_tauint[e_name] * e_gamma[e_name][0] * (1 + 1 / e_N) / e_N)
-                            self.e_ddvalue[e_name] = self.e_dvalue[e_name] * np.sqrt((n + 0.5) / e_N)
-                            self.e_windowsize[e_name] = n
-                            break
+                # Standard automatic windowing procedure
+                tau = self.S[e_name] / np.log((2 * self.e_n_tauint[e_name][1:] + 1) / (2 * self.e_n_tauint[e_name][1:] - 1))
+                g_w = np.exp(- np.arange(1, len(tau) + 1) / tau) - tau / np.sqrt(np.arange(1, len(tau) + 1) * e_N)
+                for n in range(1, w_max):
+                    if g_w[n - 1] < 0 or n >= w_max - 1:
+                        self._set_window(e_name, n, e_gamma[0], e_N, w_max)
+                        break
 
+    def _set_window(self, e_name, n, gamma_0, e_N, w_max):
+        """Set the results of the automatic windowing procedure for the window n."""
+        self.e_drho[e_name][n] = _drho(self.e_rho[e_name], n, w_max, e_N)
+        self.e_tauint[e_name] = self.e_n_tauint[e_name][n] * (1 + (2 * n + 1) / e_N) / (1 + 1 / e_N)  # Bias correction hep-lat/0306017 eq. (49)
+        self.e_dtauint[e_name] = self.e_n_dtauint[e_name][n]
+        self.e_dvalue[e_name] = np.sqrt(2 * self.e_tauint[e_name] * gamma_0 * (1 + 1 / e_N) / e_N)
+        self.e_ddvalue[e_name] = self.e_dvalue[e_name] * np.sqrt((n + 0.5) / e_N)
+        self.e_windowsize[e_name] = n
+
+    def _finalize_gamma_method(self):
+        """Combine the error contributions of all ensembles and covobs."""
+        for e_name in self.mc_names:
             self._dvalue += self.e_dvalue[e_name] ** 2
             self.ddvalue += (self.e_dvalue[e_name] * self.e_ddvalue[e_name]) ** 2
 
@@ -337,7 +409,6 @@ class Obs:
             self.ddvalue = 0.0
         else:
             self.ddvalue = np.sqrt(self.ddvalue) / self._dvalue
-        return
 
     gm = gamma_method
 
@@ -362,20 +433,7 @@ class Obs:
             The target distance between two configurations. If longer distances
             are found in idx, the data is expanded.
         """
-        gamma = np.zeros(w_max)
-        deltas = _expand_deltas(deltas, idx, shape, gapsize)
-        new_shape = len(deltas)
-        if fft:
-            max_gamma = min(new_shape, w_max)
-            # The padding for the fft has to be even
-            padding = new_shape + max_gamma + (new_shape + max_gamma) % 2
-            gamma[:max_gamma] += np.fft.irfft(np.abs(np.fft.rfft(deltas, padding)) ** 2)[:max_gamma]
-        else:
-            for n in range(w_max):
-                if new_shape - n >= 0:
-                    gamma[n] += deltas[0:new_shape - n].dot(deltas[n:new_shape])
-
-        return gamma
+        return _calc_gamma(deltas, idx, shape, w_max, fft, gapsize)
 
     def details(self, ens_content=True):
         """Output detailed properties of the Obs.
@@ -788,7 +846,7 @@ class Obs:
                 return np.array([self + o for o in y])
             elif isinstance(y, complex):
                 return CObs(self, 0) + y
-            elif y.__class__.__name__ in ['Corr', 'CObs']:
+            elif y.__class__.__name__ in ['Corr', 'CObs', 'ObsArray']:
                 return NotImplemented
             else:
                 return derived_observable(lambda x, **kwargs: x[0] + y, [self], man_grad=[1])
@@ -804,7 +862,7 @@ class Obs:
                 return np.array([self * o for o in y])
             elif isinstance(y, complex):
                 return CObs(self * y.real, self * y.imag)
-            elif y.__class__.__name__ in ['Corr', 'CObs']:
+            elif y.__class__.__name__ in ['Corr', 'CObs', 'ObsArray']:
                 return NotImplemented
             else:
                 return derived_observable(lambda x, **kwargs: x[0] * y, [self], man_grad=[y])
@@ -818,7 +876,7 @@ class Obs:
         else:
             if isinstance(y, np.ndarray):
                 return np.array([self - o for o in y])
-            elif y.__class__.__name__ in ['Corr', 'CObs']:
+            elif y.__class__.__name__ in ['Corr', 'CObs', 'ObsArray']:
                 return NotImplemented
             else:
                 return derived_observable(lambda x, **kwargs: x[0] - y, [self], man_grad=[1])
@@ -838,7 +896,7 @@ class Obs:
         else:
             if isinstance(y, np.ndarray):
                 return np.array([self / o for o in y])
-            elif y.__class__.__name__ in ['Corr', 'CObs']:
+            elif y.__class__.__name__ in ['Corr', 'CObs', 'ObsArray']:
                 return NotImplemented
             else:
                 return derived_observable(lambda x, **kwargs: x[0] / y, [self], man_grad=[1 / y])
@@ -849,7 +907,7 @@ class Obs:
         else:
             if isinstance(y, np.ndarray):
                 return np.array([o / self for o in y])
-            elif y.__class__.__name__ in ['Corr', 'CObs']:
+            elif y.__class__.__name__ in ['Corr', 'CObs', 'ObsArray']:
                 return NotImplemented
             else:
                 return derived_observable(lambda x, **kwargs: y / x[0], [self], man_grad=[-y / self.value ** 2])
@@ -1038,14 +1096,191 @@ class CObs:
 def gamma_method(x, **kwargs):
     """Vectorized version of the gamma_method applicable to lists or arrays of Obs.
 
-    See docstring of pe.Obs.gamma_method for details.
+    See docstring of pe.Obs.gamma_method and pe.gamma_method_batch for details.
     """
-    return np.vectorize(lambda o: o.gm(**kwargs))(x)
+    gamma_method_batch(x, **kwargs)
 
 
 gm = gamma_method
 
 
+def gamma_method_batch(x, n_jobs=None, executor=None, **kwargs):
+    """Batched version of the gamma_method for many Obs at once.
+
+    The fluctuations of all Obs which are defined on the same replica and
+    configurations of an ensemble are stacked into one array. The
+    autocorrelation functions are then computed with one batched FFT per
+    replica, the normalization is cached per idl and the automatic windowing
+    procedure is vectorized over all observables. The results are identical
+    to calling Obs.gamma_method on every element individually. Obs with
+    memory-mapped deltas (see to_memmap) are analyzed one at a time.
+
+    Parameters
+    ----------
+    x : list, numpy.ndarray, Obs, CObs or Corr
+        (Nested) lists or arrays of Obs or CObs, or a Corr. Entries which are
+        not Obs (e.g. None) are ignored.
+    n_jobs : int, optional
+        Number of threads over which the computation of the autocorrelation
+        functions is distributed. -1 uses all available cores. Default None
+        (serial computation).
+    executor : concurrent.futures.Executor, optional
+        Executor (e.g. a ThreadPoolExecutor or a ProcessPoolExecutor) which is
+        used instead of a thread pool with n_jobs threads. The work is split into
+        n_jobs chunks, or os.cpu_count() chunks if n_jobs is not given. The results
+        do not depend on the number of workers. The direct summation (fft=False)
+        is always carried out serially.
+
+    See docstring of pe.Obs.gamma_method for details on the keyword arguments.
+    """
+    obs = []
+    _collect_obs(x, obs)
+    obs = list({id(o): o for o in obs}.values())
+
+    # Memory-mapped Obs are analyzed one at a time instead of stacking all their deltas in memory
+    out_of_core = [o for o in obs if any(isinstance(d, np.memmap) for d in o.deltas.values())]
+    if out_of_core:
+        for o in out_of_core:
+            o.gamma_method(**kwargs)
+        obs = [o for o in obs if not any(isinstance(d, np.memmap) for d in o.deltas.values())]
+
+    if kwargs.get('fft') is False:
+        # The direct summation is not batched.
+        for o in obs:
+            o.gamma_method(**kwargs)
+        return
+
+    if n_jobs is not None and not isinstance(n_jobs, int):
+        raise TypeError("n_jobs has to be an integer.")
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    n_chunks = max(1, n_jobs or (os.cpu_count() if executor is not None else 1))
+    own_executor = None
+    if executor is None and n_chunks > 1:
+        executor = own_executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_chunks)
+
+    groups = {}
+    fft = True
+    for o in obs:
+        fft = o._init_gamma_method(kwargs)
+        e_content = o.e_content
+        for e_name in o.mc_names:
+            key = (e_name, tuple((r_name, _idl_key(o.idl[r_name])) for r_name in e_content[e_name]))
+            groups.setdefault(key, []).append(o)
+
+    # The autocorrelation functions of all groups are computed first, such that they can be
+    # distributed over the executor.
+    tasks = []
+    try:
+        for (e_name, r_content), members in groups.items():
+            first = members[0]
+            r_names = [r_name for r_name, _ in r_content]
+            gapsize = _determine_gap(first, {e_name: r_names}, e_name)
+
+            r_length = []
+            for r_name in r_names:
+                if isinstance(first.idl[r_name], range):
+                    r_length.append(len(first.idl[r_name]) * first.idl[r_name].step // gapsize)
+                else:
+                    r_length.append((first.idl[r_name][-1] - first.idl[r_name][0] + 1) // gapsize)
+
+            e_N = np.sum([first.shape[r_name] for r_name in r_names])
+            w_max = max(r_length) // 2
+
+            r_gammas = []
+            for r_name in r_names:
+                deltas = np.array([o.deltas[r_name] for o in members])
+                args = (first.idl[r_name], first.shape[r_name], w_max, fft, gapsize)
+                if executor is None:
+                    r_gammas.append([_calc_gamma(deltas, *args)])
+                else:
+                    r_gammas.append([executor.submit(_calc_gamma, chunk, *args) for chunk in np.array_split(deltas, min(n_chunks, len(members)))])
+            tasks.append((e_name, r_content, members, e_N, w_max, gapsize, r_gammas))
+
+        for e_name, r_content, members, e_N, w_max, gapsize, r_gammas in tasks:
+            e_gamma = np.zeros((len(members), w_max))
+            for r_gamma in r_gammas:
+                e_gamma += np.concatenate([res if executor is None else res.result() for res in r_gamma])
+            e_gamma /= _gamma_div(tuple(idx for _, idx in r_content), w_max, fft, gapsize)
+            _window_batch(e_name, members, e_gamma, e_N, w_max)
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+
+    for o in obs:
+        o._finalize_gamma_method()
+
+
+def _window_batch(e_name, members, e_gamma, e_N, w_max):
+    """Vectorized version of the automatic windowing procedure in Obs._compute_window.
+
+    Parameters
+    ----------
+    e_name : str
+        Name of the ensemble.
+    members : list
+        Obs which are defined on the same replica and configurations of e_name.
+    e_gamma : numpy.ndarray
+        Normalized autocorrelation functions of the members, one per row.
+    e_N : int
+        Number of configurations of the ensemble.
+    w_max : int
+        Upper bound for the summation window.
+    """
+    first = members[0]
+    if first.tau_exp[e_name] > 0 or first.S[e_name] == 0.0 or w_max < 2:
+        for o, o_gamma in zip(members, e_gamma):
+            o._compute_window(e_name, o_gamma, e_N, w_max)
+        return
+
+    nonzero = np.abs(e_gamma[:, 0]) >= 10 * np.finfo(float).tiny
+    for o in [o for o, nz in zip(members, nonzero) if not nz]:
+        o._compute_window(e_name, np.zeros(w_max), e_N, w_max)
+    members = [o for o, nz in zip(members, nonzero) if nz]
+    if not members:
+        return
+    e_gamma = e_gamma[nonzero]
+
+    e_rho = e_gamma / e_gamma[:, :1]
+    e_n_tauint = np.cumsum(np.concatenate((np.full((len(members), 1), 0.5), e_rho[:, 1:]), axis=1), axis=1)
+    e_n_tauint[e_n_tauint <= 0.5] = 0.5 + np.finfo(np.float64).eps
+    e_n_dtauint = e_n_tauint * 2 * np.sqrt(np.abs(np.arange(w_max) + 0.5 - e_n_tauint) / e_N)
+    e_n_dtauint[:, 0] = 0.0
+
+    tau = first.S[e_name] / np.log((2 * e_n_tauint[:, 1:] + 1) / (2 * e_n_tauint[:, 1:] - 1))
+    g_w = np.exp(- np.arange(1, w_max) / tau) - tau / np.sqrt(np.arange(1, w_max) * e_N)
+    stop = g_w < 0
+    stop[:, -1] = True
+    windows = np.argmax(stop, axis=1) + 1
+
+    for i, o in enumerate(members):
+        o.e_rho[e_name] = e_rho[i]
+        o.e_drho[e_name] = np.zeros(w_max)
+        o.e_n_tauint[e_name] = e_n_tauint[i]
+        o.e_n_dtauint[e_name] = e_n_dtauint[i]
+        o._set_window(e_name, int(windows[i]), e_gamma[i, 0], e_N, w_max)
+
+
+def _collect_obs(x, obs):
+    """Recursively collect all Obs contained in x into the list obs."""
+    if isinstance(x, Obs):
+        obs.append(x)
+    elif isinstance(x, CObs):
+        for part in [x.real, x.imag]:
+            if isinstance(part, Obs):
+                obs.append(part)
+    elif isinstance(x, (list, tuple)):
+        for item in x:
+            _collect_obs(item, obs)
+    elif isinstance(x, np.ndarray):
+        if x.dtype == object:
+            for item in x.ravel():
+                _collect_obs(item, obs)
+    elif x.__class__.__name__ == 'Corr':
+        for item in x.content:
+            _collect_obs(item, obs)
+
+
 def _format_uncertainty(value, dvalue, significance=2):
     """Creates a string of a value and its error in paranthesis notation, e.g., 13.02(45)"""
     if dvalue == 0.0 or (not np.isfinite(dvalue)):
@@ -1071,7 +1306,7 @@ def _expand_deltas(deltas, idx, shape, gapsize):
     Parameters
     ----------
     deltas : list
-        List of fluctuations
+        List of fluctuations. A two-dimensional array is expanded along its last axis.
     idx : list
         List or range of configs on which the deltas are defined, has to be sorted in ascending order.
     shape : int
@@ -1083,12 +1318,150 @@ def _expand_deltas(deltas, idx, shape, gapsize):
     if isinstance(idx, range):
         if (idx.step == gapsize):
             return deltas
-    ret = np.zeros((idx[-1] - idx[0] + gapsize) // gapsize)
-    for i in range(shape):
-        ret[(idx[i] - idx[0]) // gapsize] = deltas[i]
+    deltas = np.asarray(deltas)
+    ret = np.zeros(deltas.shape[:-1] + ((idx[-1] - idx[0] + gapsize) // gapsize, ))
+    ret[..., _expansion_index(_idl_key(idx), gapsize)[:shape]] = deltas[..., :shape]
     return ret
 
 
+def _calc_gamma(deltas, idx, shape, w_max, fft, gapsize):
+    """Calculate Gamma_{AA} from the deltas, which are defined on idx.
+       idx is assumed to be a contiguous range (possibly with a stepsize != 1).
+       If fft is True, two-dimensional deltas are supported and the autocorrelation
+       function of every row is computed.
+
+    See docstring of Obs._calc_gamma for details on the parameters.
+    """
+    # Compactly stored deltas are accumulated in double precision
+    deltas = np.asarray(_expand_deltas(deltas, idx, shape, gapsize), dtype=np.float64)
+    new_shape = deltas.shape[-1]
+    gamma = np.zeros(deltas.shape[:-1] + (w_max, ))
+    if fft:
+        max_gamma = min(new_shape, w_max)
+        # The padding for the fft has to be even
+        padding = new_shape + max_gamma + (new_shape + max_gamma) % 2
+        gamma[..., :max_gamma] += np.fft.irfft(np.abs(np.fft.rfft(deltas, padding)) ** 2)[..., :max_gamma]
+    else:
+        for n in range(w_max):
+            if new_shape - n >= 0:
+                gamma[n] += deltas[0:new_shape - n].dot(deltas[n:new_shape])
+
+    return gamma
+
+
+@functools.lru_cache(maxsize=1024)
+def _gamma_div(keys, w_max, fft, gapsize):
+    """Normalization of the autocorrelation function of an ensemble with replica defined on keys.
+
+    Parameters
+    ----------
+    keys : tuple
+        idl keys (see _idl_key) of all replica of the ensemble.
+    w_max : int
+        Upper bound for the summation window.
+    fft : bool
+        determines whether the fft algorithm is used.
+    gapsize : int
+        The target distance between two configurations.
+    """
+    gamma_div = np.zeros(w_max)
+    for idx in map(_idl_from_key, keys):
+        gamma_div += _calc_gamma(np.ones(len(idx)), idx, len(idx), w_max, fft, gapsize)
+    gamma_div[gamma_div < 1] = 1.0
+    gamma_div.flags.writeable = False
+    return gamma_div
+
+
+def _drho(rho, i, w_max, e_N):
+    """Error of the normalized autocorrelation function rho at lag i."""
+    tmp = (rho[i + 1:w_max]
+           + np.concatenate([rho[i - 1:None if i - (w_max - 1) // 2 <= 0 else (2 * i - (2 * w_max) // 2):-1],
+                             rho[1:max(1, w_max - 2 * i)]])
+           - 2 * rho[i] * rho[1:w_max - i])
+    return np.sqrt(np.sum(tmp ** 2) / e_N)
+
+
+# Lists of configurations are interned: equal lists are represented by one shared
+# list object which is labeled by an integer token. The caches below are keyed by these
+# tokens (or by the ranges themselves) such that cache lookups do not require hashing
+# or comparing full lists of configurations. The registry only holds weak references,
+# an interned list is released together with the last Obs which uses it. The most
+# recently used lists are additionally kept alive, such that a list which has just been
+# interned is still available when a cached function looks it up by its token. Tokens
+# are never reused, such that cached results of released lists cannot be mixed up.
+class _InternedIdl(list):
+    """List of configurations which is registered in the intern registry."""
+    __slots__ = ('token', '__weakref__')
+
+    def __reduce__(self):
+        # Copies and pickles are plain lists, they are interned again when used in an Obs.
+        return (list, (list(self),))
+
+
+_idl_store = weakref.WeakValueDictionary()
+_idl_tokens = weakref.WeakValueDictionary()
+_idl_recent = collections.OrderedDict()
+_idl_recent_size = 4096
+_idl_counter = itertools.count()
+# Guards the registry, which is shared between the threads of gamma_method_batch
+_idl_lock = threading.RLock()
+
+
+def _register_idl(interned, content_key):
+    _idl_store[interned.token] = interned
+    if _idl_tokens.get(content_key) is None:
+        _idl_tokens[content_key] = interned
+
+
+def _idl_key(idx):
+    """Returns a hashable key for the range or list of configurations idx.
+
+    Ranges are their own key, lists are interned and represented by an integer token.
+    """
+    if isinstance(idx, range):
+        return idx
+    with _idl_lock:
+        if isinstance(idx, _InternedIdl):
+            interned = idx
+            if _idl_store.get(interned.token) is not interned:
+                # The registry has been cleared while the list was in use
+                _register_idl(interned, hash(tuple(interned)))
+        else:
+            key = tuple(idx)
+            content_key = hash(key)
+            interned = _idl_tokens.get(content_key)
+            if interned is None or tuple(interned) != key:
+                interned = _InternedIdl(int(i) for i in key)
+                interned.token = next(_idl_counter)
+                _register_idl(interned, content_key)
+        token = interned.token
+        _idl_recent[token] = interned
+        _idl_recent.move_to_end(token)
+        if len(_idl_recent) > _idl_recent_size:
+            _idl_recent.popitem(last=False)
+    return token
+
+
+def _idl_from_key(key):
+    """Returns the range or the interned list of configurations for key."""
+    if isinstance(key, range):
+        return key
+    with _idl_lock:
+        return _idl_store[key]
+
+
+def _intern_idl(idx):
+    """Returns the interned list of configurations equal to idx (ranges are returned unchanged)."""
+    if isinstance(idx, range):
+        return idx
+    with _idl_lock:
+        return _idl_from_key(_idl_key(idx))
+
+
+def _is_interned(idx):
+    return isinstance(idx, _InternedIdl) and _idl_store.get(idx.token) is idx
+
+
 def _merge_idx(idl):
     """Returns the union of all lists in idl as range or sorted list
 
@@ -1101,7 +1474,15 @@ def _merge_idx(idl):
     if _check_lists_equal(idl):
         return idl[0]
 
-    idunion = sorted(set().union(*idl))
+    # The interned lists are kept alive until the cached function has looked them up
+    interned = [_intern_idl(idx) for idx in idl]
+    return _merge_idx_keys(tuple(_idl_key(idx) for idx in interned))
+
+
+@functools.lru_cache(maxsize=4096)
+def _merge_idx_keys(keys):
+    """Cached union of the configurations belonging to keys."""
+    idunion = sorted(set().union(*map(_idl_from_key, keys)))
 
     # Check whether idunion can be expressed as range
     idrange = range(idunion[0], idunion[-1] + 1, idunion[1] - idunion[0])
@@ -1109,7 +1490,7 @@ def _merge_idx(idl):
     if _check_lists_equal(idtest):
         return idrange
 
-    return idunion
+    return _intern_idl(idunion)
 
 
 def _intersection_idx(idl):
@@ -1124,7 +1505,15 @@ def _intersection_idx(idl):
     if _check_lists_equal(idl):
         return idl[0]
 
-    idinter = sorted(set.intersection(*[set(o) for o in idl]))
+    # The interned lists are kept alive until the cached function has looked them up
+    interned = [_intern_idl(idx) for idx in idl]
+    return _intersection_idx_keys(tuple(_idl_key(idx) for idx in interned))
+
+
+@functools.lru_cache(maxsize=4096)
+def _intersection_idx_keys(keys):
+    """Cached intersection of the configurations belonging to keys."""
+    idinter = sorted(set.intersection(*[set(_idl_from_key(key)) for key in keys]))
 
     # Check whether idinter can be expressed as range
     try:
@@ -1135,7 +1524,199 @@ def _intersection_idx(idl):
     except IndexError:
         pass
 
-    return idinter
+    return _intern_idl(idinter)
+
+
+@functools.lru_cache(maxsize=4096)
+def _scatter_index(key, new_key):
+    """Cached positions of the configurations of key within the configurations of new_key."""
+    res = np.searchsorted(np.asarray(_idl_from_key(new_key)), np.asarray(_idl_from_key(key)))
+    res.flags.writeable = False
+    return res
+
+
+@functools.lru_cache(maxsize=4096)
+def _expansion_index(key, gapsize):
+    """Cached positions of the configurations of key on a regular grid with spacing gapsize."""
+    idx = np.asarray(_idl_from_key(key))
+    res = (idx - idx[0]) // gapsize
+    res.flags.writeable = False
+    return res
+
+
+@functools.lru_cache(maxsize=4096)
+def _idl_gap(key):
+    """Cached minimal distance between two configurations of key."""
+    idx = _idl_from_key(key)
+    if isinstance(idx, range):
+        return idx.step
+    return np.min(np.diff(idx))
+
+
+_idl_caches = {'merge_idx': _merge_idx_keys,
+               'intersection_idx': _intersection_idx_keys,
+               'scatter_index': _scatter_index,
+               'expansion_index': _expansion_index,
+               'gap': _idl_gap,
+               'gamma_div': _gamma_div}
+
+
+def idl_cache_info():
+    """Returns the statistics of the caches of idl-derived structures.
+
+    Returns
+    -------
+    info : dict
+        Dictionary which contains the `functools.lru_cache` statistics (hits,
+        misses, maxsize, currsize) of every cache as well as the number of
+        interned lists of configurations which are currently alive under the
+        key 'interned_idl'.
+    """
+    info = {name: cache.cache_info() for name, cache in _idl_caches.items()}
+    info['interned_idl'] = len(_idl_store)
+    return info
+
+
+def idl_cache_clear():
+    """Clears the caches of idl-derived structures and the registry of interned idl lists."""
+    for cache in _idl_caches.values():
+        cache.cache_clear()
+    with _idl_lock:
+        _idl_store.clear()
+        _idl_tokens.clear()
+        _idl_recent.clear()
+
+
+def compact_storage(objs, dtype=np.float32):
+    """Converts existing Obs into the compact representation in place.
+
+    The deltas are converted to dtype and all lists of configurations are
+    replaced by the interned list, such that Obs defined on the same
+    configurations of a replica share one idl object (e.g. after unpickling).
+    New Obs are stored compactly if `Obs.deltas_dtype` is set.
+
+    Parameters
+    ----------
+    objs : list, numpy.ndarray, Obs, CObs or Corr
+        (Nested) lists or arrays of Obs or CObs, or a Corr.
+    dtype : numpy.dtype
+        dtype of the deltas (default np.float32). None keeps the dtype of the deltas.
+    """
+    obs = []
+    _collect_obs(objs, obs)
+    for o in {id(o): o for o in obs}.values():
+        if o._lazy is not None:
+            continue
+        for name in o.deltas:
+            if dtype is not None:
+                o.deltas[name] = np.asarray(o.deltas[name], dtype=dtype)
+            o.idl[name] = _intern_idl(o.idl[name])
+
+
+def memory_report(objs):
+    """Reports the memory used by the fluctuations of Obs per replica.
+
+    Lists of configurations which are shared between Obs are only counted
+    once. Lazy Obs which have not been evaluated yet do not contribute.
+
+    Parameters
+    ----------
+    objs : list, numpy.ndarray, Obs, CObs or Corr
+        (Nested) lists or arrays of Obs or CObs, or a Corr.
+
+    Returns
+    -------
+    report : dict
+        For every replica a dict with the number of Obs defined on it ('n_obs'),
+        the bytes of the deltas ('deltas') and of the distinct lists or ranges
+        of configurations ('idl').
+    """
+    obs = []
+    _collect_obs(objs, obs)
+    report = {}
+    seen = set()
+    for o in {id(o): o for o in obs}.values():
+        if o._lazy is not None:
+            continue
+        for name, deltas in o.deltas.items():
+            entry = report.setdefault(name, {'n_obs': 0, 'deltas': 0, 'idl': 0})
+            entry['n_obs'] += 1
+            entry['deltas'] += np.asarray(deltas).nbytes
+            idx = o.idl[name]
+            if id(idx) not in seen:
+                seen.add(id(idx))
+                entry['idl'] += sys.getsizeof(idx)
+                if not isinstance(idx, range):
+                    entry['idl'] += sum(sys.getsizeof(i) for i in idx)
+    return dict(sorted(report.items()))
+
+
+def to_memmap(objs, directory=None):
+    """Moves the deltas of Obs into memory-mapped temporary files.
+
+    Memory-mapped deltas are only read from disk when they are needed. The
+    gamma method, derived_observable and covariance process them in chunks
+    and the deltas of Obs derived from memory-mapped Obs are memory-mapped as
+    well, such that chains with millions of configurations can be analyzed for
+    many observables. The results are identical to the ones obtained from
+    deltas held in memory. The temporary files are removed as soon as the
+    deltas are no longer referenced.
+
+    Parameters
+    ----------
+    objs : list, numpy.ndarray, Obs, CObs or Corr
+        (Nested) lists or arrays of Obs or CObs, or a Corr.
+    directory : str, optional
+        Directory of the temporary files. Defaults to tempfile.gettempdir(),
+        which is also used for the deltas of derived Obs.
+    """
+    obs = []
+    _collect_obs(objs, obs)
+    obs = [o for o in {id(o): o for o in obs}.values() if o._lazy is None]
+    for name in sorted(set(name for o in obs for name in o.deltas)):
+        members = [o for o in obs if name in o.deltas and not isinstance(o.deltas[name], np.memmap)]
+        if not members:
+            continue
+        # All deltas of a replica share one file
+        offsets = np.cumsum([0] + [len(o.deltas[name]) for o in members])
+        store = _empty_memmap((offsets[-1],), np.result_type(*set(np.asarray(o.deltas[name]).dtype for o in members)), directory)
+        for o, start, stop in zip(members, offsets[:-1], offsets[1:]):
+            store[start:stop] = o.deltas[name]
+            o.deltas[name] = store[start:stop]
+
+
+# Operations on memory-mapped deltas process chunks of at most _chunk_bytes bytes.
+_chunk_bytes = 2 ** 26
+
+
+def _chunks(length, n_rows=1):
+    """Slices of the configuration axis such that a chunk of n_rows rows fits into _chunk_bytes."""
+    step = max(1, _chunk_bytes // (8 * max(n_rows, 1)))
+    return [slice(start, min(start + step, length)) for start in range(0, length, step)]
+
+
+def _empty_memmap(shape, dtype, directory=None):
+    """Returns a memmap backed by an anonymous temporary file in directory."""
+    with tempfile.TemporaryFile(dir=directory) as f:
+        # The memory map keeps the (unlinked) file alive after it is closed here
+        return np.memmap(f, dtype=dtype, mode='w+', shape=shape)
+
+
+def _memmap_map(func, deltas):
+    """Applies the elementwise func to deltas chunk by chunk and returns the result as memmap."""
+    res = _empty_memmap(deltas.shape, Obs.deltas_dtype or np.float64)
+    for chunk in _chunks(deltas.shape[-1]):
+        res[..., chunk] = func(deltas[..., chunk])
+    return res
+
+
+def _store_deltas(deltas):
+    """Converts deltas to Obs.deltas_dtype, memory-mapped deltas stay memory-mapped."""
+    if Obs.deltas_dtype is None or np.asanyarray(deltas).dtype == Obs.deltas_dtype:
+        return deltas
+    if isinstance(deltas, np.memmap):
+        return _memmap_map(lambda x: x, deltas)
+    return np.asarray(deltas, dtype=Obs.deltas_dtype)
 
 
 def _expand_deltas_for_merge(deltas, idx, shape, new_idx, scalefactor):
@@ -1164,10 +1745,9 @@ def _expand_deltas_for_merge(deltas, idx, shape, new_idx, scalefactor):
                 return deltas
             else:
                 return deltas * scalefactor
-    ret = np.zeros(new_idx[-1] - new_idx[0] + 1)
-    for i in range(shape):
-        ret[idx[i] - new_idx[0]] = deltas[i]
-    return np.array([ret[new_idx[i] - new_idx[0]] for i in range(len(new_idx))]) * len(new_idx) / len(idx) * scalefactor
+    ret = np.zeros(len(new_idx))
+    ret[_scatter_index(_idl_key(idx), _idl_key(new_idx))[:shape]] = np.asarray(deltas)[:shape]
+    return ret * len(new_idx) / len(idx) * scalefactor
 
 
 def derived_observable(func, data, array_mode=False, **kwargs):
@@ -1208,6 +1788,12 @@ def derived_observable(func, data, array_mode=False, **kwargs):
             if isinstance(raveled_data[i], (int, float)):
                 raveled_data[i] = cov_Obs(raveled_data[i], 0.0, "###dummy_covobs###")
 
+    if getattr(_lazy_state, 'enabled', False) and data.ndim == 1 and not array_mode:
+        values = np.array([o.value for o in data])
+        new_values = func(values, **kwargs)
+        if not isinstance(new_values, np.ndarray):
+            return _lazy_observable(func, data, values, new_values, kwargs)
+
     allcov = {}
     for o in raveled_data:
         for name in o.cov_names:
@@ -1267,31 +1853,27 @@ def derived_observable(func, data, array_mode=False, **kwargs):
                 scalef_d[mc_name] = sum([len(new_idl_d[name]) for name in new_mc_idl_d]) / sum([len(new_idl_d[name]) for name in mc_idl_d])
         return scalef_d
 
-    if 'man_grad' in kwargs:
-        deriv = np.asarray(kwargs.get('man_grad'))
-        if new_values.shape + data.shape != deriv.shape:
-            raise Exception('Manual derivative does not have correct shape.')
-    elif kwargs.get('num_grad') is True:
-        if multi > 0:
-            raise Exception('Multi mode currently not supported for numerical derivative')
-        options = {
-            'base_step': 0.1,
-            'step_ratio': 2.5}
-        for key in options.keys():
-            kwarg = kwargs.get(key)
-            if kwarg is not None:
-                options[key] = kwarg
-        tmp_df = nd.Gradient(func, order=4, **{k: v for k, v in options.items() if v is not None})(values, **kwargs)
-        if tmp_df.size == 1:
-            deriv = np.array([tmp_df.real])
-        else:
-            deriv = tmp_df.real
-    else:
-        deriv = jacobian(func)(values, **kwargs)
+    deriv = _derivative(func, values, new_values, data.shape, kwargs)
 
     final_result = np.zeros(new_values.shape, dtype=object)
+    memmapped = set(name for o in raveled_data for name, d in o.deltas.items() if isinstance(d, np.memmap))
 
-    if array_mode is True:
+    # Fast path for inputs which are all defined on the same replica and configurations
+    homogeneous = _is_homogeneous(raveled_data)
+    if homogeneous:
+        jac = np.reshape(deriv, (-1, n_obs))
+        d_stacked = {}
+        for name in new_sample_names:
+            if any(isinstance(o.deltas[name], np.memmap) for o in raveled_data):
+                # Out-of-core evaluation in chunks of configurations
+                length = raveled_data[0].shape[name]
+                d_stacked[name] = _empty_memmap((len(jac), length), Obs.deltas_dtype or np.float64)
+                for chunk in _chunks(length, n_obs + len(jac)):
+                    d_stacked[name][:, chunk] = jac @ np.array([o.deltas[name][chunk] for o in raveled_data])
+            else:
+                d_stacked[name] = jac @ np.array([o.deltas[name] for o in raveled_data])
+        g_stacked = {name: jac @ np.array([o.covobs[name].grad[:, 0] for o in raveled_data]) for name in new_cov_names}
+    elif array_mode is True:
 
         class _Zero_grad():
             def __init__(self, N):
@@ -1311,10 +1893,15 @@ def derived_observable(func, data, array_mode=False, **kwargs):
             for i_dat, dat in enumerate(data):
                 g_extracted[name].append(np.array([o.covobs.get(name, zero_grad).grad for o in dat.reshape(np.prod(dat.shape))]).reshape(dat.shape + (new_covobs_lengths[name], 1)))
 
-    for i_val, new_val in np.ndenumerate(new_values):
+    for i_flat, (i_val, new_val) in enumerate(np.ndenumerate(new_values)):
         new_deltas = {}
         new_grad = {}
-        if array_mode is True:
+        if homogeneous:
+            for name in new_sample_names:
+                new_deltas[name] = d_stacked[name][i_flat]
+            for name in new_cov_names:
+                new_grad[name] = g_stacked[name][i_flat][:, None]
+        elif array_mode is True:
             for name in new_sample_names:
                 ens_length = d_extracted[name][0].shape[-1]
                 new_deltas[name] = np.zeros(ens_length)
@@ -1337,6 +1924,9 @@ def derived_observable(func, data, array_mode=False, **kwargs):
 
         if not set(new_covobs.keys()).isdisjoint(new_deltas.keys()):
             raise Exception('The same name has been used for deltas and covobs!')
+        if not homogeneous:
+            for name in memmapped.intersection(new_deltas):
+                new_deltas[name] = _memmap_map(lambda x: x, np.asarray(new_deltas[name]))
         new_samples = []
         new_means = []
         new_idl = []
@@ -1360,6 +1950,159 @@ def derived_observable(func, data, array_mode=False, **kwargs):
     return final_result
 
 
+def _derivative(func, values, new_values, data_shape, kwargs):
+    """Jacobian of func at values as used by derived_observable (see its docstring for the kwargs)."""
+    if 'man_grad' in kwargs:
+        deriv = np.asarray(kwargs.get('man_grad'))
+        if np.shape(new_values) + data_shape != deriv.shape:
+            raise Exception('Manual derivative does not have correct shape.')
+    elif kwargs.get('num_grad') is True:
+        if isinstance(new_values, np.ndarray):
+            raise Exception('Multi mode currently not supported for numerical derivative')
+        options = {
+            'base_step': 0.1,
+            'step_ratio': 2.5}
+        for key in options.keys():
+            kwarg = kwargs.get(key)
+            if kwarg is not None:
+                options[key] = kwarg
+        tmp_df = nd.Gradient(func, order=4, **{k: v for k, v in options.items() if v is not None})(values, **kwargs)
+        if tmp_df.size == 1:
+            deriv = np.array([tmp_df.real])
+        else:
+            deriv = tmp_df.real
+    else:
+        deriv = jacobian(func)(values, **kwargs)
+    return deriv
+
+
+_lazy_state = threading.local()
+
+
+@contextlib.contextmanager
+def lazy():
+    """Context manager for deferred error propagation.
+
+    Within the context, derived observables with a single output only record
+    their value, the function and its gradient with respect to the input
+    observables. The fluctuations are computed once via the chain rule with
+    respect to the underlying (non-lazy) Obs, when any of the deferred
+    attributes (e.g. deltas, idl, dvalue or the gamma_method) is accessed or
+    when the Obs is serialized. Lazy Obs can also be used outside of the
+    context.
+
+    Example
+    -------
+    with pe.lazy():
+        res = (a * b + c) / d
+    res.gamma_method()
+    """
+    previous = getattr(_lazy_state, 'enabled', False)
+    _lazy_state.enabled = True
+    try:
+        yield
+    finally:
+        _lazy_state.enabled = previous
+
+
+class _LazyNode():
+    __slots__ = ['func', 'parents', 'kwargs', 'grad']
+
+    def __init__(self, func, parents, kwargs, grad):
+        self.func = func
+        self.parents = parents
+        self.kwargs = kwargs
+        self.grad = grad
+
+
+def _lazy_observable(func, data, values, new_value, kwargs):
+    """Create a lazy Obs which only stores its value and its dependence on data."""
+    res = Obs.__new__(Obs)
+    res._value = new_value
+    res.reweighted = any(o.reweighted for o in data)
+    res.tag = None
+    res._lazy = _LazyNode(func, list(data), kwargs, np.ravel(_derivative(func, values, new_value, data.shape, kwargs)))
+    return res
+
+
+def _materialize(obs):
+    """Compute all deferred attributes of the lazy Obs obs.
+
+    The gradients with respect to the underlying non-lazy Obs are accumulated
+    in reverse topological order, the fluctuations are then constructed in one
+    call of derived_observable.
+    """
+    # Topological order of the lazy nodes (parents before children) and the non-lazy leaves
+    order = []
+    leaves = []
+    leaf_pos = {}
+    visited = set()
+    stack = [(obs, False)]
+    while stack:
+        o, expanded = stack.pop()
+        if expanded:
+            order.append(o)
+            continue
+        if id(o) in visited:
+            continue
+        visited.add(id(o))
+        if o._lazy is None:
+            leaf_pos[id(o)] = len(leaves)
+            leaves.append(o)
+            continue
+        stack.append((o, True))
+        for parent in o._lazy.parents:
+            if id(parent) not in visited:
+                stack.append((parent, False))
+
+    adjoint = {id(obs): 1.0}
+    leaf_grad = np.zeros(len(leaves))
+    for o in reversed(order):
+        g = adjoint.pop(id(o), 0.0)
+        for parent, d in zip(o._lazy.parents, o._lazy.grad):
+            if parent._lazy is None:
+                leaf_grad[leaf_pos[id(parent)]] += g * d
+            else:
+                adjoint[id(parent)] = adjoint.get(id(parent), 0.0) + g * d
+
+    def _composite(x, **kwargs):
+        vals = {}
+        for o in order:
+            node = o._lazy
+            args = np.array([x[leaf_pos[id(p)]] if p._lazy is None else vals[id(p)] for p in node.parents])
+            vals[id(o)] = node.func(args, **node.kwargs)
+        return vals[id(obs)]
+
+    previous = getattr(_lazy_state, 'enabled', False)
+    _lazy_state.enabled = False
+    try:
+        res = derived_observable(_composite, leaves, man_grad=leaf_grad)
+    finally:
+        _lazy_state.enabled = previous
+
+    for attr in ['names', 'shape', 'r_values', 'deltas', 'N', 'idl', '_covobs', '_dvalue', 'ddvalue']:
+        setattr(obs, attr, getattr(res, attr))
+    obs._lazy = None
+
+
+def _is_homogeneous(obs):
+    """Checks whether all Obs in obs are defined on the same replica, configurations and covobs.
+
+    Parameters
+    ----------
+    obs : list or numpy.ndarray
+        One-dimensional list or array of Obs.
+    """
+    first = obs[0]
+    for o in obs[1:]:
+        if o.names != first.names:
+            return False
+        for name, idx in first.idl.items():
+            if o.idl[name] is not idx and not _check_lists_equal([o.idl[name], idx]):
+                return False
+    return True
+
+
 def _reduce_deltas(deltas, idx_old, idx_new):
     """Extract deltas defined on idx_old on all configs of idx_new.
 
@@ -1514,11 +2257,7 @@ def covariance(obs, visualize=False, correlation=False, smooth=None, **kwargs):
     if max_samples <= length and not [item for sublist in [o.cov_names for o in obs] for item in sublist]:
         warnings.warn(f"The dimension of the covariance matrix ({length}) is larger or equal to the number of samples ({max_samples}). This will result in a rank deficient matrix.", RuntimeWarning)
 
-    cov = np.zeros((length, length))
-    for i in range(length):
-        for j in range(i, length):
-            cov[i, j] = _covariance_element(obs[i], obs[j])
-    cov = cov + cov.T - np.diag(np.diag(cov))
+    cov = _covariance_matrix(obs)
 
     corr = np.diag(1 / np.sqrt(np.diag(cov))) @ cov @ np.diag(1 / np.sqrt(np.diag(cov)))
 
@@ -1561,64 +2300,71 @@ def _smooth_eigenvalues(corr, E):
     return vec @ np.diag(vals) @ vec.T
 
 
-def _covariance_element(obs1, obs2):
-    """Estimates the covariance of two Obs objects, neglecting autocorrelations."""
-
-    def calc_gamma(deltas1, deltas2, idx1, idx2, new_idx):
-        deltas1 = _reduce_deltas(deltas1, idx1, new_idx)
-        deltas2 = _reduce_deltas(deltas2, idx2, new_idx)
-        return np.sum(deltas1 * deltas2)
-
-    if set(obs1.names).isdisjoint(set(obs2.names)):
-        return 0.0
-
-    if not hasattr(obs1, 'e_dvalue') or not hasattr(obs2, 'e_dvalue'):
-        raise Exception('The gamma method has to be applied to both Obs first.')
-
-    dvalue = 0.0
-
-    for e_name in obs1.mc_names:
-
-        if e_name not in obs2.mc_names:
-            continue
-
-        idl_d = {}
-        for r_name in obs1.e_content[e_name]:
-            if r_name not in obs2.e_content[e_name]:
-                continue
-            idl_d[r_name] = _intersection_idx([obs1.idl[r_name], obs2.idl[r_name]])
-
-        gamma = 0.0
-
-        for r_name in obs1.e_content[e_name]:
-            if r_name not in obs2.e_content[e_name]:
-                continue
-            if len(idl_d[r_name]) == 0:
-                continue
-            gamma += calc_gamma(obs1.deltas[r_name], obs2.deltas[r_name], obs1.idl[r_name], obs2.idl[r_name], idl_d[r_name])
-
-        if gamma == 0.0:
-            continue
+def _covariance_matrix(obs):
+    """Estimates the covariance matrix of a list of Obs, neglecting autocorrelations.
 
-        gamma_div = 0.0
-        for r_name in obs1.e_content[e_name]:
-            if r_name not in obs2.e_content[e_name]:
-                continue
-            if len(idl_d[r_name]) == 0:
-                continue
-            gamma_div += np.sqrt(calc_gamma(obs1.deltas[r_name], obs1.deltas[r_name], obs1.idl[r_name], obs1.idl[r_name], idl_d[r_name]) * calc_gamma(obs2.deltas[r_name], obs2.deltas[r_name], obs2.idl[r_name], obs2.idl[r_name], idl_d[r_name]))
-        gamma /= gamma_div
+    For every replica the deltas of all Obs are stacked into a matrix on the union of
+    their configurations. Configurations on which an Obs is not defined are filled with
+    zeros and tracked by a mask, such that all contributions of a replica are obtained
+    from a few matrix products. Per ensemble the entries are normalized by the sum over
+    replica of the geometric means of the variances on the common configurations.
+    """
+    length = len(obs)
 
-        dvalue += gamma
+    for o in obs:
+        if o.names and not hasattr(o, 'e_dvalue'):
+            raise Exception('The gamma method has to be applied to all Obs first.')
 
-    for e_name in obs1.cov_names:
+    cov = np.zeros((length, length))
 
-        if e_name not in obs2.cov_names:
-            continue
+    e_names = sorted(set([e_name for o in obs for e_name in o.mc_names]))
+    for e_name in e_names:
+        r_names = sorted(set([r_name for o in obs if e_name in o.mc_names for r_name in o.e_content[e_name]]))
+        gamma = np.zeros((length, length))
+        gamma_div = np.zeros((length, length))
+        for r_name in r_names:
+            members = [i for i, o in enumerate(obs) if r_name in o.idl]
+            idl = [obs[i].idl[r_name] for i in members]
+            new_idx = _merge_idx(idl)
+            positions = [_scatter_index(_idl_key(obs[i].idl[r_name]), _idl_key(new_idx)) for i in members]
+            equal = _check_lists_equal(idl)
+            # Memory-mapped deltas are processed in chunks of configurations
+            if any(isinstance(obs[i].deltas[r_name], np.memmap) for i in members):
+                chunks = _chunks(len(new_idx), len(members))
+            else:
+                chunks = [slice(0, len(new_idx))]
+            r_gamma = 0.0
+            squares = 0.0
+            overlap = 0.0
+            for chunk in chunks:
+                deltas = np.zeros((len(members), chunk.stop - chunk.start))
+                mask = np.zeros((len(members), chunk.stop - chunk.start))
+                for row, (i, pos) in enumerate(zip(members, positions)):
+                    lo, hi = np.searchsorted(pos, [chunk.start, chunk.stop])
+                    deltas[row, pos[lo:hi] - chunk.start] = obs[i].deltas[r_name][lo:hi]
+                    mask[row, pos[lo:hi] - chunk.start] = 1.0
+                r_gamma = r_gamma + deltas @ deltas.T
+                if equal:
+                    squares = squares + np.sum(deltas ** 2, axis=1)
+                else:
+                    squares = squares + (deltas ** 2) @ mask.T
+                    overlap = overlap + mask @ mask.T
+            sel = np.ix_(members, members)
+            gamma[sel] += r_gamma
+            if equal:
+                gamma_div[sel] += np.sqrt(np.outer(squares, squares))
+            else:
+                gamma_div[sel] += np.where(overlap > 0, np.sqrt(squares * squares.T), 0.0)
+        nonzero = gamma != 0.0
+        cov[nonzero] += gamma[nonzero] / gamma_div[nonzero]
 
-        dvalue += np.dot(np.transpose(obs1.covobs[e_name].grad), np.dot(obs1.covobs[e_name].cov, obs2.covobs[e_name].grad)).item()
+    cov_names = sorted(set([e_name for o in obs for e_name in o.cov_names]))
+    for e_name in cov_names:
+        members = [i for i, o in enumerate(obs) if e_name in o.cov_names]
+        grad = np.array([obs[i].covobs[e_name].grad[:, 0] for i in members])
+        cov[np.ix_(members, members)] += grad @ obs[members[0]].covobs[e_name].cov @ grad.T
 
-    return dvalue
+    return np.triu(cov) + np.triu(cov, 1).T
 
 
 def import_jackknife(jacks, name, idl=None):
@@ -1747,10 +2493,7 @@ def cov_Obs(means, cov, name, grad=None):
 def _determine_gap(o, e_content, e_name):
     gaps = []
     for r_name in e_content[e_name]:
-        if isinstance(o.idl[r_name], range):
-            gaps.append(o.idl[r_name].step)
-        else:
-            gaps.append(np.min(np.diff(o.idl[r_name])))
+        gaps.append(_idl_gap(_idl_key(o.idl[r_name])))
 
     gap = min(gaps)
     if not np.all([gi % gap == 0 for gi in gaps]):
@@ -1768,6 +2511,8 @@ def _check_lists_equal(idl):
     ----------
     idl : list of lists, ranges or np.ndarrays
     '''
+    if len(idl) and all(el is idl[0] for el in idl[1:]):
+        return True
     g = groupby([np.nditer(el) if isinstance(el, np.ndarray) else el for el in idl])
     if next(g, True) and not next(g, False):
         return True
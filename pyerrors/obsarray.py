@@ -0,0 +1,472 @@
+import numpy as np
+from .obs import Obs, derived_observable, _check_lists_equal
+from .covobs import Covobs
+
+
+class ObsArray:
+    """Class for an array of observables which share their ensemble content.
+
+    An ObsArray stores the mean values of all observables as a float array
+    and the fluctuations of each replica as one contiguous two-dimensional
+    block of shape (n_obs, n_cfg). The configuration indices (idl) are stored
+    only once for the whole array. Elementwise arithmetic, numpy ufuncs and
+    linear operations act directly on these blocks, the linear error
+    propagation thereby reduces to a few vectorized numpy operations.
+
+    An ObsArray can be constructed from a list or array of Obs which are all
+    defined on the same replica and configurations
+    ```python
+    arr = pe.ObsArray([obs1, obs2, obs3])
+    ```
+    and converted back to an array of Obs via `arr.to_obs()`. Indexing an
+    ObsArray with a scalar index returns an Obs.
+
+    Operations between ObsArrays (or between an ObsArray and an Obs) which are
+    not defined on the same replica and configurations fall back to the
+    elementwise Obs implementation.
+    """
+
+    __slots__ = ['shape', 'values', 'names', 'idl', 'r_values', 'deltas',
+                 'cov', 'grad', 'reweighted', 'tag']
+
+    __array_priority__ = 10001
+
+    def __init__(self, data):
+        """ Initialize ObsArray object.
+
+        Parameters
+        ----------
+        data : list or numpy.ndarray
+            (Nested) list or array of Obs which are all defined on the same
+            replica and configurations.
+        """
+        if isinstance(data, ObsArray):
+            data = data.to_obs()
+        data = np.asarray(data, dtype=object)
+        flat = data.ravel()
+        if len(flat) == 0:
+            raise ValueError("ObsArray needs at least one Obs.")
+        if not all(isinstance(o, Obs) for o in flat):
+            raise TypeError("All entries of an ObsArray have to be of type Obs.")
+        first = flat[0]
+        mc_names = sorted(set(first.names) - set(first.cov_names))
+        cov_names = first.cov_names
+        for o in flat[1:]:
+            if sorted(set(o.names) - set(o.cov_names)) != mc_names or o.cov_names != cov_names:
+                raise ValueError("All Obs in an ObsArray have to be defined on the same replica.")
+            for name in mc_names:
+                if o.idl[name] is not first.idl[name] and not _check_lists_equal([o.idl[name], first.idl[name]]):
+                    raise ValueError(f"All Obs in an ObsArray have to be defined on the same configurations ({name}).")
+            for name in cov_names:
+                if not np.allclose(o.covobs[name].cov, first.covobs[name].cov):
+                    raise ValueError(f"Inconsistent covariance matrices for {name}.")
+
+        self.shape = data.shape
+        self.values = np.array([o.value for o in flat], dtype=float).reshape(self.shape)
+        self.names = mc_names
+        self.idl = {name: first.idl[name] for name in mc_names}
+        self.r_values = {}
+        self.deltas = {}
+        for name in mc_names:
+            self.r_values[name] = np.array([o.r_values[name] for o in flat], dtype=float).reshape(self.shape)
+            self.deltas[name] = np.array([o.deltas[name] for o in flat], dtype=float)
+        self.cov = {name: first.covobs[name].cov for name in cov_names}
+        self.grad = {name: np.array([o.covobs[name].grad[:, 0] for o in flat], dtype=float) for name in cov_names}
+        self.reweighted = any(o.reweighted for o in flat)
+        self.tag = None
+
+    @classmethod
+    def _from_blocks(cls, values, names, idl, r_values, deltas, cov, grad, reweighted):
+        """Construct an ObsArray directly from its array blocks without any checks."""
+        new = cls.__new__(cls)
+        new.values = np.asarray(values, dtype=float)
+        new.shape = new.values.shape
+        new.names = names
+        new.idl = idl
+        new.r_values = r_values
+        new.deltas = deltas
+        new.cov = cov
+        new.grad = grad
+        new.reweighted = reweighted
+        new.tag = None
+        return new
+
+    @property
+    def size(self):
+        return self.values.size
+
+    @property
+    def ndim(self):
+        return self.values.ndim
+
+    @property
+    def cov_names(self):
+        return sorted(self.cov.keys())
+
+    @property
+    def e_names(self):
+        return sorted(set([o.split('|')[0] for o in self.names] + self.cov_names))
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def _obs(self, i):
+        """Return the Obs at flat position i."""
+        res = Obs([self.deltas[name][i] for name in self.names], self.names,
+                  idl=[self.idl[name] for name in self.names],
+                  means=[self.r_values[name].flat[i] for name in self.names])
+        for name in self.cov_names:
+            res.names.append(name)
+            res._covobs[name] = Covobs(0, self.cov[name], name, grad=self.grad[name][i])
+        res._value = self.values.flat[i]
+        res.reweighted = self.reweighted
+        return res
+
+    def to_obs(self):
+        """Convert the ObsArray to a numpy array of Obs with the same shape.
+
+        The deltas of the returned Obs are views on the blocks of the ObsArray.
+        """
+        res = np.empty(self.size, dtype=object)
+        for i in range(self.size):
+            res[i] = self._obs(i)
+        return res.reshape(self.shape)
+
+    def tolist(self):
+        """Convert the ObsArray to a (nested) list of Obs."""
+        return self.to_obs().tolist()
+
+    def _same_layout(self, other):
+        """Check whether other is defined on the same replica, configurations and covobs."""
+        if self.names != other.names or self.cov_names != other.cov_names:
+            return False
+        for name in self.names:
+            if self.idl[name] is not other.idl[name] and not _check_lists_equal([self.idl[name], other.idl[name]]):
+                return False
+        for name in self.cov:
+            if self.cov[name] is not other.cov[name] and not np.allclose(self.cov[name], other.cov[name]):
+                return False
+        return True
+
+    def _block(self, name, grad=False):
+        """Return the deltas (or covobs gradients) of name with the observable axes restored."""
+        if grad:
+            return self.grad[name].reshape(self.shape + (self.grad[name].shape[-1], ))
+        return self.deltas[name].reshape(self.shape + (len(self.idl[name]), ))
+
+    def _linear(self, op):
+        """Apply the linear operation op which acts on arrays with trailing sample axis."""
+        values = op(self.values[..., None])[..., 0]
+        n_out = values.size
+        r_values = {name: op(self.r_values[name][..., None])[..., 0] for name in self.names}
+        deltas = {name: np.ascontiguousarray(op(self._block(name))).reshape(n_out, -1) for name in self.names}
+        grad = {name: np.ascontiguousarray(op(self._block(name, grad=True))).reshape(n_out, -1) for name in self.cov}
+        return ObsArray._from_blocks(values, self.names, self.idl, r_values, deltas, self.cov, grad, self.reweighted)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, idx):
+        pos = np.arange(self.size).reshape(self.shape)[idx]
+        if np.ndim(pos) == 0:
+            return self._obs(int(pos))
+        flat_pos = pos.ravel()
+        return ObsArray._from_blocks(self.values.ravel()[flat_pos].reshape(pos.shape), self.names, self.idl,
+                                     {name: self.r_values[name].ravel()[flat_pos].reshape(pos.shape) for name in self.names},
+                                     {name: self.deltas[name][flat_pos] for name in self.names},
+                                     self.cov, {name: self.grad[name][flat_pos] for name in self.cov}, self.reweighted)
+
+    def reshape(self, *shape):
+        if len(shape) == 1 and isinstance(shape[0], (tuple, list)):
+            shape = tuple(shape[0])
+        new_shape = self.values.reshape(shape).shape
+        return self._linear(lambda x: x.reshape(new_shape + x.shape[-1:]))
+
+    def ravel(self):
+        return self.reshape(-1)
+
+    flatten = ravel
+
+    def transpose(self, *axes):
+        if len(axes) == 1 and isinstance(axes[0], (tuple, list)):
+            axes = tuple(axes[0])
+        if not axes:
+            axes = tuple(range(self.ndim))[::-1]
+        axes = tuple(np.arange(self.ndim)[list(axes)]) + (self.ndim, )
+        return self._linear(lambda x: x.transpose(axes))
+
+    def sum(self, axis=None):
+        """Sum of array elements over a given axis (all axes if None)."""
+        if axis is None:
+            axis = tuple(range(self.ndim))
+        axis = tuple(np.arange(self.ndim)[np.atleast_1d(axis)])
+        res = self._linear(lambda x: x.sum(axis=axis))
+        return res[()] if res.shape == () else res
+
+    def mean(self, axis=None):
+        """Mean of array elements over a given axis (all axes if None)."""
+        if axis is None:
+            n = self.size
+        else:
+            n = np.prod([self.shape[a] for a in np.atleast_1d(axis)])
+        return self.sum(axis=axis) / n
+
+    def _matmul_const(self, matrix, left):
+        """Product of the ObsArray with a constant matrix, from the left if left is True."""
+        matrix = np.asarray(matrix, dtype=float)
+        return self._linear(lambda x: ObsArray._matmul_block(x, matrix, right=not left))
+
+    def __matmul__(self, y):
+        if isinstance(y, ObsArray):
+            if self.ndim not in (1, 2) or y.ndim not in (1, 2):
+                raise ValueError("Matrix multiplication is only supported for one or two dimensional ObsArrays.")
+            if not self._same_layout(y):
+                return ObsArray(self.to_obs() @ y.to_obs())
+            values = self.values @ y.values
+            r_values = {name: self.r_values[name] @ y.r_values[name] for name in self.names}
+
+            def _prod(bl_a, bl_b):
+                return (self._matmul_block(bl_a, y.values, right=True) + y._matmul_block(bl_b, self.values, right=False)).reshape(values.size, -1)
+
+            deltas = {name: _prod(self._block(name), y._block(name)) for name in self.names}
+            grad = {name: _prod(self._block(name, grad=True), y._block(name, grad=True)) for name in self.cov}
+            res = ObsArray._from_blocks(values, self.names, self.idl, r_values, deltas, self.cov, grad, self.reweighted or y.reweighted)
+            return res[()] if res.shape == () else res
+        elif isinstance(y, Obs) or (isinstance(y, np.ndarray) and y.dtype == object):
+            return ObsArray(self.to_obs() @ y)
+        res = self._matmul_const(y, left=False)
+        return res[()] if res.shape == () else res
+
+    def __rmatmul__(self, y):
+        if isinstance(y, np.ndarray) and y.dtype == object:
+            return ObsArray(y @ self.to_obs())
+        res = self._matmul_const(y, left=True)
+        return res[()] if res.shape == () else res
+
+    @staticmethod
+    def _matmul_block(block, matrix, right):
+        """Matrix product of a block with trailing sample axis and a float array."""
+        if right:
+            ndim = block.ndim - 1
+            res = np.tensordot(block, matrix, axes=([ndim - 1], [0]))
+            return np.moveaxis(res, ndim - 1, -1)
+        return np.tensordot(matrix, block, axes=([-1], [0]))
+
+    def _elementwise(self, func, others, grads):
+        """Apply the elementwise function func with known partial derivatives.
+
+        Parameters
+        ----------
+        func : callable
+            Elementwise function of len(others) + 1 arguments which acts on float arrays.
+        others : list
+            Further arguments of func which can be ObsArrays, Obs or float arrays.
+        grads : list
+            Partial derivatives of func with respect to all arguments evaluated at the
+            mean values (entries for float arguments are ignored).
+        """
+        args = [self] + list(others)
+        for i, arg in enumerate(args):
+            if isinstance(arg, Obs) or (isinstance(arg, np.ndarray) and arg.dtype == object):
+                args[i] = ObsArray(arg)
+            elif not isinstance(arg, ObsArray):
+                args[i] = np.asarray(arg, dtype=float)
+        obs_args = [(arg, g) for arg, g in zip(args, grads) if isinstance(arg, ObsArray)]
+
+        if not all(self._same_layout(arg) for arg, _ in obs_args[1:]):
+            return self._fallback(func, args)
+
+        values = func(*[arg.values if isinstance(arg, ObsArray) else arg for arg in args])
+        shape = values.shape
+        r_values = {name: func(*[arg.r_values[name] if isinstance(arg, ObsArray) else arg for arg in args]) for name in self.names}
+
+        def _propagate(name, grad):
+            res = 0
+            for arg, g in obs_args:
+                if np.ndim(g) == 0:
+                    res = res + g * arg._block(name, grad)
+                else:
+                    res = res + np.asarray(g)[..., None] * arg._block(name, grad)
+            res = np.broadcast_to(res, shape + res.shape[-1:])
+            return np.ascontiguousarray(res).reshape(values.size, -1)
+
+        deltas = {name: _propagate(name, False) for name in self.names}
+        grad = {name: _propagate(name, True) for name in self.cov}
+        reweighted = any(arg.reweighted for arg, _ in obs_args)
+        return ObsArray._from_blocks(values, self.names, self.idl, r_values, deltas, self.cov, grad, reweighted)
+
+    @staticmethod
+    def _fallback(func, args):
+        """Evaluate func elementwise on arrays of Obs via derived_observable."""
+        args = [arg.to_obs() if isinstance(arg, ObsArray) else arg for arg in args]
+        bargs = np.broadcast_arrays(*[np.asarray(arg, dtype=object) for arg in args])
+        res = np.empty(bargs[0].shape, dtype=object)
+        for idx in np.ndindex(res.shape):
+            entries = [barg[idx] for barg in bargs]
+            is_obs = [isinstance(e, Obs) for e in entries]
+            obs = [e for e, o in zip(entries, is_obs) if o]
+
+            def _func(x, entries=entries, is_obs=is_obs):
+                it = iter(x)
+                return func(*[next(it) if o else e for e, o in zip(entries, is_obs)])
+            res[idx] = derived_observable(_func, obs)
+        return ObsArray(res)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_obs()
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or kwargs:
+            return NotImplemented
+        if len(inputs) == 1 and ufunc.__name__ in _unary_derivatives:
+            return getattr(self, ufunc.__name__)()
+        if len(inputs) == 2 and ufunc.__name__ in _binary_operators:
+            a, b = inputs
+            op = _binary_operators[ufunc.__name__]
+            if a is self:
+                return getattr(self, '__' + op + '__')(b)
+            return getattr(self, '__r' + op + '__')(a)
+        return NotImplemented
+
+    def __repr__(self):
+        return 'ObsArray(' + str(self.to_obs()) + ')'
+
+    def __str__(self):
+        return str(self.to_obs())
+
+    # Overload math operations
+    def __add__(self, y):
+        if isinstance(y, (ObsArray, Obs)) or _is_float_like(y):
+            return self._elementwise(lambda a, b: a + b, [y], [1, 1])
+        return NotImplemented
+
+    def __radd__(self, y):
+        return self + y
+
+    def __sub__(self, y):
+        if isinstance(y, (ObsArray, Obs)) or _is_float_like(y):
+            return self._elementwise(lambda a, b: a - b, [y], [1, -1])
+        return NotImplemented
+
+    def __rsub__(self, y):
+        if isinstance(y, (ObsArray, Obs)) or _is_float_like(y):
+            return self._elementwise(lambda a, b: b - a, [y], [-1, 1])
+        return NotImplemented
+
+    def __mul__(self, y):
+        if isinstance(y, (ObsArray, Obs)) or _is_float_like(y):
+            y_val = _values(y)
+            return self._elementwise(lambda a, b: a * b, [y], [y_val, self.values])
+        return NotImplemented
+
+    def __rmul__(self, y):
+        return self * y
+
+    def __truediv__(self, y):
+        if isinstance(y, (ObsArray, Obs)) or _is_float_like(y):
+            y_val = _values(y)
+            return self._elementwise(lambda a, b: a / b, [y], [1 / y_val, -self.values / y_val ** 2])
+        return NotImplemented
+
+    def __rtruediv__(self, y):
+        if isinstance(y, (ObsArray, Obs)) or _is_float_like(y):
+            y_val = _values(y)
+            return self._elementwise(lambda a, b: b / a, [y], [-y_val / self.values ** 2, 1 / self.values])
+        return NotImplemented
+
+    def __pow__(self, y):
+        if isinstance(y, (ObsArray, Obs)) or _is_float_like(y):
+            y_val = _values(y)
+            grad_y = self.values ** y_val * np.log(np.abs(self.values)) if isinstance(y, (ObsArray, Obs)) else 0
+            return self._elementwise(lambda a, b: a ** b, [y], [y_val * self.values ** (y_val - 1), grad_y])
+        return NotImplemented
+
+    def __rpow__(self, y):
+        if isinstance(y, (ObsArray, Obs)) or _is_float_like(y):
+            y_val = _values(y)
+            grad_y = self.values * y_val ** (self.values - 1) if isinstance(y, (ObsArray, Obs)) else 0
+            return self._elementwise(lambda a, b: b ** a, [y], [y_val ** self.values * np.log(np.abs(y_val)), grad_y])
+        return NotImplemented
+
+    def __pos__(self):
+        return self
+
+    def __neg__(self):
+        return -1 * self
+
+    def __abs__(self):
+        return self._elementwise(np.abs, [], [np.sign(self.values)])
+
+    # Overload numpy functions
+    def sqrt(self):
+        return self._elementwise(np.sqrt, [], [1 / 2 / np.sqrt(self.values)])
+
+    def log(self):
+        return self._elementwise(np.log, [], [1 / self.values])
+
+    def exp(self):
+        return self._elementwise(np.exp, [], [np.exp(self.values)])
+
+    def sin(self):
+        return self._elementwise(np.sin, [], [np.cos(self.values)])
+
+    def cos(self):
+        return self._elementwise(np.cos, [], [-np.sin(self.values)])
+
+    def tan(self):
+        return self._elementwise(np.tan, [], [1 / np.cos(self.values) ** 2])
+
+    def arcsin(self):
+        return self._elementwise(np.arcsin, [], [1 / np.sqrt(1 - self.values ** 2)])
+
+    def arccos(self):
+        return self._elementwise(np.arccos, [], [-1 / np.sqrt(1 - self.values ** 2)])
+
+    def arctan(self):
+        return self._elementwise(np.arctan, [], [1 / (1 + self.values ** 2)])
+
+    def sinh(self):
+        return self._elementwise(np.sinh, [], [np.cosh(self.values)])
+
+    def cosh(self):
+        return self._elementwise(np.cosh, [], [np.sinh(self.values)])
+
+    def tanh(self):
+        return self._elementwise(np.tanh, [], [1 / np.cosh(self.values) ** 2])
+
+    def arcsinh(self):
+        return self._elementwise(np.arcsinh, [], [1 / np.sqrt(self.values ** 2 + 1)])
+
+    def arccosh(self):
+        return self._elementwise(np.arccosh, [], [1 / np.sqrt(self.values ** 2 - 1)])
+
+    def arctanh(self):
+        return self._elementwise(np.arctanh, [], [1 / (1 - self.values ** 2)])
+
+
+_unary_derivatives = ['sqrt', 'log', 'exp', 'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan',
+                      'sinh', 'cosh', 'tanh', 'arcsinh', 'arccosh', 'arctanh']
+
+_binary_operators = {'add': 'add', 'subtract': 'sub', 'multiply': 'mul', 'true_divide': 'truediv',
+                     'divide': 'truediv', 'power': 'pow', 'matmul': 'matmul'}
+
+
+def _is_float_like(y):
+    if isinstance(y, (int, float, np.integer, np.floating)):
+        return True
+    return isinstance(y, np.ndarray) and (y.dtype.kind in 'biuf' or (y.dtype == object and all(isinstance(o, Obs) for o in y.ravel())))
+
+
+def _values(y):
+    if isinstance(y, Obs):
+        return y.value
+    elif isinstance(y, ObsArray):
+        return y.values
+    elif isinstance(y, np.ndarray) and y.dtype == object:
+        return np.vectorize(lambda o: o.value)(y).astype(float)
+    return np.asarray(y, dtype=float)
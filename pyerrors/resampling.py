@@ -0,0 +1,236 @@
+import numpy as np
+import scipy.linalg
+from .obs import Obs, CObs
+
+
+class SampleLayout:
+    """Describes how the resampled representation of a set of Obs is organized.
+
+    The first row of every sample array contains the central values, it is
+    followed by one block of rows per ensemble. Within the block of an
+    ensemble all other ensembles are kept at their central values.
+
+    Attributes
+    ----------
+    method : str
+        'jackknife' or 'bootstrap'.
+    bin_size : int
+        number of consecutive configurations which are combined into one bin.
+    n_samples : int
+        total number of rows of the sample arrays (including the central values).
+    ensembles : list
+        one dict per ensemble with the keys 'name', 'rows' (slice of the sample
+        rows), 'replica' (list of replica names), 'idl' (binned configurations of the
+        replica), 'bins' (bin boundaries of the replica), 'counts' (number of
+        configurations per bin) and 'proj' (linear map from the bin sums to the
+        deviations of the samples from the central value; a vector for the diagonal
+        jackknife map).
+    """
+
+    def __init__(self, method, bin_size):
+        self.method = method
+        self.bin_size = bin_size
+        self.n_samples = 1
+        self.ensembles = []
+
+    def __repr__(self):
+        return 'SampleLayout(' + self.method + ', ' + ', '.join([e['name'] + ': ' + str(e['rows'].stop - e['rows'].start) for e in self.ensembles]) + ')'
+
+
+def export_samples(*args, method='jackknife', bin_size=1, n_boot=1000, seed=None):
+    """Converts arrays of Obs into a compact resampled representation.
+
+    Parameters
+    ----------
+    args : Obs, list or numpy.ndarray
+        Obs or (nested) lists/arrays of Obs. All Obs which are defined on the same
+        ensemble have to be defined on the same replica and configurations.
+    method : str
+        'jackknife' (default) or 'bootstrap'.
+    bin_size : int
+        Number of consecutive configurations which are combined into one bin (default 1).
+    n_boot : int
+        Number of bootstrap samples per ensemble (default 1000). Has to be at least the
+        number of bins of the ensemble to allow for the reconstruction of the fluctuations.
+    seed : int, optional
+        Seed for the generation of the bootstrap samples.
+
+    Returns
+    -------
+    samples : list[numpy.ndarray]
+        For every argument an array of shape (layout.n_samples,) + shape of the argument.
+    layout : SampleLayout
+        Layout of the samples, required for import_samples.
+    """
+    if method not in ['jackknife', 'bootstrap']:
+        raise ValueError("Unknown resampling method '" + str(method) + "'.")
+    if not isinstance(bin_size, int) or bin_size < 1:
+        raise ValueError("bin_size has to be a positive integer.")
+
+    arrays = [np.asarray(arg) for arg in args]
+    for arr in arrays:
+        for o in arr.ravel():
+            if not isinstance(o, Obs):
+                raise TypeError("export_samples is only implemented for real valued Obs.")
+            if o.cov_names:
+                raise ValueError("Obs with covobs contributions cannot be resampled.")
+    all_obs = [o for arr in arrays for o in arr.ravel()]
+
+    layout = SampleLayout(method, bin_size)
+    rng = np.random.default_rng(seed)
+    e_names = sorted(set([e_name for o in all_obs for e_name in o.mc_names]))
+    for e_name in e_names:
+        members = [o for o in all_obs if e_name in o.mc_names]
+        r_names = members[0].e_content[e_name]
+        for o in members[1:]:
+            if o.e_content[e_name] != r_names or any(o.idl[r_name] != members[0].idl[r_name] for r_name in r_names):
+                raise ValueError("All Obs defined on ensemble '" + e_name + "' have to be defined on the same replica and configurations.")
+        idl = [members[0].idl[r_name] for r_name in r_names]
+        bins = [np.arange(0, len(idx), bin_size) for idx in idl]
+        counts = np.concatenate([np.diff(np.append(b, len(idx))) for b, idx in zip(bins, idl)])
+        n = np.sum(counts)
+        if method == 'jackknife':
+            proj = -1 / (n - counts)
+        else:
+            if n_boot < len(counts):
+                raise ValueError("n_boot has to be at least the number of bins (" + str(len(counts)) + ") on ensemble '" + e_name + "'.")
+            draws = rng.integers(0, len(counts), size=(n_boot, len(counts)))
+            proj = np.vstack([np.bincount(o, minlength=len(counts)) for o in draws]) / n
+        n_rows = len(proj)
+        layout.ensembles.append({'name': e_name,
+                                 'rows': slice(layout.n_samples, layout.n_samples + n_rows),
+                                 'replica': r_names,
+                                 'idl': [idx[::bin_size] for idx in idl],
+                                 'bins': bins,
+                                 'counts': counts,
+                                 'proj': proj})
+        layout.n_samples += n_rows
+
+    samples = []
+    for arr in arrays:
+        flat = arr.ravel()
+        res = np.empty((layout.n_samples, len(flat)))
+        res[:] = [o.value for o in flat]
+        for ens in layout.ensembles:
+            pos = [i for i, o in enumerate(flat) if ens['name'] in o.mc_names]
+            if not pos:
+                continue
+            sums = np.array([np.concatenate([np.add.reduceat(flat[i].deltas[r_name], b) for r_name, b in zip(ens['replica'], ens['bins'])]) for i in pos])
+            if ens['proj'].ndim == 1:
+                res[ens['rows'], pos] += ens['proj'][:, None] * sums.T
+            else:
+                res[ens['rows'], pos] += ens['proj'] @ sums.T
+        samples.append(res.reshape((layout.n_samples,) + arr.shape))
+
+    return samples, layout
+
+
+def import_samples(samples, layout):
+    """Converts resampled data back into Obs.
+
+    Parameters
+    ----------
+    samples : numpy.ndarray
+        Array of shape (layout.n_samples,) + shape, real or complex valued.
+    layout : SampleLayout
+        Layout as returned by export_samples.
+
+    Returns
+    -------
+    res : Obs, CObs or numpy.ndarray
+        Obs (CObs for complex valued samples) or array of Obs of the given shape.
+        For bin_size > 1 the fluctuations are defined on the first configuration of each bin.
+    """
+    samples = np.asarray(samples)
+    if samples.shape[0] != layout.n_samples:
+        raise ValueError("Samples do not match the layout: " + str(samples.shape[0]) + " vs. " + str(layout.n_samples) + " rows.")
+    if np.iscomplexobj(samples):
+        real = import_samples(samples.real, layout)
+        imag = import_samples(samples.imag, layout)
+        if isinstance(real, Obs):
+            return CObs(real, imag)
+        return np.vectorize(CObs, otypes=[object])(real, imag)
+
+    shape = samples.shape[1:]
+    flat = samples.reshape(layout.n_samples, -1)
+    values = flat[0]
+
+    names = []
+    deltas = []
+    idl = []
+    for ens in layout.ensembles:
+        dev = flat[ens['rows']] - values
+        if ens['proj'].ndim == 1:
+            sums = dev / ens['proj'][:, None]
+        else:
+            sums = scipy.linalg.lstsq(ens['proj'], dev)[0]
+        bin_deltas = sums / ens['counts'][:, None]
+        split = np.cumsum([len(b) for b in ens['bins']])[:-1]
+        for r_name, r_deltas, r_idl in zip(ens['replica'], np.split(bin_deltas, split), ens['idl']):
+            names.append(r_name)
+            deltas.append(r_deltas.T)
+            idl.append(r_idl)
+
+    res = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        if names:
+            new_obs = Obs([d[i] for d in deltas], names, idl=idl, means=[value] * len(names))
+        else:
+            new_obs = Obs([], [], means=[])
+        new_obs._value = value
+        res[i] = new_obs
+
+    if shape == ():
+        return res[0]
+    return res.reshape(shape)
+
+
+def resample(func, *args, method='jackknife', bin_size=1, n_boot=1000, seed=None, vectorized=True):
+    """Applies func to resampled representations of the arguments.
+
+    The arguments are converted into samples once via export_samples. func is then
+    evaluated on all samples at once and the result is imported back into Obs.
+    The cost is independent of the number of Obs involved, which makes this approach
+    well suited for operations on large matrices (e.g. eigenvalue problems, SVDs or
+    nonlinear fits), see also linalg.jack_matmul.
+
+    Parameters
+    ----------
+    func : object
+        Function which takes numpy arrays with an additional leading axis of samples
+        (e.g. shape (n_samples, dim, dim) for a dim x dim matrix of Obs). numpy functions
+        acting on the trailing axes such as np.linalg.eigh or the @ operator broadcast
+        over the samples automatically. func may return an array or a tuple of arrays.
+    args : Obs, list or numpy.ndarray
+        Obs or (nested) lists/arrays of Obs.
+    method : str
+        'jackknife' (default) or 'bootstrap'.
+    bin_size : int
+        Number of consecutive configurations which are combined into one bin (default 1).
+    n_boot : int
+        Number of bootstrap samples per ensemble (default 1000).
+    seed : int, optional
+        Seed for the generation of the bootstrap samples.
+    vectorized : bool
+        If False func is called on every sample individually, i.e. with the shape of the
+        original arguments (default True).
+
+    Returns
+    -------
+    res : Obs, numpy.ndarray or tuple
+        Result of func in terms of Obs.
+    """
+    samples, layout = export_samples(*args, method=method, bin_size=bin_size, n_boot=n_boot, seed=seed)
+
+    if vectorized:
+        result = func(*samples)
+    else:
+        result = [func(*[s[i] for s in samples]) for i in range(layout.n_samples)]
+        if isinstance(result[0], tuple):
+            result = tuple(np.array(part) for part in zip(*result))
+        else:
+            result = np.array(result)
+
+    if isinstance(result, tuple):
+        return tuple(import_samples(part, layout) for part in result)
+    return import_samples(result, layout)
@@ -1,7 +1,7 @@
 import numpy as np
 import scipy.optimize
-from autograd import jacobian
-from .obs import derived_observable
+from autograd import jacobian, elementwise_grad
+from .obs import derived_observable, _is_homogeneous
 
 
 def find_root(d, func, guess=1.0, **kwargs):
@@ -41,3 +41,99 @@ def find_root(d, func, guess=1.0, **kwargs):
     res = derived_observable(lambda x, **kwargs: (x[0] + np.finfo(np.float64).eps) / (np.array(d).reshape(-1)[0].value + np.finfo(np.float64).eps) * root[0],
                              np.array(d).reshape(-1), man_grad=np.array(deriv).reshape(-1))
     return res
+
+
+def find_roots(d, func, guess=1.0, **kwargs):
+    r'''Finds the roots of many independent problems func(x, d) = 0 at once.
+
+    All problems are solved simultaneously with a damped Newton method, problems for which
+    it does not converge are passed to scipy.optimize.fsolve one by one. The derivatives
+    required for the error propagation are obtained from one autograd pass. Roots of parameters
+    which are defined on the same configurations are constructed together in blocks.
+
+    Parameters
+    -----------------
+    d : numpy.ndarray or list
+        Array of `Obs`, every entry defines one root problem. For root functions with several
+        parameters a list of arrays of `Obs` of identical shape can be passed, d[i] then refers
+        to the i-th parameter as in find_root.
+    func : object
+        Function of the roots x and the parameters d which acts elementwise, i.e. the i-th entry
+        of func(x, d) may only depend on the i-th entries of x and d (of all d[j] for several
+        parameters). Any numpy functions have to use the autograd.numpy wrapper.
+        Example:
+        ```python
+        import autograd.numpy as anp
+        def root_func(x, d):
+            return anp.exp(-x ** 2) - d
+        ```
+    guess : float or numpy.ndarray
+        Initial guess for the roots, broadcast to the shape of the problems.
+
+    Returns
+    -------
+    res : numpy.ndarray
+        Array of `Obs` valued roots with the shape of d (of d[0] for several parameters).
+    '''
+    multi = isinstance(d, (list, tuple)) and len(d) > 0 and all(isinstance(item, (list, tuple, np.ndarray)) for item in d)
+    d_obs = np.array([np.asarray(item, dtype=object) for item in d]) if multi else np.asarray(d, dtype=object)[None]
+    shape = d_obs.shape[1:]
+    d_val = np.vectorize(lambda x: x.value, otypes=[float])(d_obs)
+    params = d_val if multi else d_val[0]
+
+    try:
+        dfdx = elementwise_grad(func, 0)
+        dfdx(np.broadcast_to(np.asarray(guess, dtype=float), shape).astype(float), params)
+    except TypeError:
+        raise Exception("It is required to use autograd.numpy instead of numpy within root functions, see the documentation for details.") from None
+
+    x = np.broadcast_to(np.asarray(guess, dtype=float), shape).astype(float)
+    active = np.ones(shape, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(100):
+            f = func(x, params)
+            step = np.where(active, f / dfdx(x, params), 0)
+            new_x = x - step
+            new_f = func(new_x, params)
+            # Damp the steps of all problems for which the residual increases
+            for _ in range(30):
+                worse = active & ~(np.abs(new_f) <= np.abs(f))
+                if not worse.any():
+                    break
+                step = np.where(worse, step / 2, step)
+                new_x = x - step
+                new_f = func(new_x, params)
+            active &= ~(np.abs(step) <= 4 * np.finfo(np.float64).eps * (1 + np.abs(new_x)))
+            x = np.where(np.isfinite(new_x), new_x, x)
+            if not active.any():
+                break
+
+    # The remaining problems are solved one by one, a joint call of fsolve would approximate a dense jacobian
+    guesses = np.broadcast_to(np.asarray(guess, dtype=float), shape)
+    for i in zip(*np.nonzero(active)):
+        x[i] = scipy.optimize.fsolve(func, guesses[i], args=(params[(slice(None),) + i] if multi else params[i],))[0]
+
+    # Error propagation as detailed in arXiv:1809.01289
+    n_params = d_obs.shape[0]
+    deriv = (-elementwise_grad(func, 1)(x, params) / dfdx(x, params)).reshape(n_params, -1)
+    roots = x.ravel()
+    d_obs = d_obs.reshape(n_params, -1)
+    d_val = d_val.reshape(n_params, -1)
+    # Every root only depends on its own parameters. Roots of parameters which are defined on
+    # the same configurations are propagated in blocks, all other roots one by one.
+    block = 256 if _is_homogeneous(d_obs.ravel()) else 1
+    res = np.empty(roots.size, dtype=object)
+    for start in range(0, roots.size, block):
+        part = slice(start, start + block)
+        res[part] = _propagate_roots(roots[part], deriv[:, part], d_obs[:, part], d_val[:, part])
+    return res.reshape(shape)
+
+
+def _propagate_roots(roots, deriv, d_obs, d_val):
+    """Propagates the errors of the parameters d_obs of shape (n_params, n_roots) to the roots."""
+    n_params, n_roots = deriv.shape
+    jac = np.zeros((n_roots, n_params, n_roots))
+    jac[np.arange(n_roots), :, np.arange(n_roots)] = deriv.T
+    jac = jac.reshape(n_roots, n_params * n_roots)
+    d_flat = d_val.ravel()
+    return derived_observable(lambda x, **kwargs: roots + jac @ (x - d_flat), d_obs.ravel(), man_grad=jac)
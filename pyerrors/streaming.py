@@ -0,0 +1,211 @@
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .obs import Obs
+
+
+class StreamingObs:
+    """Observable defined on Monte Carlo chains which grow over time.
+
+    A StreamingObs keeps running sums of the lagged products of the samples of
+    every replica up to a maximal lag `max_window`. Appending new configurations
+    updates these sums in O(n_new * max_window) operations, such that the gamma
+    method does not have to recompute the autocorrelation functions of the full
+    history after every update.
+
+    ```python
+    stream = pe.StreamingObs(['ens|r1', 'ens|r2'], max_window=500)
+    stream.append(samples_r1, 'ens|r1')
+    stream.append(samples_r2, 'ens|r2')
+    obs = stream.gamma_method()
+    # A few hundred configurations later
+    stream.append(new_samples_r1, 'ens|r1')
+    obs = stream.gamma_method()
+    ```
+
+    The results of `gamma_method` coincide with the ones of `Obs.gamma_method`
+    as long as the summation window stays below `max_window`. Only the
+    autocorrelation function up to `max_window` enters the error of the
+    normalized autocorrelation function `e_drho` and the analysis with
+    exponential tails.
+    """
+
+    def __init__(self, names, max_window=1000):
+        """ Initialize StreamingObs object.
+
+        Parameters
+        ----------
+        names : str or list
+            Name(s) of the replica, see `Obs`.
+        max_window : int
+            Largest lag of the autocorrelation function which is accumulated (default 1000).
+        """
+        if isinstance(names, str):
+            names = [names]
+        if not all(isinstance(name, str) for name in names):
+            raise TypeError('All names have to be strings.')
+        if len(set(names)) != len(names):
+            raise ValueError('Names are not unique.')
+        if not isinstance(max_window, int) or max_window < 2:
+            raise ValueError('max_window has to be an integer larger than 1.')
+        self.names = sorted(names)
+        self.max_window = max_window
+        self._replica = {name: _LagAccumulator(max_window) for name in self.names}
+
+    @classmethod
+    def from_obs(cls, obs, max_window=1000):
+        """Initialize a StreamingObs from the samples of a primary Obs.
+
+        Parameters
+        ----------
+        obs : Obs
+            Observable without covobs contributions which is defined on regular ranges of configurations.
+        max_window : int
+            Largest lag of the autocorrelation function which is accumulated (default 1000).
+        """
+        if obs.cov_names:
+            raise ValueError('Obs with covobs contributions cannot be streamed.')
+        new = cls(obs.names, max_window=max_window)
+        for name in obs.names:
+            if not isinstance(obs.idl[name], range):
+                raise ValueError(f'Configurations of {name} are not a regular range.')
+            new._replica[name].start = obs.idl[name].start
+            new._replica[name].step = obs.idl[name].step
+            new.append(obs.deltas[name] + obs.r_values[name], name)
+        return new
+
+    @property
+    def N(self):
+        """Total number of configurations."""
+        return sum(acc.n for acc in self._replica.values())
+
+    @property
+    def value(self):
+        return sum(acc.n * acc.mean for acc in self._replica.values()) / self.N
+
+    @property
+    def e_content(self):
+        res = {}
+        for name in self.names:
+            res.setdefault(name.split('|')[0], []).append(name)
+        return res
+
+    def append(self, samples, name=None):
+        """Append new configurations to a replica.
+
+        Parameters
+        ----------
+        samples : numpy.ndarray
+            Samples on the configurations following the ones already contained in the replica.
+        name : str, optional
+            Name of the replica, only optional for a single replica.
+        """
+        if name is None:
+            if len(self.names) != 1:
+                raise ValueError('The name of the replica has to be specified.')
+            name = self.names[0]
+        if name not in self._replica:
+            raise KeyError(f'Unknown replica {name}.')
+        self._replica[name].append(np.asarray(samples, dtype=float).ravel())
+
+    def to_obs(self):
+        """Return an Obs which contains all samples appended so far."""
+        for name, acc in self._replica.items():
+            if acc.n <= 4:
+                raise ValueError(f'Replica {name} needs at least 5 configurations.')
+        return Obs([acc.samples for acc in self._replica.values()], list(self._replica),
+                   idl=[range(acc.start, acc.start + acc.n * acc.step, acc.step) for acc in self._replica.values()])
+
+    def gamma_method(self, **kwargs):
+        """Estimate the error from the accumulated autocorrelation functions.
+
+        Returns an Obs with all samples appended so far on which the results
+        of the gamma method are set. The keyword arguments are identical to
+        the ones of `Obs.gamma_method`, the parameter fft has no effect.
+        """
+        obs = self.to_obs()
+        obs._init_gamma_method(kwargs)
+        e_content = self.e_content
+        for e_name in obs.mc_names:
+            accs = [self._replica[r_name] for r_name in e_content[e_name]]
+            if len(set(acc.step for acc in accs)) != 1:
+                raise ValueError(f'Replica for ensemble {e_name} do not have a common spacing.')
+            e_N = sum(acc.n for acc in accs)
+            w_max = max(acc.n for acc in accs) // 2
+            w = min(w_max, self.max_window)
+            e_gamma = sum(acc.gamma(w) for acc in accs)
+            gamma_div = sum(np.maximum(acc.n - np.arange(w), 0) for acc in accs).astype(float)
+            gamma_div[gamma_div < 1] = 1.0
+            e_gamma /= gamma_div
+            obs._compute_window(e_name, e_gamma, e_N, w)
+            if w < w_max and obs.e_windowsize[e_name] >= w - 1:
+                warnings.warn(f'The summation window for ensemble {e_name} reached max_window={self.max_window}.', RuntimeWarning)
+        obs._finalize_gamma_method()
+        return obs
+
+    gm = gamma_method
+
+    def __repr__(self):
+        return 'StreamingObs[' + str(self.value) + ', ' + str(self.N) + ' configurations]'
+
+
+class _LagAccumulator:
+    """Running sums of the lagged products of the samples of one replica.
+
+    All sums are computed for the samples shifted by the first sample to reduce
+    cancellations when the mean value is subtracted.
+    """
+
+    def __init__(self, max_window):
+        self.max_window = max_window
+        self.start = 1
+        self.step = 1
+        self.n = 0
+        self.shift = 0.0
+        self.total = 0.0
+        self.head = np.zeros(0)
+        self.tail = np.zeros(0)
+        self.products = np.zeros(max_window)
+        self._buffer = np.zeros(0)
+
+    @property
+    def samples(self):
+        return self._buffer[:self.n]
+
+    @property
+    def mean(self):
+        return self.shift + self.total / self.n
+
+    def append(self, new):
+        if len(new) == 0:
+            return
+        if self.n + len(new) > len(self._buffer):
+            buffer = np.zeros(max(2 * len(self._buffer), self.n + len(new)))
+            buffer[:self.n] = self._buffer[:self.n]
+            self._buffer = buffer
+        self._buffer[self.n:self.n + len(new)] = new
+        if self.n == 0:
+            self.shift = new[0]
+        new = new - self.shift
+
+        W = self.max_window
+        padded = np.concatenate([np.zeros(W - 1 - len(self.tail[-(W - 1):])), self.tail[-(W - 1):], new])
+        # Row k of the window matrix contains the W predecessors of new[k] (including itself) in reversed order
+        self.products += new @ sliding_window_view(padded, W)[:, ::-1]
+
+        self.head = np.concatenate([self.head, new[:W - len(self.head)]])
+        self.tail = np.concatenate([self.tail, new])[-W:]
+        self.total += np.sum(new)
+        self.n += len(new)
+
+    def gamma(self, w):
+        """Unnormalized autocorrelation function up to lag w (excluding) of the deltas."""
+        t = np.arange(w)
+        valid = t < self.n
+        lag = np.minimum(t, self.n)
+        mean = self.total / self.n
+        # Sums of the samples without the last (first) t ones
+        head_sum = self.total - np.concatenate([[0], np.cumsum(self.tail[::-1])])[lag]
+        tail_sum = self.total - np.concatenate([[0], np.cumsum(self.head)])[lag]
+        res = self.products[:w] - mean * (head_sum + tail_sum) + (self.n - t) * mean ** 2
+        return np.where(valid, res, 0.0)
@@ -1,4 +1,9 @@
+import os
+import shutil
+import h5py
 import numpy as np
+import pandas as pd
+import autograd.numpy as anp
 import pyerrors as pe
 import pytest
 
@@ -46,3 +51,227 @@ def test_b_cmatmul(benchmark):
 def test_b_gamma(benchmark):
     my_obs = pe.Obs([np.random.rand(length)], ['t1'])
     benchmark(my_obs.gamma_method)
+
+
+def _sum(x, **kwargs):
+    return np.sum(x)
+
+
+@pytest.mark.parametrize("n", [1, 10, 100])
+def test_b_derived_observable(benchmark, n):
+    my_list = [pe.Obs([np.random.rand(length)], ['t1']) for i in range(n)]
+
+    benchmark(pe.derived_observable, _sum, my_list, man_grad=np.ones(n))
+
+
+@pytest.mark.parametrize("n", [1, 10, 100])
+def test_b_derived_observable_merge(benchmark, n):
+    # Inputs on differing configurations do not take the fast path for identical idl
+    my_list = [pe.Obs([np.random.rand(length)], ['t1'], idl=[range(1 + i % 2, 2 * length + 1, 2)]) for i in range(n)]
+
+    benchmark(pe.derived_observable, _sum, my_list, man_grad=np.ones(n))
+
+
+def _fit_func(a, x):
+    return a[0] * anp.exp(-a[1] * x) + a[2]
+
+
+@pytest.mark.parametrize("gauss_newton", [False, True])
+def test_b_least_squares(benchmark, gauss_newton):
+    x = np.arange(200) / 20
+    y = [pe.Obs([np.random.normal(_fit_func([2.0, 0.5, 0.3], xx), 0.1, length)], ['t1']) for xx in x]
+    [o.gamma_method() for o in y]
+
+    benchmark(pe.fits.least_squares, x, y, _fit_func, silent=True, gauss_newton=gauss_newton)
+
+
+# Parametrised benchmarks of the hot paths of the library. The benchmarks are
+# grouped such that `pytest-benchmark compare --group-by=group` produces a
+# regression report per code path, see CONTRIBUTING.md.
+
+def _gen_obs(rng, n_cfg=length, n_rep=1, irregular=False, mean=1.0):
+    samples = [rng.normal(mean, 0.1, n_cfg) for _ in range(n_rep)]
+    names = ['ens|r' + str(i) for i in range(n_rep)]
+    if irregular:
+        idl = [sorted(rng.choice(np.arange(1, 2 * n_cfg + 1), n_cfg, replace=False)) for _ in range(n_rep)]
+        return pe.Obs(samples, names, idl=idl)
+    return pe.Obs(samples, names)
+
+
+def _gen_corr(rng, T, N=1, n_cfg=200, parity=1):
+    t = np.arange(T)
+    energies = 0.1 + 0.15 * np.arange(N)
+    overlaps = np.eye(N) + 0.2 * rng.normal(size=(N, N))
+    if parity == 1:
+        propagation = np.cosh(energies[:, None] * (t - T / 2))
+    else:
+        propagation = np.sinh(energies[:, None] * (T / 2 - t))
+    exact = np.einsum('in,jn,nt->tij', overlaps, overlaps, propagation)
+    noise = rng.normal(1.0, 0.01, (n_cfg, T, N, N))
+    data = exact * (noise + noise.transpose(0, 1, 3, 2)) / 2
+    obs = np.array([pe.Obs([d], ['ens']) for d in data.reshape(n_cfg, -1).T]).reshape(T, N, N)
+    if N == 1:
+        return pe.Corr(list(obs[:, 0, 0]))
+    return pe.Corr(obs)
+
+
+@pytest.mark.benchmark(group="gamma_method")
+@pytest.mark.parametrize("n_cfg", [1000, 10000])
+@pytest.mark.parametrize("n_rep", [1, 4])
+@pytest.mark.parametrize("irregular", [False, True])
+def test_b_gamma_method(benchmark, n_cfg, n_rep, irregular):
+    my_obs = _gen_obs(np.random.default_rng(1), n_cfg, n_rep, irregular)
+    benchmark(my_obs.gamma_method)
+
+
+@pytest.mark.benchmark(group="gamma_method_batch")
+@pytest.mark.parametrize("n", [10, 100])
+def test_b_gamma_method_batch(benchmark, n):
+    rng = np.random.default_rng(2)
+    my_list = [_gen_obs(rng, n_rep=2) for i in range(n)]
+    benchmark(pe.gamma_method_batch, my_list)
+
+
+@pytest.mark.benchmark(group="derived_observable")
+@pytest.mark.parametrize("n", [10, 100])
+@pytest.mark.parametrize("n_rep", [1, 4])
+@pytest.mark.parametrize("irregular", [False, True])
+def test_b_derived_observable_replica(benchmark, n, n_rep, irregular):
+    rng = np.random.default_rng(3)
+    my_list = [_gen_obs(rng, n_rep=n_rep, irregular=irregular) for i in range(n)]
+    benchmark(pe.derived_observable, lambda x: anp.sum(x ** 2), my_list)
+
+
+@pytest.mark.benchmark(group="covariance")
+@pytest.mark.parametrize("dim", [10, 50])
+@pytest.mark.parametrize("irregular", [False, True])
+def test_b_covariance(benchmark, dim, irregular):
+    rng = np.random.default_rng(4)
+    my_list = [_gen_obs(rng, n_rep=2, irregular=irregular) for i in range(dim)]
+    pe.gamma_method(my_list)
+    benchmark(pe.covariance, my_list)
+
+
+@pytest.mark.benchmark(group="least_squares")
+@pytest.mark.parametrize("n_x", [20, 100])
+@pytest.mark.parametrize("correlated_fit", [False, True])
+def test_b_least_squares_correlated(benchmark, n_x, correlated_fit):
+    rng = np.random.default_rng(5)
+    x = np.arange(n_x) / n_x * 10
+    y = [_gen_obs(rng, mean=_fit_func([2.0, 0.5, 0.3], xx)) for xx in x]
+    pe.gamma_method(y)
+    benchmark(pe.fits.least_squares, x, y, _fit_func, silent=True, correlated_fit=correlated_fit)
+
+
+@pytest.mark.benchmark(group="total_least_squares")
+@pytest.mark.parametrize("n_x", [10, 40])
+def test_b_total_least_squares(benchmark, n_x):
+    rng = np.random.default_rng(6)
+    x = [_gen_obs(rng, mean=xx) for xx in np.arange(n_x) / n_x * 10]
+    y = [_gen_obs(rng, mean=_fit_func([2.0, 0.5, 0.3], xx.value)) for xx in x]
+    pe.gamma_method(x + y)
+    benchmark(pe.fits.total_least_squares, x, y, _fit_func, silent=True)
+
+
+@pytest.mark.benchmark(group="GEVP")
+@pytest.mark.parametrize("N", [2, 4])
+@pytest.mark.parametrize("T", [16, 48])
+@pytest.mark.parametrize("sort", [None, "Eigenvalue", "Eigenvector"])
+def test_b_GEVP(benchmark, N, T, sort):
+    corr = _gen_corr(np.random.default_rng(7), T, N)
+    benchmark(corr.GEVP, 2, ts=None if sort == "Eigenvalue" else 4, sort=sort)
+
+
+@pytest.mark.benchmark(group="m_eff")
+@pytest.mark.parametrize("T", [16, 64])
+@pytest.mark.parametrize("variant", ['log', 'cosh', 'periodic', 'sinh', 'arccosh', 'logsym'])
+def test_b_m_eff(benchmark, T, variant):
+    corr = _gen_corr(np.random.default_rng(8), T, parity=-1 if variant == 'sinh' else 1)
+    benchmark(corr.m_eff, variant)
+
+
+@pytest.mark.benchmark(group="linalg")
+@pytest.mark.parametrize("dim", [4, 10])
+@pytest.mark.parametrize("func", ["eigh", "inv", "svd"])
+def test_b_linalg(benchmark, dim, func):
+    rng = np.random.default_rng(9)
+    mat = np.array([_gen_obs(rng) for i in range(dim * dim)]).reshape(dim, dim)
+    mat = mat @ mat.T + np.diag(np.ones(dim) * dim)
+    benchmark(getattr(pe.linalg, func), mat)
+
+
+@pytest.mark.benchmark(group="io")
+@pytest.mark.parametrize("n", [10, 100])
+def test_b_json_round_trip(benchmark, tmp_path, n):
+    rng = np.random.default_rng(10)
+    my_list = [_gen_obs(rng, n_rep=2) for i in range(n)]
+    fname = (tmp_path / 'bench').as_posix()
+
+    def round_trip():
+        pe.input.json.dump_to_json(my_list, fname)
+        return pe.input.json.load_json(fname, verbose=False)
+
+    benchmark(round_trip)
+
+
+@pytest.mark.benchmark(group="io")
+@pytest.mark.parametrize("n", [10, 100])
+def test_b_dobs_round_trip(benchmark, tmp_path, n):
+    rng = np.random.default_rng(11)
+    my_list = [_gen_obs(rng, n_rep=2) for i in range(n)]
+    fname = (tmp_path / 'bench').as_posix()
+
+    def round_trip():
+        pe.input.dobs.write_dobs(my_list, fname, 'bench')
+        return pe.input.dobs.read_dobs(fname)
+
+    benchmark(round_trip)
+
+
+@pytest.mark.benchmark(group="io")
+def test_b_pandas_round_trip(benchmark, tmp_path):
+    rng = np.random.default_rng(12)
+    df = pd.DataFrame({'int': np.arange(50), 'Obs': [_gen_obs(rng, n_rep=2) for i in range(50)]})
+    fname = (tmp_path / 'bench').as_posix()
+
+    def round_trip():
+        pe.input.pandas.dump_df(df, fname)
+        return pe.input.pandas.load_df(fname)
+
+    benchmark(round_trip)
+
+
+@pytest.mark.benchmark(group="input")
+@pytest.mark.parametrize("n_cfg", [10, 100])
+def test_b_read_sfcf(benchmark, tmp_path, n_cfg):
+    path = (tmp_path / 'data_c').as_posix()
+    shutil.copytree('tests/data/sfcf_test/data_c', path)
+    for rep in range(3):
+        os.makedirs(path + '/data_c_r' + str(rep), exist_ok=True)
+        for cfg in range(1, n_cfg + 1):
+            shutil.copy('tests/data/sfcf_test/data_c/data_c_r0/data_c_r0_n1', path + '/data_c_r' + str(rep) + '/data_c_r' + str(rep) + '_n' + str(cfg))
+    benchmark(pe.input.sfcf.read_sfcf, path, 'data_c', 'f_1', quarks='lquark lquark', wf=0, wf2=0, version='2.0c', corr_type='bb', silent=True)
+
+
+@pytest.mark.benchmark(group="input")
+def test_b_read_openQCD(benchmark):
+    path = './tests/data/openqcd_test/'
+    benchmark(pe.input.openQCD.read_ms5_xsf, path, 'ms5_xsf_T24L16', 'dd', 'gA')
+
+
+@pytest.mark.benchmark(group="input")
+def test_b_read_qtop(benchmark):
+    benchmark(pe.input.openQCD.read_qtop, './tests/data/openqcd_test/', 'sfqcd', c=0.3, version='sfqcd')
+
+
+@pytest.mark.benchmark(group="input")
+@pytest.mark.parametrize("n_cfg", [10, 100])
+def test_b_read_hd5(benchmark, tmp_path, n_cfg):
+    rng = np.random.default_rng(13)
+    T = 32
+    for cfg in range(1, n_cfg + 1):
+        with h5py.File(tmp_path / ('bench.' + str(cfg) + '.h5'), 'w') as f:
+            data = np.zeros(T, dtype=[('re', '<f8'), ('im', '<f8')])
+            data['re'] = rng.normal(1.0, 0.1, T)
+            f.create_dataset('meson/meson_0/corr', data=data)
+    benchmark(pe.input.hadrons.read_hd5, (tmp_path / 'bench').as_posix(), 'ens', 'meson', attrs=0)
@@ -0,0 +1,133 @@
+import os
+import numpy as np
+import pyerrors as pe
+import pytest
+
+
+def _gen_corr(rng, tag=None):
+    corr = pe.Corr(np.array([pe.Obs([rng.normal(np.exp(-0.5 * t), 0.01, 100)], ['ens'], idl=[range(1, 200, 2)]) for t in range(8)]))
+    corr.tag = tag
+    return corr
+
+
+def test_cache_hits_and_misses(tmp_path):
+    rng = np.random.default_rng(25)
+    corr = _gen_corr(rng)
+    cache = pe.cache.Cache(tmp_path.as_posix())
+    calls = []
+    # Data read from the closure enters the key, callables do not
+    record = calls.append
+
+    @cache
+    def effective_mass(corr, variant='log'):
+        record(variant)
+        return corr.m_eff(variant=variant)
+
+    m_eff = effective_mass(corr)
+    assert cache.stats() == {'hits': 0, 'misses': 1, 'evictions': 0, 'entries': 1, 'size': cache.stats()['size']}
+    # Identical content in new objects and default arguments passed explicitly give the same key
+    copy = pe.Corr([pe.Obs([o.deltas['ens'] + o.r_values['ens']], ['ens'], idl=[range(1, 200, 2)]) for o in np.ravel(corr.content)])
+    copy.tag = 'Different tag'
+    for res in [effective_mass(corr), effective_mass(copy, variant='log'), effective_mass(corr, 'log')]:
+        for o1, o2 in zip(res.content, m_eff.content):
+            assert (o1 is None and o2 is None) or (o1[0] - o2[0]).is_zero(atol=0)
+    assert calls == ['log']
+    assert cache.stats()['hits'] == 3
+
+    effective_mass(corr, variant='cosh')
+    effective_mass(corr * 1.0000001)
+    assert calls == ['log', 'cosh', 'log']
+
+    # The cache persists in the directory
+    other = pe.cache.Cache(tmp_path.as_posix())
+    res = other(effective_mass.__wrapped__)(copy)
+    assert (res[3] - m_eff[3]).is_zero(atol=0)
+    assert other.stats()['hits'] == 1
+    assert other.stats()['entries'] == 3
+
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'size': 0}
+
+
+def test_cache_keys():
+    rng = np.random.default_rng(26)
+    obs = pe.Obs([rng.normal(1.0, 0.1, 100)], ['ens'])
+    ref = pe.cache.content_hash(obs)
+    assert pe.cache.content_hash(pe.Obs([obs.deltas['ens'] + obs.r_values['ens']], ['ens'])) == ref
+    assert pe.cache.content_hash(obs * 1.0000000001) != ref
+    assert pe.cache.content_hash(pe.Obs([obs.deltas['ens'] + obs.r_values['ens']], ['ens'], idl=[range(2, 202, 2)])) != ref
+    assert pe.cache.content_hash(obs + pe.cov_Obs(0.0, 0.1, 'cov')) != pe.cache.content_hash(obs + pe.cov_Obs(0.0, 0.2, 'cov'))
+    assert pe.cache.content_hash(pe.CObs(obs, obs)) != pe.cache.content_hash(pe.CObs(obs, 2 * obs))
+    assert pe.cache.content_hash({'a': 1, 'b': [obs, 2.0]}) == pe.cache.content_hash({'b': [obs, 2.0], 'a': 1})
+    assert pe.cache.content_hash([1, 2]) != pe.cache.content_hash((1, 2))
+    assert pe.cache.content_hash(np.arange(4)) != pe.cache.content_hash(np.arange(4).reshape(2, 2))
+    assert pe.cache.content_hash(np.array([obs, obs])) != pe.cache.content_hash(np.array([obs, 2 * obs]))
+    assert pe.cache.content_hash(lambda x: x ** 2) != pe.cache.content_hash(lambda x: x ** 3)
+    assert pe.cache.content_hash(np.sin) != pe.cache.content_hash(np.cos)
+
+    class Unpicklable:
+        def __reduce__(self):
+            raise TypeError
+
+    with pytest.raises(TypeError):
+        pe.cache.content_hash(Unpicklable())
+
+
+def test_cache_closures_and_globals(tmp_path):
+    cache = pe.cache.Cache(tmp_path.as_posix())
+    rng = np.random.default_rng(27)
+    obs = pe.Obs([rng.normal(1.0, 0.1, 100)], ['ens'])
+
+    def make(scale):
+        @cache
+        def scaled(x):
+            return scale * x
+        return scaled
+
+    assert make(2.0)(obs) == 2 * obs
+    assert make(3.0)(obs) == 3 * obs
+    assert make(3.0)(obs) == 3 * obs
+    assert cache.stats()['hits'] == 1
+
+    @cache
+    def shifted(x, *, shift=1.0):
+        return x + shift
+
+    first = shifted(obs)
+    shifted.__wrapped__.__kwdefaults__['shift'] = 2.0
+    assert shifted(obs) == first + 1
+
+    namespace = {'pe': pe, 't0': 1}
+    exec('def offset(x):\n    return x + t0', namespace)
+    offset = cache(namespace['offset'])
+    assert offset(obs) == obs + 1
+    namespace['t0'] = 3
+    assert offset(obs) == obs + 3
+    assert cache.stats()['hits'] == 1
+
+
+def test_cache_lru_eviction(tmp_path):
+    cache = pe.cache.Cache(tmp_path.as_posix())
+
+    @cache
+    def block(i):
+        return np.full(1000, i, dtype=np.float64)
+
+    block(0)
+    cache.max_size = 3 * cache.stats()['size']
+    for i in range(3):
+        block(i)
+        # Distinct modification times independent of the resolution of the file system
+        os.utime(cache._path(cache.key(block.__wrapped__, i)), ns=(i * 10 ** 9, i * 10 ** 9))
+    assert cache.stats()['entries'] == 3
+    assert np.all(block(0) == 0)
+    block(3)
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['entries'] == 3
+    assert stats['size'] <= cache.max_size
+    assert cache.key(block.__wrapped__, 1) not in cache
+    assert cache.key(block.__wrapped__, 0) in cache
+
+    with pytest.raises(ValueError):
+        pe.cache.Cache(tmp_path.as_posix(), max_size=0)
@@ -1,5 +1,7 @@
 import os
+import warnings
 import numpy as np
+import autograd.numpy as anp
 import scipy
 import matplotlib.pyplot as plt
 import pyerrors as pe
@@ -133,6 +135,60 @@ def test_m_eff():
         my_corr.m_eff('unkown_variant')
 
 
+def test_m_eff_periodic_vs_find_root():
+    rng = np.random.default_rng(11)
+    T = 24
+    for variant, func in [('cosh', anp.cosh), ('periodic', anp.cosh), ('sinh', anp.sinh)]:
+        vals = np.array([float(func(0.3 * (t - T / 2))) for t in range(T)])
+        for padding in [[0, 0], [2, 1]]:
+            corr = pe.Corr([pe.Obs([rng.normal(v, 0.002 * abs(v) + 0.002, 200)], ['ens']) for v in vals[padding[0]:T - padding[1]]], padding=padding)
+            m_eff = corr.m_eff(variant)
+            for t in range(T - 1):
+                if variant == 'sinh' and t in [T / 2, T / 2 - 1]:
+                    assert m_eff[t] == m_eff[T // 2 - 2]
+                    continue
+                if corr[t] is None or corr[t + 1] is None or corr[t].value / corr[t + 1].value < 0:
+                    assert m_eff[t] is None
+                    continue
+
+                def root_function(x, d):
+                    return func(x * (t - T / 2)) / func(x * (t + 1 - T / 2)) - d
+                ref = np.abs(pe.roots.find_root(corr[t] / corr[t + 1], root_function))
+                assert np.isclose(m_eff[t].value, ref.value, rtol=1e-7)
+                assert (m_eff[t] - ref).is_zero(atol=1e-6)
+            assert m_eff[T - 1] is None
+
+
+def test_m_eff_sinh_anti_symmetric():
+    rng = np.random.default_rng(14)
+    T = 16
+    vals = np.array([np.sinh(0.4 * (T / 2 - t)) for t in range(T)])
+    corr = pe.Corr([pe.Obs([rng.normal(v, 0.002, 200)], ['ens']) for v in vals]).anti_symmetric()
+    assert corr[T // 2].value == 0
+    m_eff = corr.m_eff('sinh')
+
+    # Loop over the timeslices with find_root, the two timeslices in the middle copy their predecessors in turn
+    ref = []
+    for t in range(T - 1):
+        if corr[t] is None or corr[t + 1] is None or corr[t + 1].value == 0:
+            ref.append(None)
+        elif t in [T / 2, T / 2 - 1]:
+            ref.append(ref[-1])
+        elif corr[t].value / corr[t + 1].value < 0:
+            ref.append(None)
+        else:
+            def root_function(x, d):
+                return anp.sinh(x * (t - T / 2)) / anp.sinh(x * (t + 1 - T / 2)) - d
+            ref.append(np.abs(pe.roots.find_root(corr[t] / corr[t + 1], root_function)))
+    ref.append(None)
+
+    assert [m is None for m in m_eff.content] == [r is None for r in ref]
+    assert m_eff[T // 2 - 1] is None and m_eff[T // 2] is None
+    for m, r in zip(m_eff.content, ref):
+        if r is not None:
+            assert (m[0] - r).is_zero(atol=1e-6)
+
+
 def test_m_eff_negative_values():
     for padding in [0, 4]:
         my_corr = pe.correlators.Corr([1.0 * pe.pseudo_Obs(10, 0.1, 't'), 1.0 * pe.pseudo_Obs(9, 0.05, 't'), -pe.pseudo_Obs(9, 0.1, 't')], padding=[padding, padding])
@@ -182,6 +238,103 @@ def test_fit_correlator():
         my_corr.fit(f, [0, 2, 3])
 
 
+def test_fit_scan():
+    my_corr = pe.Corr([pe.pseudo_Obs(np.exp(-0.3 * t), 0.01 * np.exp(-0.3 * t), 't') for t in range(12)])
+
+    def f(a, x):
+        return a[0] * anp.exp(-a[1] * x)
+
+    fitranges = [[t0, 10] for t0 in range(1, 6)]
+    scan = my_corr.fit_scan(f, fitranges)
+    assert len(scan) == len(fitranges)
+    for fitrange, res in zip(fitranges, scan):
+        ref = my_corr.fit(f, fitrange, silent=True)
+        assert np.isclose(ref[1].value, res[1].value)
+        assert (ref[1] - res[1]).is_zero(atol=1e-8)
+
+    with pytest.raises(Exception):
+        my_corr.fit_scan(f, [[0, 2, 3]])
+
+
+def test_array_storage():
+    rng = np.random.default_rng(7)
+    obs = [pe.Obs([rng.normal(np.cosh(0.3 * (t - 6)), 0.05, 80), rng.normal(np.cosh(0.3 * (t - 6)), 0.05, 40)], ['ens|r1', 'ens|r2']) for t in range(12)]
+    arr_corr = pe.Corr(pe.ObsArray(obs))
+    list_corr = pe.Corr(obs)
+    assert arr_corr._array is not None
+    assert list_corr._array is None
+
+    def _check(corr, ref):
+        assert corr.T == len(ref)
+        for t in range(corr.T):
+            if ref[t] is None:
+                assert corr.content[t] is None
+            else:
+                assert np.isclose(corr[t].value, ref[t].value)
+                assert (corr[t] - ref[t]).is_zero(atol=1e-10)
+
+    T = len(obs)
+    _check(arr_corr.deriv(), [None] + [0.5 * (obs[t + 1] - obs[t - 1]) for t in range(1, T - 1)] + [None])
+    _check(arr_corr.deriv('forward'), [obs[t + 1] - obs[t] for t in range(T - 1)] + [None])
+    _check(arr_corr.deriv('improved'), [None] * 2 + [(obs[t - 2] - 8 * obs[t - 1] + 8 * obs[t + 1] - obs[t + 2]) / 12 for t in range(2, T - 2)] + [None] * 2)
+    _check(arr_corr.second_deriv(), [None] + [obs[t + 1] - 2 * obs[t] + obs[t - 1] for t in range(1, T - 1)] + [None])
+    _check(arr_corr.m_eff(), [np.log(obs[t] / obs[t + 1]) for t in range(T - 1)] + [None])
+    _check(arr_corr.m_eff('logsym'), [None] + [np.log(obs[t - 1] / obs[t + 1]) / 2 for t in range(1, T - 1)] + [None])
+    _check(arr_corr.roll(3), obs[-3:] + obs[:-3])
+    _check(arr_corr.reverse(), obs[::-1])
+    _check(arr_corr.symmetric(), [obs[0]] + [0.5 * (obs[t] + obs[T - t]) for t in range(1, T)])
+    with pytest.warns(RuntimeWarning):
+        anti = arr_corr.anti_symmetric()
+    _check(anti, [obs[0]] + [0.5 * (obs[t] - obs[T - t]) for t in range(1, T)])
+    _check(arr_corr * arr_corr / 2 - obs[0], [o * o / 2 - obs[0] for o in obs])
+    _check(np.sin(arr_corr) ** 2 + abs(-arr_corr), [np.sin(o) ** 2 + o for o in obs])
+    _check(pe.Corr(pe.ObsArray(obs[:8]), padding=[2, 2]), [None] * 2 + obs[:8] + [None] * 2)
+
+    _check(list_corr.deriv('backward'), [None] + [obs[t] - obs[t - 1] for t in range(1, T)])
+    assert list_corr.deriv()._array is not None
+
+    # Undefined timeslices and Obs on different configurations fall back to the lists of Obs
+    padded = pe.Corr(obs[:8], padding=[1, 3])
+    _check(padded.deriv(), [None] * 2 + [0.5 * (obs[t + 1] - obs[t - 1]) for t in range(1, 7)] + [None] * 4)
+    other = pe.Corr([pe.Obs([rng.normal(1, 0.1, 80)], ['ens|r1'], idl=[range(1, 161, 2)]) for t in range(12)])
+    assert (arr_corr + other)._array is None
+    _check(arr_corr + other, [o + other[t] for t, o in enumerate(obs)])
+
+    mat_obs = np.array([[[o * (i + 1) + j for j in range(2)] for i in range(2)] for o in obs])
+    mat_corr = pe.Corr(pe.ObsArray(mat_obs))
+    vec = np.array([1.0, 0.5])
+    _check(mat_corr.projected(vec), [vec @ m @ vec for m in mat_obs])
+    _check(mat_corr.item(1, 0), [m[1, 0] for m in mat_obs])
+    rot = np.array([[0.0, 1.0], [1.0, 2.0]])
+    _check((mat_corr @ rot).item(0, 1), [(m @ rot)[0, 1] for m in mat_obs])
+    _check((rot @ mat_corr).item(1, 1), [(rot @ m)[1, 1] for m in mat_obs])
+    _check((mat_corr * arr_corr).item(0, 1), [m[0, 1] * o for m, o in zip(mat_obs, obs)])
+
+    # Changes to the content of an array backed Corr persist
+    res = mat_corr + 0
+    res[3][0, 1] = obs[0]
+    assert res._cached_array() is None
+    assert (res.item(0, 1)[3] - obs[0]).is_zero()
+
+    # Reading the content keeps the array, modifications and assignments drop it
+    res = arr_corr + 0
+    assert res.content[0][0] is not None
+    assert res._cached_array() is not None
+    _check(res.deriv('forward'), [obs[t + 1] - obs[t] for t in range(T - 1)] + [None])
+    res.content[2] = np.array([obs[0]])
+    assert res._cached_array() is None
+    _check(res.roll(1), [obs[-1], obs[0], obs[1], obs[0]] + obs[3:-1])
+    res = arr_corr + 0
+    res.content[4] = None
+    _check(res.reverse(), obs[5:][::-1] + [None] + obs[:4][::-1])
+    res = arr_corr + 0
+    res.content = list(res.content)
+    assert res._array is None
+
+    with pytest.raises(ValueError):
+        pe.Corr(pe.ObsArray(mat_obs[:, :, :1]))
+
+
 def test_plateau():
     my_corr = pe.correlators.Corr([pe.pseudo_Obs(1.01324, 0.05, 't'), pe.pseudo_Obs(1.042345, 0.008, 't')])
 
@@ -520,6 +673,52 @@ def _gen_corr(val, samples=2000):
     return pe.correlators.Corr(corr_content)
 
 
+def test_projected_states():
+    rng = np.random.default_rng(4)
+    N = 3
+    energies = np.linspace(0.3, 1.1, N)
+    overlaps = rng.random((N, N))
+    noise = [pe.Obs([rng.normal(1.0, 0.01, 200)], ['ens']) for _ in range(N)]
+    content = []
+    for t in range(10):
+        mat = np.empty((N, N), dtype=object)
+        for i in range(N):
+            for j in range(i, N):
+                mat[i, j] = mat[j, i] = sum(overlaps[i, k] * overlaps[j, k] * np.exp(-energies[k] * t) * noise[k] for k in range(N))
+        content.append(mat)
+    corr = pe.Corr(content, padding=[1, 0])
+
+    vecs = corr.GEVP(2)
+    with warnings.catch_warnings():
+        # The vectors of undefined timeslices are not normalized
+        warnings.simplefilter('error', RuntimeWarning)
+        states = corr.projected_states(vecs, normalize=True)
+    overlap_corr = corr.projected_states(vecs, overlaps=True)
+    assert len(states) == N
+    assert overlap_corr.N == N
+    for i in range(N):
+        for j in range(N):
+            ref = pe.Corr(content, padding=[1, 0]).projected(vecs[i], vecs[j])
+            for t in range(corr.T):
+                if vecs[i][t] is None or corr[t] is None:
+                    assert overlap_corr[t] is None
+                    continue
+                assert (overlap_corr[t][i, j] - ref[t]).is_zero(atol=1e-10)
+                assert (overlap_corr[t][i, j] - vecs[i][t] @ corr[t] @ vecs[j][t]).is_zero(atol=1e-10)
+                if i == j:
+                    assert (states[i][t] - ref[t] / (vecs[i][t] @ vecs[i][t])).is_zero(atol=1e-10)
+
+    fixed = [np.array([1.0, 0.0, 0.0]), np.array([0.0, 1.0, 1.0])]
+    for vec, proj in zip(fixed, corr.projected_states(np.array(fixed))):
+        for t in range(1, corr.T):
+            assert (proj[t] - vec @ corr[t] @ vec).is_zero(atol=1e-10)
+
+    with pytest.raises(Exception):
+        corr.projected_states([np.ones(N + 1)])
+    with pytest.raises(Exception):
+        corr.item(0, 0).projected_states(vecs)
+
+
 def test_prune():
 
     corr_aa = _gen_corr(1)
@@ -559,6 +758,63 @@ def test_corr_no_filtering():
     assert np.all([c[0].idl == o.idl for o in c])
 
 
+def test_GEVP_vector_obs_vs_linalg():
+    N = 4
+    energies = np.linspace(0.2, 1.2, N)
+    overlaps = np.random.rand(N, N)
+    noise = [pe.Obs([np.random.normal(1.0, 0.01, 200)], ['ens']) for _ in range(N)]
+    content = []
+    for t in range(8):
+        mat = np.empty((N, N), dtype=object)
+        for i in range(N):
+            for j in range(i, N):
+                mat[i, j] = mat[j, i] = sum(overlaps[i, k] * overlaps[j, k] * np.exp(-energies[k] * t) * noise[k] for k in range(N))
+        content.append(mat)
+    corr = pe.Corr(content)
+
+    t0 = 1
+    vecs = corr.GEVP(t0, vector_obs=True)
+    chol_inv = pe.linalg.inv(pe.linalg.cholesky(corr[t0]))
+    for t in range(t0 + 1, corr.T):
+        ev = pe.linalg.eigv(pe.linalg.matmul(chol_inv, corr[t], chol_inv.T))
+        ref = np.flip(pe.linalg.matmul(chol_inv.T, ev), axis=1).T
+        for state in range(N):
+            for o_ref, o in zip(ref[state], vecs[state][t]):
+                assert np.isclose(o_ref.value, o.value)
+                assert np.allclose(o_ref.deltas['ens'], o.deltas['ens'], atol=1e-8 * np.max(np.abs(o_ref.deltas['ens'])))
+
+
+def test_sort_vectors():
+    N = 4
+    reference = np.random.normal(size=(N, N))
+    vec_set = [None, reference]
+    perms = []
+    for t in range(10):
+        perms.append(np.random.permutation(N))
+        vec_set.append((reference + 0.05 * np.random.normal(size=(N, N)))[perms[-1]])
+
+    hungarian = pe.correlators._sort_vectors(vec_set, 1)
+    permutation = pe.correlators._sort_vectors(vec_set, 1, method='permutation')
+    assert hungarian[0] is None and permutation[0] is None
+    for t in range(1, len(vec_set)):
+        assert np.allclose(np.array(hungarian[t]), np.array(permutation[t]))
+        assert np.allclose(np.array(hungarian[t]), reference, atol=0.5)
+
+    # Cyclic permutations have to be inverted
+    cyclic = pe.correlators._sort_vectors([reference, reference[[1, 2, 3, 0]]], 0)
+    assert np.allclose(np.array(cyclic[1]), reference)
+
+    with pytest.raises(ValueError):
+        pe.correlators._sort_vectors(vec_set, 1, method='greedy')
+
+    corr = pe.input.json.load_json("tests/data/test_matrix_corr.json.gz")
+    vecs_h = corr.GEVP(2, ts=5, sort="Eigenvector")
+    vecs_p = corr.GEVP(2, ts=5, sort="Eigenvector", sort_method="permutation")
+    for state_h, state_p in zip(vecs_h, vecs_p):
+        for vh, vp in zip(state_h, state_p):
+            assert (vh is None and vp is None) or np.allclose(vh, vp)
+
+
 def test_corr_symmetric():
     obs = []
     for _ in range(4):
@@ -2,6 +2,7 @@ import numpy as np
 import autograd.numpy as anp
 import matplotlib.pyplot as plt
 import math
+import concurrent.futures
 import scipy.optimize
 from scipy.odr import ODR, Model, RealData
 from scipy.linalg import cholesky
@@ -101,6 +102,34 @@ def test_least_squares_num_grad():
     assert(num[1] == auto[1])
 
 
+def test_least_squares_gauss_newton():
+    def func(a, x):
+        return a[0] * anp.exp(-a[1] * x) + a[2]
+
+    rng = np.random.default_rng(1)
+    x = np.arange(1, 30) / 5
+    y = [pe.Obs([rng.normal(func([2.0, 0.5, 0.3], xx), 0.1, 500)], ['ens']) for xx in x]
+    [o.gamma_method() for o in y]
+
+    for kwargs in [{}, {'correlated_fit': True}, {'priors': {0: '2.0(1)', 2: '0.3(1)'}}, {'priors': ['2.0(1)', '0.5(1)', '0.3(1)'], 'correlated_fit': True}, {'num_grad': True}]:
+        default = pe.fits.least_squares(x, y, func, silent=True, **kwargs)
+        gauss_newton = pe.fits.least_squares(x, y, func, silent=True, gauss_newton=True, **kwargs)
+        for p1, p2 in zip(default, gauss_newton):
+            assert np.isclose(p1.value, p2.value)
+            assert np.allclose(p1.deltas['ens'], p2.deltas['ens'], atol=1e-10)
+            p1.gamma_method()
+            p2.gamma_method()
+            assert np.isclose(p1.dvalue, p2.dvalue, rtol=1e-8)
+
+    xd = {'a': x[:15], 'b': x[15:]}
+    yd = {'a': y[:15], 'b': y[15:]}
+    funcd = {'a': func, 'b': lambda a, x: a[0] * anp.exp(-a[1] * x) + a[2] + 0 * x}
+    default = pe.fits.least_squares(xd, yd, funcd, silent=True)
+    gauss_newton = pe.fits.least_squares(xd, yd, funcd, silent=True, gauss_newton=True)
+    for p1, p2 in zip(default, gauss_newton):
+        assert (p1 - p2).is_zero(atol=1e-10)
+
+
 def test_prior_fit_num_grad():
     x = []
     y = []
@@ -234,6 +263,51 @@ def test_fit_corr_independent():
         assert (out[1] - out_corr[1]).is_zero(atol=1e-4)
 
 
+def test_least_squares_batch():
+    rng = np.random.default_rng(2)
+    x = np.arange(20)
+    y = [pe.Obs([rng.normal(0.84 * np.exp(-0.12 * xx), 0.01, 300)], ['ens']) for xx in x]
+    [o.gamma_method() for o in y]
+
+    def func(a, x):
+        return a[0] * anp.exp(-a[1] * x)
+
+    x_list = [x[t:] for t in range(8)]
+    y_list = [y[t:] for t in range(8)]
+    for kwargs in [{}, {'correlated_fit': True}, {'priors': ['0.8(1)', '0.1(1)'], 'n_jobs': 2}, {'correlated_fit': True, 'warm_start': False, 'gauss_newton': False}]:
+        batch = pe.least_squares_batch(x_list, y_list, func, **kwargs)
+        assert len(batch) == len(x_list)
+        kwargs.pop('n_jobs', None)
+        kwargs.pop('warm_start', None)
+        for xs, ys, res in zip(x_list, y_list, batch):
+            ref = pe.least_squares(xs, ys, func, silent=True, **kwargs)
+            assert np.isclose(ref.chisquare, res.chisquare)
+            assert ref.dof == res.dof
+            for p1, p2 in zip(ref, res):
+                assert np.isclose(p1.value, p2.value, rtol=1e-8)
+                assert np.allclose(p1.deltas['ens'], p2.deltas['ens'], atol=1e-8)
+
+    class SerialExecutor(concurrent.futures.Executor):
+        def submit(self, fn, *args, **kwargs):
+            future = concurrent.futures.Future()
+            future.set_result(fn(*args, **kwargs))
+            return future
+
+    ref = pe.least_squares_batch(x_list, y_list, func, n_jobs=2)
+    batch = pe.least_squares_batch(x_list, y_list, func, executor=SerialExecutor())
+    for r1, r2 in zip(ref, batch):
+        assert np.isclose(r1.chisquare, r2.chisquare)
+        assert np.allclose([p.value for p in r1], [p.value for p in r2])
+
+    assert pe.least_squares_batch([], [], func) == []
+    with pytest.raises(ValueError):
+        pe.least_squares_batch(x_list, y_list[:-1], func)
+    with pytest.raises(TypeError):
+        pe.least_squares_batch(x_list, y_list, {'a': func})
+    with pytest.raises(TypeError):
+        pe.least_squares_batch(x_list, y_list, func, n_jobs=2.0)
+
+
 def test_linear_fit_guesses():
     for err in [1.2, 0.1, 0.001]:
         xvals = []
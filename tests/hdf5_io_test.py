@@ -0,0 +1,94 @@
+import numpy as np
+import pyerrors as pe
+import pytest
+
+
+def _gen_data(rng):
+    idl = sorted(rng.choice(np.arange(1, 201), 50, replace=False))
+    o = pe.Obs([rng.normal(1.0, 0.1, 100), rng.normal(1.0, 0.1, 50)], ['ens|r1', 'ens|r2'], idl=[range(1, 101), idl])
+    o2 = o * pe.cov_Obs([1.0, 2.0], [[0.1, 0.01], [0.01, 0.2]], 'cov')[1]
+    o2.tag = 'with covobs'
+    corr = pe.Corr([pe.Obs([rng.normal(1.0, 0.1, 200)], ['other']) for _ in range(8)], padding=[1, 0])
+    corr.tag = 'test correlator'
+    corr.prange = [2, 5]
+    mat = pe.Corr(np.array([pe.Obs([rng.normal(1.0, 0.1, 200)], ['other']) for _ in range(6 * 4)]).reshape(6, 2, 2))
+    return [o, [o, 2 * o], np.array([[o2, o2 + 1], [o2 * 3, o2]]), corr, mat, pe.cov_Obs(0.5, 0.01, 'only_cov')]
+
+
+def _check(original, res):
+    assert type(original) is type(res)
+    if isinstance(original, pe.Obs):
+        assert (original - res).is_zero(atol=1e-14)
+        assert original.idl == res.idl
+        assert original.tag == res.tag
+        assert original.reweighted == res.reweighted
+        assert sorted(original.names) == sorted(res.names)
+    elif isinstance(original, pe.Corr):
+        assert original.tag == res.tag
+        assert original.prange == res.prange
+        assert original.N == res.N
+        for t1, t2 in zip(original.content, res.content):
+            assert (t1 is None) == (t2 is None)
+            if t1 is not None:
+                for o1, o2 in zip(np.ravel(t1), np.ravel(t2)):
+                    _check(o1, o2)
+    else:
+        assert np.shape(original) == np.shape(res)
+        for o1, o2 in zip(np.ravel(original), np.ravel(res)):
+            _check(o1, o2)
+
+
+@pytest.mark.parametrize("suffix", ['.h5', '.npz'])
+@pytest.mark.parametrize("compression", [None, 'gzip'])
+def test_hdf5_round_trip(tmp_path, suffix, compression):
+    ol = _gen_data(np.random.default_rng(21))
+    fname = (tmp_path / ('test' + suffix)).as_posix()
+    pe.input.hdf5.dump(ol, fname, description='round trip', compression=compression)
+    res = pe.input.hdf5.load(fname)
+    assert len(res) == len(ol)
+    for original, o in zip(ol, res):
+        _check(original, o)
+
+    full = pe.input.hdf5.load(fname, full_output=True, verbose=False)
+    assert full['description'] == 'round trip'
+    assert len(full['obsdata']) == len(ol)
+
+    res = pe.input.hdf5.load(fname, keys=[3, 0], verbose=False)
+    _check(ol[3], res[0])
+    _check(ol[0], res[1])
+
+    res = pe.input.hdf5.load(fname, keys=[2], verbose=False, mmap_dir=tmp_path.as_posix())
+    assert isinstance(res[0][0, 0].deltas['ens|r1'], np.memmap)
+    _check(ol[2], res[0])
+
+
+def test_hdf5_dict(tmp_path):
+    ol = _gen_data(np.random.default_rng(22))
+    od = {'obs': ol[0], 'corr': ol[3], 'matrix': ol[4]}
+    fname = (tmp_path / 'test').as_posix()
+    pe.input.hdf5.dump(od, fname)
+    res = pe.input.hdf5.load(fname, verbose=False)
+    assert list(res.keys()) == list(od.keys())
+    for key in od:
+        _check(od[key], res[key])
+    res = pe.input.hdf5.load(fname, keys=['matrix'], verbose=False)
+    assert list(res.keys()) == ['matrix']
+    _check(od['matrix'], res['matrix'])
+
+    single = (tmp_path / 'single').as_posix()
+    pe.input.hdf5.dump(ol[0], single)
+    _check(ol[0], pe.input.hdf5.load(single + '.h5', verbose=False))
+
+
+def test_hdf5_exceptions(tmp_path):
+    o = pe.pseudo_Obs(1.0, 0.1, 'ens')
+    fname = (tmp_path / 'test').as_posix()
+    with pytest.raises(ValueError):
+        pe.input.hdf5.dump({'a/b': o}, fname)
+    with pytest.raises(Exception):
+        pe.input.hdf5.dump([[o, pe.pseudo_Obs(1.0, 0.1, 'other')]], fname)
+    with pytest.raises(Exception):
+        pe.input.hdf5.dump(['string'], fname)
+    pe.input.hdf5.dump([o], fname)
+    with pytest.raises(KeyError):
+        pe.input.hdf5.load(fname, keys=[1])
@@ -409,3 +409,179 @@ def assert_equal_Obs(to, ro):
                 print(kw, "does not match.")
                 return False
     return True
+
+
+def test_json_memmap(tmp_path):
+    ol = [pe.pseudo_Obs(1.0, 0.1, 'ens|r1') * pe.pseudo_Obs(2.0, 0.1, 'ens|r2'), pe.pseudo_Obs(3.0, 0.2, 'other', samples=50)]
+    fname = (tmp_path / 'test').as_posix()
+    jsonio.dump_to_json(ol, fname)
+    res = jsonio.load_json(fname, mmap_dir=tmp_path.as_posix())
+    for o_ref, o in zip(ol, res):
+        assert all(isinstance(d, np.memmap) for d in o.deltas.values())
+        assert o == o_ref
+    res = jsonio.load_json(fname, full_output=True, mmap_dir=tmp_path.as_posix())
+    assert all(isinstance(o.deltas['other'], np.memmap) for o in res['obsdata'][1:])
+
+
+def test_json_streaming(tmp_path):
+    rng = np.random.default_rng(22)
+    o1 = pe.Obs([rng.normal(1.0, 0.1, 300), rng.normal(1.0, 0.1, 200)], ['ens|r1', 'ens|r2'], idl=[range(1, 301), range(2, 402, 2)])
+    o1.tag = 'first'
+    o2 = o1 * pe.cov_Obs(2.0, 0.1 ** 2, 'cov') + pe.Obs([rng.normal(0.0, 0.1, 50)], ['other'], idl=[[1, 3, 4, 8] + list(range(10, 56))])
+    o2.tag = 'b'
+    nan = pe.Obs([np.append(rng.normal(1.0, 0.1, 99), np.nan)], ['nan'])
+    corr = pe.Corr(np.array([pe.Obs([rng.normal(1.0, 0.1, 300)], ['c'], idl=[range(1, 301)]) for _ in range(8)]))
+    corr.content[0] = None
+    corr.tag = 'corr'
+    corr.prange = [2, 5]
+    o3 = 2 * o2
+    ol = [o1, [o3, o2], np.array([[o1, o1 ** 2], [o1 / 3, o1]]), corr, nan]
+
+    for gz in [True, False]:
+        fname = (tmp_path / 'stream').as_posix()
+        jsonio.dump_to_json(ol, fname, description={'tag': 'obsdata'}, gz=gz)
+        ref = jsonio.load_json(fname, gz=gz, full_output=True)
+        res = jsonio.load_json(fname, gz=gz, full_output=True, streaming=True)
+        assert ref['description'] == res['description']
+        assert np.all(res['obsdata'][0] == o1)
+        assert res['obsdata'][1] == [o3, o2]
+        assert np.all(res['obsdata'][2] == ol[2])
+        assert res['obsdata'][3].tag == corr.tag
+        assert res['obsdata'][3].prange == corr.prange
+        assert res['obsdata'][3].content[0] is None
+        assert res['obsdata'][4].idl == nan.idl
+        assert np.isnan(res['obsdata'][4].deltas['nan'][-1])
+        for o_ref, o in zip(ref['obsdata'][1], res['obsdata'][1]):
+            assert o_ref.tag == o.tag
+            assert o_ref.idl == o.idl
+            assert o_ref.r_values == o.r_values
+            assert o_ref.covobs['cov'].errsq() == o.covobs['cov'].errsq()
+            for name in o_ref.deltas:
+                assert np.array_equal(o_ref.deltas[name], o.deltas[name])
+
+    # Small chunks split the deltas at arbitrary positions
+    with open(fname + '.json', 'r', encoding='utf-8') as fin:
+        small = jsonio._stream_json_dict(fin, chunk_size=17)
+    with open(fname + '.json', 'r', encoding='utf-8') as fin:
+        d = rapidjson.load(fin)
+    for entry, entry_ref in zip(small['obsdata'], d['obsdata']):
+        for ens, ens_ref in zip(entry['data'], entry_ref['data']):
+            for rep, rep_ref in zip(ens['replica'], ens_ref['replica']):
+                assert np.array_equal(rep['deltas'], np.array(rep_ref['deltas']), equal_nan=True)
+
+    for streaming in [False, True]:
+        res = jsonio.load_json(fname, gz=False, streaming=streaming, indices=[0, 4])
+        assert len(res) == 2
+        assert res[0] == o1
+        res = jsonio.load_json(fname, gz=False, streaming=streaming, tags=['b', 'corr'])
+        assert len(res) == 2
+        assert res[0] == [o3, o2]
+        assert res[1].tag == 'corr'
+        res = jsonio.load_json(fname, gz=False, streaming=streaming, indices=[0], tags=['corr'])
+        assert len(res) == 2
+        assert jsonio.load_json(fname, gz=False, streaming=streaming, tags=['missing']) == []
+
+    od = {'a': o1, 'b': [o3, o2]}
+    jsonio.dump_dict_to_json(od, fname)
+    res = jsonio.load_json_dict(fname, streaming=True)
+    assert res['a'] == o1
+    assert res['b'] == [o3, o2]
+
+
+
+def test_json_streaming_deltas_keys(tmp_path):
+    rng = np.random.default_rng(24)
+    o1 = pe.Obs([rng.normal(1.0, 0.1, 40), rng.normal(1.0, 0.1, 30)], ['ens|r1', 'ens|r2'])
+    o1.tag = {'deltas': [[1, 2], [3, 4]]}
+    o2 = pe.Obs([rng.normal(2.0, 0.1, 20)], ['other'])
+    o2.tag = {'deltas': []}
+    fname = (tmp_path / 'keys').as_posix()
+    for description in [{'deltas': [[1, 2], [3, 4]]}, {'deltas': [1, 2]}, {'deltas': []}]:
+        jsonio.dump_to_json([o1, o2], fname, description=description, gz=False)
+        with open(fname + '.json', 'r', encoding='utf-8') as fin:
+            d = rapidjson.load(fin)
+        for chunk_size in [1, 3, 17, 2 ** 22]:
+            with open(fname + '.json', 'r', encoding='utf-8') as fin:
+                res = jsonio._stream_json_dict(fin, chunk_size=chunk_size)
+            assert res['description'] == description
+            for entry, entry_ref in zip(res['obsdata'], d['obsdata']):
+                assert entry['tag'] == entry_ref['tag']
+                for ens, ens_ref in zip(entry['data'], entry_ref['data']):
+                    for rep, rep_ref in zip(ens['replica'], ens_ref['replica']):
+                        assert np.array_equal(rep['deltas'], np.array(rep_ref['deltas']))
+        res = jsonio.load_json(fname, gz=False, streaming=True, full_output=True)
+        assert res['description'] == description
+        assert res['obsdata'][0] == o1
+        assert res['obsdata'][0].tag == o1.tag
+        assert res['obsdata'][1] == o2
+        assert jsonio.load_json(fname, gz=False, streaming=True, tags=[{'deltas': []}]) == [o2]
+
+def test_json_load_many(tmp_path):
+    rng = np.random.default_rng(23)
+    o1 = pe.Obs([rng.normal(1.0, 0.1, 200), rng.normal(1.0, 0.1, 100)], ['ens|r1', 'ens|r2'], idl=[range(1, 201), range(1, 200, 2)])
+    o2 = o1 * pe.cov_Obs(2.0, 0.1 ** 2, 'cov')
+    o2.tag = 'tagged'
+    corr = pe.Corr(np.array([pe.Obs([rng.normal(1.0, 0.1, 50)], ['c']) for _ in range(4)]))
+    paths = []
+    for i in range(4):
+        paths.append((tmp_path / ('list%d' % i)).as_posix())
+        jsonio.dump_to_json([(i + 1) * o1, [o2, o2 / (i + 1)], corr], paths[-1], description='file %d' % i)
+    paths.append((tmp_path / 'single').as_posix())
+    jsonio.dump_to_json(pe.cov_Obs(1.0, 0.1, 'only_cov'), paths[-1])
+
+    for n_jobs in [None, 2]:
+        res = jsonio.load_many(paths, n_jobs=n_jobs, verbose=False)
+        assert len(res) == len(paths)
+        for fname, r in zip(paths, res):
+            ref = jsonio.load_json(fname, verbose=False)
+            if isinstance(ref, pe.Obs):
+                assert r == ref
+                assert r.covobs['only_cov'].errsq() == ref.covobs['only_cov'].errsq()
+                continue
+            assert r[0] == ref[0]
+            assert r[1] == ref[1]
+            assert r[1][0].tag == 'tagged'
+            assert np.all(r[2].content == ref[2].content)
+        full = jsonio.load_many(paths[:2], n_jobs=n_jobs, verbose=False, full_output=True)
+        assert [f['description'] for f in full] == ['file 0', 'file 1']
+        selected = jsonio.load_many(paths[:2], n_jobs=n_jobs, verbose=False, tags=['tagged'])
+        assert [len(sel) for sel in selected] == [1, 1]
+
+    od = {'a': o1, 'b': {'c': [o2, o2]}}
+    dict_paths = [(tmp_path / ('dict%d' % i)).as_posix() for i in range(3)]
+    for fname in dict_paths:
+        jsonio.dump_dict_to_json(od, fname)
+    for res in jsonio.load_many(dict_paths, n_jobs=3, as_dict=True, verbose=False):
+        assert res['a'] == o1
+        assert res['b']['c'] == [o2, o2]
+
+    with pytest.raises(TypeError):
+        jsonio.load_many(paths, n_jobs=1.5)
+    with pytest.raises(ValueError):
+        jsonio.load_many(dict_paths, as_dict=True, indices=[0])
+    with pytest.raises(Exception):
+        jsonio.load_many(paths + [(tmp_path / 'missing').as_posix()], n_jobs=2, verbose=False)
+
+
+def test_json_compresslevel(tmp_path):
+    rng = np.random.default_rng(24)
+    obs = pe.Obs([rng.normal(1.0, 0.1, 500)], ['ens'], idl=[range(2, 1002, 2)]) * pe.cov_Obs([1.0, 2.0], [[0.1, 0.01], [0.01, 0.2]], 'cov')[1]
+    corr = pe.Corr([None] + [np.array([[obs, 2 * obs], [obs / 3, obs ** 2]])] * 3 + [None])
+    ol = [obs, [obs, obs + 1], corr]
+    sizes = []
+    for level in [1, 9]:
+        fname = (tmp_path / ('level%d' % level)).as_posix()
+        jsonio.dump_to_json(ol, fname, compresslevel=level)
+        sizes.append(os.path.getsize(fname + '.json.gz'))
+        res = jsonio.load_json(fname, verbose=False)
+        assert res[0] == obs
+        assert res[1] == [obs, obs + 1]
+        assert res[2].content[0] is None and res[2].content[4] is None
+        for t in range(1, 4):
+            assert np.all(res[2].content[t] == corr.content[t])
+        for name in obs.deltas:
+            assert np.array_equal(res[0].deltas[name], obs.deltas[name])
+    assert sizes[1] <= sizes[0]
+
+    jsonio.dump_dict_to_json({'a': obs}, (tmp_path / 'dict').as_posix(), compresslevel=1)
+    assert jsonio.load_json_dict((tmp_path / 'dict').as_posix(), verbose=False)['a'] == obs
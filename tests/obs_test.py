@@ -1,6 +1,9 @@
 import numpy as np
 import autograd.numpy as anp
 import os
+import sys
+import pickle
+import concurrent.futures
 import copy
 import matplotlib.pyplot as plt
 import pyerrors as pe
@@ -1063,6 +1066,44 @@ def test_covariance_reorder_non_overlapping_data():
     assert np.isclose(corr1[0, 1], corr2[0, 1], atol=1e-14)
 
 
+def test_covariance_matrix_vs_pairwise():
+    def pairwise_cov(obs1, obs2):
+        cov = 0.0
+        for e_name in set(obs1.mc_names) & set(obs2.mc_names):
+            gamma = 0.0
+            gamma_div = 0.0
+            for r_name in set(obs1.e_content[e_name]) & set(obs2.e_content[e_name]):
+                common = sorted(set(obs1.idl[r_name]) & set(obs2.idl[r_name]))
+                if not common:
+                    continue
+                d1 = obs1.deltas[r_name][np.isin(list(obs1.idl[r_name]), common)]
+                d2 = obs2.deltas[r_name][np.isin(list(obs2.idl[r_name]), common)]
+                gamma += np.sum(d1 * d2)
+                gamma_div += np.sqrt(np.sum(d1 ** 2) * np.sum(d2 ** 2))
+            if gamma != 0.0:
+                cov += gamma / gamma_div
+        for e_name in set(obs1.cov_names) & set(obs2.cov_names):
+            cov += (obs1.covobs[e_name].grad.T @ obs1.covobs[e_name].cov @ obs2.covobs[e_name].grad).item()
+        return cov
+
+    cobs = pe.cov_Obs([1.0, 2.0], [[0.1, 0.02], [0.02, 0.3]], 'cov')
+    obs = [pe.Obs([np.random.normal(1.0, 0.1, 100), np.random.normal(1.0, 0.1, 50)], ['ens|r1', 'ens|r2']),
+           pe.Obs([np.random.normal(1.0, 0.1, 50)], ['ens|r1'], idl=[range(1, 101, 2)]) * cobs[0],
+           pe.Obs([np.random.normal(1.0, 0.1, 30), np.random.normal(1.0, 0.1, 40)], ['ens|r2', 'other'], idl=[range(21, 51), range(1, 41)]),
+           pe.Obs([np.random.normal(1.0, 0.1, 40)], ['other']) + cobs[1] * cobs[0],
+           pe.Obs([np.random.normal(1.0, 0.1, 25)], ['ens|r1'], idl=[range(2, 52, 2)])]
+    for o in obs:
+        o.gamma_method()
+
+    cov = pe.obs._covariance_matrix(obs)
+    ref = np.array([[pairwise_cov(o1, o2) for o2 in obs] for o1 in obs])
+    assert np.allclose(cov, ref, atol=1e-14)
+    assert np.all(cov == cov.T)
+
+    with pytest.raises(Exception):
+        pe.covariance([obs[0], pe.Obs([np.random.rand(100)], ['ens|r1'])])
+
+
 def test_empty_obs():
     o = pe.Obs([np.random.rand(100)], ['test'])
     q = o + pe.Obs([], [], means=[])
@@ -1436,4 +1477,308 @@ def test_missing_replica():
 
     for op in [[O1O2, O1O2b], [O1O2O3, O1O2O3b]]:
         assert np.isclose(op[1].value, op[0].value)
-        assert np.isclose(op[1].dvalue, op[0].dvalue, atol=0, rtol=5e-2)
\ No newline at end of file
+        assert np.isclose(op[1].dvalue, op[0].dvalue, atol=0, rtol=5e-2)
+
+def test_gamma_method_batch():
+    attributes = ['e_dvalue', 'e_ddvalue', 'e_tauint', 'e_dtauint', 'e_windowsize']
+    obs = [pe.Obs([np.random.normal(1.0, 0.1, 500), np.random.normal(1.0, 0.1, 201)], ['ens|r1', 'ens|r2'], idl=[range(1, 501), range(1, 402, 2)]) for _ in range(5)]
+    obs += [pe.Obs([np.random.normal(1.0, 0.1, 300)], ['other'], idl=[list(range(1, 300)) + [302]]) for _ in range(3)]
+    obs = [o1 * o2 for o1, o2 in zip(obs, obs[::-1])]
+    obs.append(pe.cov_Obs(1.0, 0.01, 'cov') * obs[0])
+    obs.append(pe.Obs([np.ones(500)], ['ens|r1']))
+    obs.append(pe.CObs(obs[1], obs[2]))
+    obs.append(None)
+    copies = [copy.deepcopy(o) for o in obs]
+
+    for kwargs in [{}, {'S': 0}, {'S': 3.5}, {'tau_exp': 10}, {'fft': False}]:
+        pe.gamma_method_batch(obs, **kwargs)
+        for o in copies:
+            if o is not None:
+                o.gamma_method(**kwargs)
+        for o, c in zip(obs, copies):
+            if o is None:
+                continue
+            for part, c_part in ([(o.real, c.real), (o.imag, c.imag)] if isinstance(o, pe.CObs) else [(o, c)]):
+                assert part.dvalue == c_part.dvalue
+                assert part.ddvalue == c_part.ddvalue
+                for attr in attributes:
+                    assert getattr(part, attr) == getattr(c_part, attr)
+                for e_name in part.mc_names:
+                    assert np.array_equal(part.e_rho[e_name], c_part.e_rho[e_name])
+                    assert np.array_equal(part.e_drho[e_name], c_part.e_drho[e_name])
+
+    with pytest.raises(Exception):
+        pe.gamma_method_batch(obs, S=-1)
+
+
+def test_idl_cache():
+    pe.obs.idl_cache_clear()
+    idl1 = [1, 2, 4, 5, 7, 9, 10, 12]
+    idl2 = [2, 3, 4, 5, 6, 9, 11, 12]
+    o1 = pe.Obs([np.random.normal(1.0, 0.1, 8)], ['ens'], idl=[idl1])
+    o2 = pe.Obs([np.random.normal(1.0, 0.1, 8)], ['ens'], idl=[list(idl1)])
+    o3 = pe.Obs([np.random.normal(1.0, 0.1, 8)], ['ens'], idl=[np.array(idl2)])
+    assert o1.idl['ens'] is o2.idl['ens']
+    assert o1.idl['ens'] is not idl1
+    assert o3.idl['ens'] == idl2
+
+    assert pe.obs._merge_idx([idl1, idl2]) == sorted(set(idl1) | set(idl2))
+    assert pe.obs._intersection_idx([idl1, idl2]) == [2, 4, 5, 9, 12]
+    assert pe.obs._merge_idx([range(1, 11, 2), range(2, 12, 2)]) == range(1, 11)
+    assert pe.obs._intersection_idx([range(1, 21, 2), range(1, 21, 4)]) == range(1, 21, 4)
+
+    for _ in range(3):
+        res = o1 + o3
+    assert res.idl['ens'] == pe.obs._merge_idx([idl1, idl2])
+    info = pe.obs.idl_cache_info()
+    assert info['merge_idx'].hits >= 2
+    assert info['scatter_index'].hits >= 4
+    assert info['interned_idl'] > 0
+
+    deltas = np.random.normal(0.0, 0.1, 8)
+    new_idx = pe.obs._merge_idx([idl1, idl2])
+    expanded = pe.obs._expand_deltas_for_merge(deltas, idl1, 8, new_idx, 1)
+    ref = np.zeros(len(new_idx))
+    for d, i in zip(deltas, idl1):
+        ref[new_idx.index(i)] = d
+    assert np.array_equal(expanded, ref * len(new_idx) / len(idl1))
+
+    pe.obs.idl_cache_clear()
+    info = pe.obs.idl_cache_info()
+    assert info['merge_idx'].currsize == 0
+    assert info['interned_idl'] == 0
+    assert (o1 + o3) == res
+
+
+def test_idl_registry_bounded():
+    rng = np.random.default_rng(3)
+    pe.obs.idl_cache_clear()
+    size = pe.obs._idl_recent_size
+    counts = []
+    for i in range(2 * size + 200):
+        idl = [1, 3, 4 + i % 5, 10, 20 + i]
+        obs = pe.Obs([rng.normal(1.0, 0.1, 5)], ['ens'], idl=[idl])
+        obs = obs + obs
+        if i % size == size - 1:
+            counts.append(pe.obs.idl_cache_info()['interned_idl'])
+    assert counts[0] == counts[1] <= size + 1
+    del obs
+    pe.obs._idl_recent.clear()
+    assert pe.obs.idl_cache_info()['interned_idl'] == 0
+
+    # Interned lists in use survive the registry
+    o1 = pe.Obs([rng.normal(1.0, 0.1, 5)], ['ens'], idl=[[1, 3, 4, 9, 11]])
+    assert pe.obs._is_interned(o1.idl['ens'])
+    pe.obs._idl_recent.clear()
+    o2 = pe.Obs([rng.normal(1.0, 0.1, 5)], ['ens'], idl=[[1, 3, 4, 9, 11]])
+    assert o1.idl['ens'] is o2.idl['ens']
+    assert type(pickle.loads(pickle.dumps(o1.idl['ens']))) is list
+
+
+def test_idl_registry_threads(monkeypatch):
+    monkeypatch.setattr(pe.obs, '_idl_recent_size', 8)
+    pe.obs.idl_cache_clear()
+
+    def work(offset):
+        for i in range(300):
+            idl = [[1, 3, offset + i + 5], [2, 3, 2 * offset + i + 6]]
+            assert pe.obs._merge_idx(idl) == sorted(set(idl[0]) | set(idl[1]))
+            assert pe.obs._intersection_idx(idl) == [3]
+            assert pe.obs._intern_idl(idl[0]) == idl[0]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(work, [1000 * i for i in range(8)]))
+    assert len(pe.obs._idl_recent) <= 8
+
+
+def test_derived_observable_homogeneous():
+    obs = [pe.Obs([np.random.normal(1.0, 0.1, 100), np.random.normal(1.0, 0.1, 50)], ['e|r1', 'e|r2']) * pe.cov_Obs(1.0, 0.01, 'cov') for _ in range(4)]
+    assert pe.obs._is_homogeneous(obs)
+    assert not pe.obs._is_homogeneous(obs + [pe.pseudo_Obs(1.0, 0.1, 'e|r1')])
+    assert not pe.obs._is_homogeneous(obs + [pe.Obs([np.random.normal(1.0, 0.1, 100), np.random.normal(1.0, 0.1, 50)], ['e|r1', 'e|r2'], idl=[range(1, 101), range(2, 52)])])
+
+    matrix = np.array(obs).reshape(2, 2)
+    for res in [pe.derived_observable(lambda x, **kwargs: x[0] * x[3] - x[1] * x[2], obs),
+                pe.linalg.det(matrix)]:
+        ref = obs[0] * obs[3] - obs[1] * obs[2]
+        assert res == ref
+        for name in ref.mc_names:
+            for r_name in ref.e_content[name]:
+                assert np.allclose(res.deltas[r_name], ref.deltas[r_name], atol=1e-14)
+        assert np.allclose(res.covobs['cov'].grad, ref.covobs['cov'].grad)
+    inv = pe.linalg.inv(matrix)
+    assert np.all((inv @ matrix)[0] == [1.0, 0.0])
+
+
+def test_lazy():
+    a = pe.Obs([np.random.normal(2.0, 0.1, 200), np.random.normal(2.0, 0.1, 100)], ['e|r1', 'e|r2'])
+    b = pe.Obs([np.random.normal(1.0, 0.1, 200)], ['e|r1'])
+    c = pe.Obs([np.random.normal(3.0, 0.1, 100)], ['f'], idl=[range(1, 200, 2)])
+    d = pe.cov_Obs(2.0, 0.01, 'cov')
+
+    def expr():
+        tmp = a * b + c
+        return np.exp(tmp / d) - 3 * np.sqrt(a) + tmp ** 2 + 2
+
+    eager = expr()
+    with pe.lazy():
+        res = expr()
+        assert res._lazy is not None
+        matrix = pe.linalg.inv(np.array([[a, b], [c, d]]))
+    assert res._lazy is not None
+    assert res.value == eager.value
+    assert res == eager
+    assert res._lazy is None
+    assert res.names == eager.names
+    for name in eager.deltas:
+        assert np.allclose(res.deltas[name], eager.deltas[name], atol=1e-14)
+        assert np.isclose(res.r_values[name], eager.r_values[name])
+    res.gamma_method()
+    eager.gamma_method()
+    assert np.isclose(res.dvalue, eager.dvalue)
+    assert np.all(matrix == pe.linalg.inv(np.array([[a, b], [c, d]])))
+
+    with pe.lazy():
+        res = a * b
+        dvalue = res.dvalue
+        assert res._lazy is None
+        assert dvalue == 0.0
+        res2 = a / b
+        res3 = res2 + 1
+    for obs in [res2, res3]:
+        obs.dump('test_lazy_dump', datatype="pickle")
+        loaded = pe.load_object('test_lazy_dump.p')
+        os.remove('test_lazy_dump.p')
+        assert loaded == obs
+        assert loaded._lazy is None
+    with pe.lazy():
+        res4 = res3 - res2
+    pe.input.json.dump_to_json([res4], 'test_lazy_dump')
+    loaded = pe.input.json.load_json('test_lazy_dump')
+    os.remove('test_lazy_dump.json.gz')
+    assert loaded == res4
+
+    with pytest.raises(ZeroDivisionError):
+        with pe.lazy():
+            raise ZeroDivisionError
+    assert (a * b)._lazy is None
+
+
+def test_gamma_method_parallel():
+    from concurrent.futures import ProcessPoolExecutor
+    attributes = ['dvalue', 'ddvalue', 'e_dvalue', 'e_ddvalue', 'e_tauint', 'e_dtauint', 'e_windowsize']
+    obs = [pe.Obs([np.random.normal(1.0, 0.1, 300), np.random.normal(1.0, 0.1, 100)], ['ens|r1', 'ens|r2']) for _ in range(7)]
+    obs += [pe.Obs([np.random.normal(1.0, 0.1, 100)], ['other'], idl=[range(1, 200, 2)]) for _ in range(3)]
+    obs = [o * obs[-1] for o in obs]
+    references = [copy.deepcopy(o) for o in obs]
+    [o.gamma_method(S=2.5) for o in references]
+
+    pe.gamma_method(obs, S=2.5, n_jobs=3)
+    for o, ref in zip(obs, references):
+        for attr in attributes:
+            assert getattr(o, attr) == getattr(ref, attr)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        pe.gamma_method_batch(obs, S=2.5, executor=executor)
+    for o, ref in zip(obs, references):
+        for attr in attributes:
+            assert getattr(o, attr) == getattr(ref, attr)
+
+    class SerialExecutor(concurrent.futures.Executor):
+        def __init__(self):
+            self.n_submitted = 0
+
+        def submit(self, fn, *args, **kwargs):
+            self.n_submitted += 1
+            future = concurrent.futures.Future()
+            future.set_result(fn(*args, **kwargs))
+            return future
+
+    # Executors without internal attributes split the work into n_jobs chunks
+    executor = SerialExecutor()
+    pe.gamma_method_batch(obs, S=2.5, n_jobs=4, executor=executor)
+    assert executor.n_submitted > 0
+    for o, ref in zip(obs, references):
+        for attr in attributes:
+            assert getattr(o, attr) == getattr(ref, attr)
+
+    corr = pe.Corr(obs[:7])
+    corr.gamma_method(n_jobs=-1)
+    for o, ref in zip(obs[:7], references[:7]):
+        ref.gamma_method()
+        assert o.dvalue == ref.dvalue
+
+    with pytest.raises(TypeError):
+        pe.gamma_method(obs, n_jobs=2.0)
+
+
+def test_compact_storage():
+    rng = np.random.default_rng(18)
+    idl = [1, 3, 4] + list(range(6, 103))
+    o1 = pe.Obs([rng.normal(1.0, 0.1, 100), rng.normal(2.0, 0.1, 100)], ['ens|r1', 'ens|r2'], idl=[range(1, 101), idl])
+    o2 = pe.Obs([rng.normal(1.0, 0.1, 100)], ['ens|r2'], idl=[list(idl)])
+    assert o1.idl['ens|r2'] is o2.idl['ens|r2']
+    o1.my_label = 'x'
+
+    restored = pickle.loads(pickle.dumps([o1, o2]))
+    assert restored[0].my_label == 'x'
+    assert restored[0].idl['ens|r2'] is o1.idl['ens|r2']
+    assert restored[1].idl['ens|r2'] is o1.idl['ens|r2']
+
+    report = pe.obs.memory_report([o1, o2, restored])
+    # Unpickled ranges are new objects, the list of configurations is shared
+    assert report['ens|r1'] == {'n_obs': 2, 'deltas': 2 * 800, 'idl': 2 * sys.getsizeof(range(1, 101))}
+    assert report['ens|r2']['n_obs'] == 4
+    assert report['ens|r2']['idl'] == sys.getsizeof(o2.idl['ens|r2']) + sum(sys.getsizeof(i) for i in idl)
+    assert report['ens|r2']['deltas'] == 4 * 800
+
+    ref = o1 * o2
+    ref.gm()
+    pe.obs.compact_storage(restored)
+    assert pe.obs.memory_report(restored)['ens|r2']['deltas'] == 2 * 400
+    assert restored[0].deltas['ens|r2'].dtype == np.float32
+    restored[0].gm()
+    o1.gm()
+    assert np.isclose(restored[0].dvalue, o1.dvalue, rtol=1e-6)
+
+    pe.Obs.deltas_dtype = np.float32
+    try:
+        res = restored[0] * restored[1]
+        assert res.deltas['ens|r2'].dtype == np.float32
+        res.gm()
+        assert np.isclose(res.value, ref.value)
+        assert np.isclose(res.dvalue, ref.dvalue, rtol=1e-5)
+    finally:
+        pe.Obs.deltas_dtype = None
+
+
+def test_memmap(tmp_path, monkeypatch):
+    # Small chunks to test the out-of-core code paths
+    monkeypatch.setattr(pe.obs, '_chunk_bytes', 8 * 64)
+    rng = np.random.default_rng(19)
+    samples = np.memmap(tmp_path / 'samples.dat', dtype=np.float64, mode='w+', shape=(1000,))
+    samples[:] = rng.normal(1.0, 0.1, 1000)
+    a = pe.Obs([samples, rng.normal(1.0, 0.1, 300)], ['ens|r1', 'ens|r2'])
+    assert isinstance(a.deltas['ens|r1'], np.memmap)
+    assert np.array_equal(a.deltas['ens|r1'], np.asarray(samples) - np.mean(samples))
+    b = pe.Obs([rng.normal(2.0, 0.1, 1000)], ['ens|r1'])
+    c = pe.Obs([rng.normal(0.5, 0.1, 500)], ['ens|r1'], idl=[range(1, 1000, 2)])
+
+    ref = [copy.deepcopy(o) for o in [a, b, c]]
+    pe.obs.to_memmap([a, b, c], directory=tmp_path)
+    for o in [a, b, c]:
+        assert all(isinstance(d, np.memmap) for d in o.deltas.values())
+
+    res = []
+    for x in [ref, [a, b, c]]:
+        derived = [x[0] * x[1], x[0] / x[2] + x[1]] + list(np.array([[x[0], x[1]], [x[1], x[2]]]) @ np.array([x[0], x[2]]))
+        pe.gamma_method_batch(derived)
+        res.append((derived, pe.covariance(derived)))
+
+    for o_ref, o in zip(res[0][0], res[1][0]):
+        assert all(isinstance(d, np.memmap) for d in o.deltas.values())
+        assert o.value == o_ref.value
+        for name in o.deltas:
+            assert np.allclose(o.deltas[name], o_ref.deltas[name], rtol=1e-14, atol=1e-16)
+        assert np.isclose(o.dvalue, o_ref.dvalue, rtol=1e-12)
+    assert np.allclose(res[0][1], res[1][1], rtol=1e-12)
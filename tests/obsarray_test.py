@@ -0,0 +1,114 @@
+import numpy as np
+import pyerrors as pe
+import pytest
+
+np.random.seed(0)
+
+
+def _gen_obs(n, shape=None):
+    samples = np.random.normal(2.0, 0.1, (n, 100))
+    obs = [pe.Obs([s[:60], s[60:]], ['ens|r1', 'ens|r2']) for s in samples]
+    obs = [o + pe.cov_Obs(1.0, 0.01, 'cov') * (i + 1) for i, o in enumerate(obs)]
+    if shape is not None:
+        return np.array(obs).reshape(shape)
+    return np.array(obs)
+
+
+def _assert_equal(arr, ref):
+    ref = np.asarray(ref)
+    res = arr.to_obs()
+    assert res.shape == ref.shape
+    for a, b in zip(res.ravel(), ref.ravel()):
+        assert (a - b).is_zero(atol=1e-10 * max(1, abs(b.value)))
+        assert np.isclose(a.value, b.value)
+        a.gm()
+        b.gm()
+        assert np.isclose(a.dvalue, b.dvalue)
+
+
+def test_obsarray_round_trip():
+    obs = _gen_obs(6, (2, 3))
+    arr = pe.ObsArray(obs)
+    assert arr.shape == (2, 3)
+    assert arr.deltas['ens|r1'].shape == (6, 60)
+    _assert_equal(arr, obs)
+    assert isinstance(arr[1, 2], pe.Obs)
+    assert arr[1, 2] == obs[1, 2]
+    _assert_equal(arr[:, 1:], obs[:, 1:])
+    _assert_equal(arr.T, obs.T)
+    _assert_equal(arr.reshape(3, 2), obs.reshape(3, 2))
+    _assert_equal(arr.ravel(), obs.ravel())
+    assert len(arr.tolist()) == 2
+    assert [o == p for o, p in zip(pe.ObsArray(arr), arr)]
+
+
+def test_obsarray_arithmetic():
+    obs1 = _gen_obs(5)
+    obs2 = _gen_obs(5)
+    arr1 = pe.ObsArray(obs1)
+    arr2 = pe.ObsArray(obs2)
+    floats = np.random.rand(5) + 1
+
+    _assert_equal(arr1 + arr2, obs1 + obs2)
+    _assert_equal(arr1 - arr2, obs1 - obs2)
+    _assert_equal(arr1 * arr2, obs1 * obs2)
+    _assert_equal(arr1 / arr2, obs1 / obs2)
+    _assert_equal(arr1 ** arr2, np.array([a ** b for a, b in zip(obs1, obs2)]))
+    _assert_equal(2 ** arr1, np.array([2 ** a for a in obs1]))
+    _assert_equal(arr1 ** 3, np.array([a ** 3 for a in obs1]))
+    _assert_equal(floats * arr1 - 3, floats * obs1 - 3)
+    _assert_equal(1 / arr1, 1 / obs1)
+    _assert_equal(-arr1, -obs1)
+    _assert_equal(abs(-arr1), obs1)
+    _assert_equal(arr1 * obs2[0], obs1 * obs2[0])
+    _assert_equal(obs2[0] / arr1, obs2[0] / obs1)
+    _assert_equal(obs1 + arr2, obs1 + obs2)
+
+    for func in ['sqrt', 'log', 'exp', 'sin', 'cos', 'tan', 'arctan', 'sinh', 'cosh', 'tanh', 'arcsinh', 'arccosh']:
+        _assert_equal(getattr(np, func)(arr1), getattr(np, func)(obs1))
+    small = arr1 / 10
+    for func in ['arcsin', 'arccos', 'arctanh']:
+        _assert_equal(getattr(np, func)(small), np.array([getattr(np, func)(o) for o in obs1 / 10]))
+
+
+def test_obsarray_broadcasting_and_linear():
+    obs = _gen_obs(6, (2, 3))
+    vec = _gen_obs(3)
+    arr = pe.ObsArray(obs)
+    arr_vec = pe.ObsArray(vec)
+    mat = np.random.rand(4, 2)
+
+    _assert_equal(arr * arr_vec, obs * vec)
+    _assert_equal(mat @ arr, mat @ obs)
+    _assert_equal(arr @ mat[:3, :2], obs @ mat[:3, :2])
+    _assert_equal(arr @ arr_vec, obs @ vec)
+    _assert_equal(arr @ arr.T, obs @ obs.T)
+    _assert_equal(arr.sum(axis=0), np.sum(obs, axis=0))
+    assert arr.sum() == np.sum(obs)
+    assert arr.mean() == np.mean(obs)
+
+
+def test_obsarray_different_idl():
+    obs1 = [pe.Obs([np.random.rand(50)], ['ens'], idl=[range(1, 100, 2)]) for _ in range(3)]
+    obs2 = [pe.Obs([np.random.rand(100)], ['ens'], idl=[range(1, 101)]) for _ in range(3)]
+    obs3 = [pe.Obs([np.random.rand(100)], ['other']) for _ in range(3)]
+    arr1 = pe.ObsArray(obs1)
+    arr2 = pe.ObsArray(obs2)
+    arr3 = pe.ObsArray(obs3)
+    _assert_equal(arr1 * arr2, np.array(obs1) * np.array(obs2))
+    _assert_equal(arr1 + arr3, np.array(obs1) + np.array(obs3))
+
+    with pytest.raises(ValueError):
+        pe.ObsArray(obs1 + obs2)
+    with pytest.raises(ValueError):
+        pe.ObsArray(obs1 + obs3)
+    with pytest.raises(TypeError):
+        pe.ObsArray([obs1[0], 1.0])
+
+
+def test_obsarray_corr():
+    obs = _gen_obs(8)
+    corr = pe.Corr(pe.ObsArray(obs))
+    assert corr.T == 8
+    for t in range(8):
+        assert corr[t] == obs[t]
@@ -0,0 +1,86 @@
+import numpy as np
+import pyerrors as pe
+import pytest
+
+np.random.seed(0)
+
+
+def _gen_matrix(dim):
+    mat = np.array([pe.Obs([np.random.normal(0.1, 0.01, 200), np.random.normal(0.1, 0.01, 150)], ['ens|r1', 'ens|r2'])
+                    + pe.Obs([np.random.normal(0.0, 0.005, 100)], ['other'], idl=[range(1, 200, 2)]) for i in range(dim * dim)]).reshape(dim, dim)
+    return mat + mat.T + np.diag(np.arange(1, dim + 1))
+
+
+def test_resample_round_trip():
+    mat = _gen_matrix(3)
+    samples, layout = pe.resampling.export_samples(mat, mat[0, 0])
+    assert samples[0].shape == (layout.n_samples, 3, 3)
+    assert samples[1].shape == (layout.n_samples,)
+    assert layout.n_samples == 1 + 350 + 100
+
+    res = pe.resampling.import_samples(samples[0], layout)
+    for o1, o2 in zip(mat.ravel(), res.ravel()):
+        assert o1.names == o2.names
+        assert o1.idl == o2.idl
+        assert (o1 - o2).is_zero(atol=1e-12)
+
+    assert (pe.resampling.resample(lambda x: x, mat[1, 2]) - mat[1, 2]).is_zero(atol=1e-12)
+    const = pe.resampling.resample(lambda x: 2 * x, pe.Obs([], [], means=[]) + 1)
+    assert const.value == 2
+    assert const.names == []
+
+
+def test_resample_vs_linear_propagation():
+    mat = _gen_matrix(4)
+    w_ref = pe.linalg.eigh(mat)[0]
+    w, v = pe.resampling.resample(np.linalg.eigh, mat)
+    w_loop = pe.resampling.resample(lambda x: np.linalg.eigh(x)[0], mat, vectorized=False)
+    w_boot = pe.resampling.resample(lambda x: np.linalg.eigh(x)[0], mat, method='bootstrap', n_boot=500, seed=1)
+    assert v.shape == (4, 4)
+    for o_ref, o, o_loop, o_boot in zip(w_ref, w, w_loop, w_boot):
+        for o_test in [o, o_loop, o_boot]:
+            o_ref.gamma_method()
+            o_test.gamma_method()
+            assert np.isclose(o_ref.value, o_test.value)
+            assert np.isclose(o_ref.dvalue, o_test.dvalue, rtol=1e-3)
+
+    prod = pe.resampling.resample(lambda x, y: x @ y, mat, mat)
+    for o_ref, o in zip((mat @ mat).ravel(), prod.ravel()):
+        o_ref.gamma_method()
+        o.gamma_method()
+        assert np.isclose(o_ref.value, o.value)
+        assert np.isclose(o_ref.dvalue, o.dvalue, rtol=1e-3)
+
+    cres = pe.resampling.resample(lambda x: x * (1 + 1j), mat[0, 0])
+    assert isinstance(cres, pe.CObs)
+    assert (cres.imag - mat[0, 0]).is_zero(atol=1e-12)
+
+
+def test_resample_binning():
+    obs = pe.Obs([np.random.normal(1.0, 0.1, 1000)], ['ens'])
+    obs.gamma_method(S=0)
+    binned = pe.resampling.resample(lambda x: x, obs, bin_size=10)
+    assert binned.idl['ens'] == range(1, 1001, 10)
+    assert np.isclose(binned.value, obs.value)
+    binned.gamma_method(S=0)
+    assert np.isclose(binned.dvalue, obs.dvalue, rtol=0.3)
+
+
+def test_resample_exceptions():
+    obs1 = pe.Obs([np.random.rand(100)], ['ens'])
+    obs2 = pe.Obs([np.random.rand(50)], ['ens'], idl=[range(1, 100, 2)])
+    with pytest.raises(ValueError):
+        pe.resampling.export_samples([obs1, obs2])
+    with pytest.raises(ValueError):
+        pe.resampling.export_samples(obs1 + pe.cov_Obs(1.0, 0.1, 'cov'))
+    with pytest.raises(ValueError):
+        pe.resampling.export_samples(obs1, method='blocking')
+    with pytest.raises(ValueError):
+        pe.resampling.export_samples(obs1, bin_size=0)
+    with pytest.raises(ValueError):
+        pe.resampling.export_samples(obs1, method='bootstrap', n_boot=50)
+    with pytest.raises(TypeError):
+        pe.resampling.export_samples([obs1, 1.0])
+    samples, layout = pe.resampling.export_samples(obs1)
+    with pytest.raises(ValueError):
+        pe.resampling.import_samples(samples[0][1:], layout)
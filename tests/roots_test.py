@@ -1,4 +1,5 @@
 import numpy as np
+import autograd.numpy as anp
 import pyerrors as pe
 import pytest
 
@@ -52,3 +53,40 @@ def test_root_multi_parameter():
 
     assert f2(-o1 / o2, [o1, o2]) == 0
     assert pe.find_root([o1, o2], f2) == -o1 / o2
+
+
+def test_find_roots():
+    rng = np.random.default_rng(5)
+    my_obs = np.array([pe.Obs([rng.normal(val, 0.01, 200)], ['t']) for val in np.linspace(0.1, 0.9, 12)]).reshape(3, 4)
+
+    def root_function(x, d):
+        return anp.exp(-x ** 2) - d
+
+    my_roots = pe.roots.find_roots(my_obs, root_function)
+    assert my_roots.shape == (3, 4)
+    for o, r in zip(my_obs.ravel(), my_roots.ravel()):
+        ref = pe.roots.find_root(o, root_function)
+        assert np.isclose(r.value, ref.value)
+        assert (r - ref).is_zero(atol=1e-10)
+
+    # The undamped Newton iteration diverges from this guess
+    atan_roots = pe.roots.find_roots(my_obs.ravel(), lambda x, d: anp.arctan(x) - d, guess=10.0)
+    for o, r in zip(my_obs.ravel(), atan_roots):
+        assert (np.tan(o) - r).is_zero(atol=1e-10)
+
+    o1 = np.array([pe.pseudo_Obs(1.1, 0.1, "test"), pe.pseudo_Obs(0.4, 0.1, "test")])
+    o2 = np.array([pe.pseudo_Obs(1.3, 0.12, "test"), pe.pseudo_Obs(2.1, 0.2, "test")])
+    multi_roots = pe.roots.find_roots([o1, o2], lambda x, d: d[0] + d[1] * x)
+    for i in range(2):
+        assert multi_roots[i] == -o1[i] / o2[i]
+
+    # Parameters defined on different ensembles
+    mixed = np.array([pe.Obs([rng.normal(val, 0.01, 100)], ['e%d' % (i % 3)]) for i, val in enumerate(np.linspace(0.1, 0.9, 7))])
+    mixed[2] = mixed[2] * pe.cov_Obs(1.0, 0.01 ** 2, 'cov')
+    mixed_roots = pe.roots.find_roots(mixed, root_function)
+    for o, r in zip(mixed, mixed_roots):
+        assert r.names == o.names
+        assert (r - pe.roots.find_root(o, root_function)).is_zero(atol=1e-10)
+
+    with pytest.raises(Exception):
+        pe.roots.find_roots(my_obs, lambda x, d: x - np.log(np.exp(d)))
@@ -0,0 +1,104 @@
+import numpy as np
+import pyerrors as pe
+import pytest
+
+
+def _ar1(rng, n, rho=0.8, mean=1.0):
+    noise = rng.normal(0.0, 0.1, n)
+    res = np.empty(n)
+    res[0] = noise[0]
+    for i in range(1, n):
+        res[i] = rho * res[i - 1] + noise[i]
+    return res + mean
+
+
+def _assert_same_gamma(o1, o2, e_names):
+    assert np.isclose(o1.value, o2.value, rtol=1e-12)
+    assert np.isclose(o1.dvalue, o2.dvalue, rtol=1e-8)
+    assert np.isclose(o1.ddvalue, o2.ddvalue, rtol=1e-8)
+    for e_name in e_names:
+        assert o1.e_windowsize[e_name] == o2.e_windowsize[e_name]
+        assert np.isclose(o1.e_tauint[e_name], o2.e_tauint[e_name], rtol=1e-8)
+        assert np.isclose(o1.e_dtauint[e_name], o2.e_dtauint[e_name], rtol=1e-8)
+
+
+def test_streaming_vs_gamma_method():
+    rng = np.random.default_rng(17)
+    samples = _ar1(rng, 2000)
+    stream = pe.StreamingObs('ens', max_window=200)
+    for chunk in np.split(samples, [10, 37, 500, 501, 1200]):
+        stream.append(chunk)
+        ref = stream.to_obs()
+        ref.gamma_method()
+        _assert_same_gamma(stream.gamma_method(), ref, ['ens'])
+    assert stream.N == 2000
+    assert np.isclose(stream.value, np.mean(samples))
+
+    res = stream.gm(S=0)
+    ref.gm(S=0)
+    _assert_same_gamma(res, ref, ['ens'])
+    # The exponential tail analysis only agrees if the full autocorrelation function is accumulated
+    res = pe.StreamingObs.from_obs(ref, max_window=1000).gm(tau_exp=5)
+    ref.gm(tau_exp=5)
+    _assert_same_gamma(res, ref, ['ens'])
+
+
+def test_streaming_replica():
+    rng = np.random.default_rng(18)
+    r1 = _ar1(rng, 600)
+    r2 = _ar1(rng, 400, mean=1.05)
+    other = rng.normal(3.0, 0.2, 300)
+    stream = pe.StreamingObs(['ens|r2', 'ens|r1', 'other'], max_window=300)
+    stream.append(r1[:100], 'ens|r1')
+    stream.append(r2, 'ens|r2')
+    stream.append(other[:50], 'other')
+    stream.append(r1[100:], 'ens|r1')
+    stream.append(other[50:], 'other')
+    ref = pe.Obs([r1, r2, other], ['ens|r1', 'ens|r2', 'other'])
+    ref.gamma_method()
+    res = stream.gamma_method()
+    _assert_same_gamma(res, ref, ['ens', 'other'])
+    assert res.idl == ref.idl
+
+
+def test_streaming_from_obs():
+    rng = np.random.default_rng(19)
+    samples = _ar1(rng, 500, mean=1e4)
+    obs = pe.Obs([samples], ['ens'], idl=[range(11, 1011, 2)])
+    stream = pe.StreamingObs.from_obs(obs, max_window=100)
+    new = _ar1(rng, 100, mean=1e4)
+    stream.append(new)
+    ref = pe.Obs([np.concatenate([samples, new])], ['ens'], idl=[range(11, 1211, 2)])
+    ref.gamma_method()
+    res = stream.gamma_method()
+    assert res.idl['ens'] == ref.idl['ens']
+    _assert_same_gamma(res, ref, ['ens'])
+
+
+def test_streaming_max_window():
+    rng = np.random.default_rng(20)
+    stream = pe.StreamingObs('ens', max_window=3)
+    stream.append(_ar1(rng, 1000, rho=0.99))
+    with pytest.warns(RuntimeWarning):
+        stream.gamma_method()
+
+
+def test_streaming_exceptions():
+    with pytest.raises(TypeError):
+        pe.StreamingObs(['ens', 1])
+    with pytest.raises(ValueError):
+        pe.StreamingObs(['ens', 'ens'])
+    with pytest.raises(ValueError):
+        pe.StreamingObs('ens', max_window=1)
+    stream = pe.StreamingObs(['ens|r1', 'ens|r2'])
+    with pytest.raises(ValueError):
+        stream.append(np.ones(10))
+    with pytest.raises(KeyError):
+        stream.append(np.ones(10), 'ens|r3')
+    stream.append(np.random.rand(10), 'ens|r1')
+    with pytest.raises(ValueError):
+        stream.gamma_method()
+    with pytest.raises(ValueError):
+        pe.StreamingObs.from_obs(pe.Obs([np.random.rand(5)], ['ens'], idl=[[1, 2, 5, 6, 9]]))
+    with pytest.raises(ValueError):
+        pe.StreamingObs.from_obs(pe.Obs([np.random.rand(10)], ['ens']) + pe.cov_Obs(1.0, 0.1, 'cov'))